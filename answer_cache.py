@@ -0,0 +1,184 @@
+import os
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+# Question-level answer cache for the Streamlit agents.
+#
+# Lookups first try the normalized question text, then a cosine search over
+# hashed character n-gram vectors (CPU only, no model download). A semantic
+# hit must also use the same content words in the same order as the cached
+# question, so "average salary for male employees" never returns the answer
+# cached for "... female employees", nor "do women earn more than men" the
+# one for "do men earn more than women". Entries expire after a TTL, the least recently used
+# one is evicted when full, and everything is dropped when the dataset
+# version changes.
+
+STOPWORDS = {
+    "a", "an", "and", "are", "by", "can", "could", "do", "does", "for", "give",
+    "has", "have", "how", "i", "in", "is", "it", "me", "much", "of", "on",
+    "please", "show", "tell", "that", "the", "there", "to", "what", "whats",
+    "which", "who", "with", "you",
+}
+
+dimensions = 2048
+ngram_sizes = (3, 4, 5)
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def normalize(question):
+    question = question.lower().strip()
+    question = question.replace("'s ", " ").replace("'", "")
+    question = re.sub(r"[^\w\s.]", " ", question)
+    question = re.sub(r"(?<!\d)\.|\.(?!\d)", " ", question)
+    return " ".join(question.split())
+
+
+def _stem(word):
+    # crude plural folding so "salaries" == "salary", "departments" == "department"
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def content_words(normalized):
+    # ordered: the same words in another order can ask the opposite question
+    return tuple(_stem(w) for w in normalized.split() if w not in STOPWORDS)
+
+
+def vectorize(normalized):
+    """L2-normalized hashed n-gram vector of a normalized question."""
+    vector = np.zeros(dimensions, dtype=np.float32)
+    padded = f" {normalized} "
+    for n in ngram_sizes:
+        for i in range(len(padded) - n + 1):
+            vector[zlib.crc32(padded[i : i + n].encode()) % dimensions] += 1.0
+    for word in normalized.split():
+        vector[zlib.crc32(word.encode()) % dimensions] += 2.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def file_version(path):
+    """Cheap dataset version for file-backed data: size and mtime."""
+    stat = os.stat(path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+class AnswerCache:
+    def __init__(self, max_entries=1000, ttl=24 * 3600, threshold=0.6):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self.version = None
+        self._lock = threading.Lock()
+        # normalized question -> (answer, words, slot, created)
+        self._entries = OrderedDict()
+        self._vectors = np.zeros((max_entries, dimensions), dtype=np.float32)
+        self._slot_keys = [None] * max_entries
+        self._free = list(range(max_entries - 1, -1, -1))
+        self.metrics = {
+            "exact_hits": 0,
+            "semantic_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": 0,
+        }
+
+    def _check_version(self, version):
+        if version != self.version:
+            if self._entries:
+                self.metrics["invalidations"] += 1
+            self._clear()
+            self.version = version
+
+    def _clear(self):
+        self._entries.clear()
+        self._vectors[:] = 0
+        self._slot_keys = [None] * self.max_entries
+        self._free = list(range(self.max_entries - 1, -1, -1))
+
+    def _remove(self, key):
+        _, _, slot, _ = self._entries.pop(key)
+        self._vectors[slot] = 0
+        self._slot_keys[slot] = None
+        self._free.append(slot)
+
+    def _live(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if now - entry[3] > self.ttl:
+            self._remove(key)
+            self.metrics["expirations"] += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def get(self, question, version=None):
+        """Return the cached answer for `question` (or a paraphrase), else None."""
+        key = normalize(question)
+        now = time.time()
+        with self._lock:
+            self._check_version(version)
+            entry = self._live(key, now)
+            if entry is not None:
+                self.metrics["exact_hits"] += 1
+                return entry[0]
+            if self._entries:
+                words = content_words(key)
+                scores = self._vectors @ vectorize(key)
+                for slot in np.argsort(scores)[::-1][:5]:
+                    if scores[slot] < self.threshold:
+                        break
+                    candidate = self._slot_keys[slot]
+                    entry = self._live(candidate, now) if candidate else None
+                    if entry is not None and entry[1] == words:
+                        self.metrics["semantic_hits"] += 1
+                        return entry[0]
+            self.metrics["misses"] += 1
+            return None
+
+    def put(self, question, answer, version=None):
+        key = normalize(question)
+        with self._lock:
+            self._check_version(version)
+            if key in self._entries:
+                self._remove(key)
+            if not self._free:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.metrics["evictions"] += 1
+            slot = self._free.pop()
+            self._vectors[slot] = vectorize(key)
+            self._slot_keys[slot] = key
+            self._entries[key] = (answer, content_words(key), slot, time.time())
+
+    def stats(self):
+        with self._lock:
+            lookups = sum(
+                self.metrics[k] for k in ("exact_hits", "semantic_hits", "misses")
+            )
+            hits = self.metrics["exact_hits"] + self.metrics["semantic_hits"]
+            return {
+                **self.metrics,
+                "entries": len(self._entries),
+                "hit_rate": round(hits / lookups, 3) if lookups else None,
+            }
+
+
+def get_cache(name, **kwargs):
+    """Process-wide cache by name; survives Streamlit reruns of the script."""
+    with _caches_lock:
+        if name not in _caches:
+            _caches[name] = AnswerCache(**kwargs)
+        return _caches[name]
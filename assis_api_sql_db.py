@@ -1,117 +1,73 @@
-import json
-from langchain.schema import HumanMessage, SystemMessage
-import os
-from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
-import pandas as pd
-
-from sqlalchemy import create_engine
-import numpy as np
-from sqlalchemy import text
-from openai import OpenAI
-import streamlit as st
-
+import assistant_registry
 import helpers
-from helpers import (
-    get_avg_salary_and_female_count_for_division,
-    get_total_overtime_pay_for_department,
-    get_total_longevity_pay_for_grade,
-    get_employee_count_by_gender_in_department,
-    get_employees_with_overtime_above,
-)
-
-
-# Load environment variables from .env file
-load_dotenv()
-
-openai_key = os.getenv("OPENAI_API_KEY")
-
-llm_name = "gpt-3.5-turbo"
-model = ChatOpenAI(api_key=openai_key, model=llm_name)
-
-
-# for the weather function calling
-client = OpenAI(api_key=openai_key)
-
+import run_driver
+import runtime
 
-# Step 1: create the assistant
-assistant = client.beta.assistants.create(
-    name="Salary Assistant",
-    description="Assistant to help with salary data",
-    model=llm_name,
-    tools=helpers.tools_sql,
-)
+# Assistants API version of the salary agent. The assistant is created once
+# and then reused across runs (see assistant_registry.py), every user session
+# keeps its own thread, and the question is sent along with the run, so a
+# question costs only the run itself.
 
-# create a thread
-thread = client.beta.threads.create()
-print(thread.id)
+llm_name = runtime.llm_name
 
-message = client.beta.threads.messages.create(
-    thread_id=thread.id,
-    role="user",
-    content="""What is the total overtime pay for the Alcohol Beverage Services department?""",
-)
+ASSISTANT_NAME = "Salary Assistant"
 
-messages = client.beta.threads.messages.list(thread_id=thread.id)
-print(messages)
 
-# Run the assistant
-run = client.beta.threads.runs.create(
-    thread_id=thread.id,
-    assistant_id=assistant.id,
-)
-
-import time
-
-start_time = time.time()
-
-status = run.status
-
-while status not in ["completed", "cancelled", "expired", "failed"]:
-    time.sleep(5)
-    run = client.beta.threads.runs.retrieve(thread_id=thread.id, run_id=run.id)
-    print(
-        "Elapsed time: {} minutes {} seconds".format(
-            int((time.time() - start_time) // 60), int((time.time() - start_time) % 60)
-        )
+# Step 1: create (or reuse) the assistant
+def get_assistant_id():
+    return assistant_registry.get_or_create(
+        runtime.openai_client(),
+        name=ASSISTANT_NAME,
+        description="Assistant to help with salary data",
+        model=llm_name,
+        tools=helpers.tools_sql,
     )
-    status = run.status
-    print(f"Status: {status}")
-    if status == "requires_action":
-        available_functions = {
-            "get_avg_salary_and_female_count_for_division": get_avg_salary_and_female_count_for_division,
-            "get_total_overtime_pay_for_department": get_total_overtime_pay_for_department,
-            "get_total_longevity_pay_for_grade": get_total_longevity_pay_for_grade,
-            "get_employee_count_by_gender_in_department": get_employee_count_by_gender_in_department,
-            "get_employees_with_overtime_above": get_employees_with_overtime_above,
-        }
 
-        tool_outputs = []
 
-        for tool_call in run.required_action.submit_tool_outputs.tool_calls:
-            function_name = tool_call.function.name
-            function_to_call = available_functions[function_name]
-            function_args = json.loads(tool_call.function.arguments)
-            if function_name == "get_employees_with_overtime_above":
-                function_response = function_to_call(amount=function_args.get("amount"))
-            elif function_name == "get_total_longevity_pay_for_grade":
-                function_response = function_to_call(grade=function_args.get("grade"))
-            else:
-                function_response = function_to_call(**function_args)
+def thread_pool():
+    return runtime.get(
+        "assistant_threads",
+        lambda: assistant_registry.ThreadPool(runtime.openai_client()),
+    )
 
-            print(f"Function response: {function_response}")
-            print(tool_call.id)
 
-            tool_outputs.append(
-                {"tool_call_id": tool_call.id, "output": str(function_response)}
-            )
+def ask(
+    question="""What is the total overtime pay for the Alcohol Beverage Services department?""",
+    session_id="default",
+):
+    client = runtime.openai_client()
+    runtime.engine()  # the tools need the database loaded
+    assistant_id = get_assistant_id()
+    thread_id = thread_pool().thread_for(session_id)
+
+    # Run the assistant: stream run events, execute every tool call of a step
+    # in parallel and submit all outputs at once (polls with backoff if
+    # streaming is unavailable)
+    try:
+        run, timings = run_driver.drive_run(
+            client,
+            thread_id,
+            assistant_id,
+            additional_messages=[{"role": "user", "content": question}],
+        )
+    except Exception as e:
+        # the stored assistant was deleted on the server; recreate it once
+        if getattr(e, "status_code", None) != 404:
+            raise
+        print(e)
+        assistant_registry.forget(ASSISTANT_NAME)
+        run, timings = run_driver.drive_run(
+            client,
+            thread_id,
+            get_assistant_id(),
+            additional_messages=[{"role": "user", "content": question}],
+        )
+    print(f"Status: {run.status}")
+    print(f"Timings: {timings}")
 
-            run = client.beta.threads.runs.submit_tool_outputs(
-                thread_id=thread.id,
-                run_id=run.id,
-                tool_outputs=tool_outputs,
-            )
+    return client.beta.threads.messages.list(thread_id=thread_id)
 
-messages = client.beta.threads.messages.list(thread_id=thread.id)
 
-print(messages.model_dump_json(indent=2))
+if __name__ == "__main__":
+    messages = ask()
+    print(messages.model_dump_json(indent=2))
@@ -0,0 +1,193 @@
+import atexit
+import contextlib
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import fcntl
+except ImportError:  # not on Windows; the file is then guarded per process only
+    fcntl = None
+
+# Persistent Assistants and pooled threads for the Assistants API agent.
+#
+# Assistants are recorded in a small JSON file by name, with a hash of their
+# (model, instructions, tools) definition. A later run with the same
+# definition reuses the stored assistant id without any API call; a changed
+# definition updates the existing assistant in place instead of creating a
+# new one. The file is read, changed and replaced under a lock file, so
+# processes starting together do not overwrite each other's ids.
+#
+# Threads are kept per user session. Once the pool has served a session,
+# later sessions take a thread created ahead of time in the background, so
+# they do not wait for threads.create; a one-shot run creates only its own
+# thread. Threads of evicted or released sessions, and unused spares at exit,
+# are deleted on the server.
+
+registry_path = "./db/assistants.json"
+
+max_sessions = 1000
+spare_threads = 2
+
+_file_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def _locked(path):
+    # exclusive within the process and, with fcntl, across processes
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with _file_lock, open(path + ".lock", "w") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        yield
+
+
+def definition_hash(model, instructions, tools):
+    definition = {"model": model, "instructions": instructions or "", "tools": tools}
+    canonical = json.dumps(definition, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _write(path, entries):
+    with open(path + ".tmp", "w") as f:
+        json.dump(entries, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def get_or_create(
+    client, name, model, tools, instructions=None, description=None, path=None
+):
+    """Id of the assistant `name` with this definition, creating or updating
+    it only when the stored one does not match."""
+    path = path or registry_path
+    digest = definition_hash(model, instructions, tools)
+    with _locked(path):
+        entries = _read(path)
+        entry = entries.get(name)
+        if entry and entry["hash"] == digest:
+            return entry["id"]
+
+        fields = {"name": name, "model": model, "tools": tools}
+        if instructions is not None:
+            fields["instructions"] = instructions
+        if description is not None:
+            fields["description"] = description
+        assistant = None
+        if entry:
+            try:
+                assistant = client.beta.assistants.update(entry["id"], **fields)
+            except Exception as e:
+                # deleted on the server side; make a new one
+                print(e)
+        if assistant is None:
+            assistant = client.beta.assistants.create(**fields)
+        entries[name] = {"id": assistant.id, "hash": digest, "updated_at": time.time()}
+        _write(path, entries)
+        return assistant.id
+
+
+def forget(name, path=None):
+    """Drop a stored assistant id (e.g. after the API said it does not exist)."""
+    path = path or registry_path
+    with _locked(path):
+        entries = _read(path)
+        if entries.pop(name, None) is not None:
+            _write(path, entries)
+
+
+class ThreadPool:
+    """One thread per user session, handed out from pre-created spares once
+    more than one session has asked."""
+
+    def __init__(self, client, spare=spare_threads, max_sessions=max_sessions):
+        self.client = client
+        self.spare = spare
+        self.max_sessions = max_sessions
+        self._lock = threading.Lock()
+        self._sessions = OrderedDict()  # session id -> thread id
+        self._spares = []
+        self._refilling = False
+        self._closed = False
+        atexit.register(self.close)
+
+    def _refill(self):
+        try:
+            while True:
+                with self._lock:
+                    if self._closed or len(self._spares) >= self.spare:
+                        self._refilling = False
+                        return
+                thread = self.client.beta.threads.create()
+                with self._lock:
+                    closed = self._closed
+                    if not closed:
+                        self._spares.append(thread.id)
+                if closed:
+                    self._delete([thread.id])
+        except Exception as e:
+            print(e)
+            with self._lock:
+                self._refilling = False
+
+    def _schedule_refill(self):
+        # called with the lock held
+        if not self._refilling and len(self._spares) < self.spare:
+            self._refilling = True
+            threading.Thread(target=self._refill, daemon=True).start()
+
+    def _delete(self, thread_ids):
+        for thread_id in thread_ids:
+            try:
+                self.client.beta.threads.delete(thread_id)
+            except Exception as e:
+                print(e)
+
+    def _delete_later(self, thread_ids):
+        if thread_ids:
+            threading.Thread(
+                target=self._delete, args=(thread_ids,), daemon=True
+            ).start()
+
+    def thread_for(self, session_id):
+        """Thread id of `session_id`, assigning one on its first question."""
+        with self._lock:
+            thread_id = self._sessions.get(session_id)
+            if thread_id is not None:
+                self._sessions.move_to_end(session_id)
+                return thread_id
+            thread_id = self._spares.pop() if self._spares else None
+            # a first (possibly only) session gets no spares made for it
+            if self._sessions:
+                self._schedule_refill()
+        if thread_id is None:
+            thread_id = self.client.beta.threads.create().id
+        evicted = []
+        with self._lock:
+            self._sessions[session_id] = thread_id
+            while len(self._sessions) > self.max_sessions:
+                evicted.append(self._sessions.popitem(last=False)[1])
+        self._delete_later(evicted)
+        return thread_id
+
+    def release(self, session_id):
+        with self._lock:
+            thread_id = self._sessions.pop(session_id, None)
+        self._delete_later([thread_id] if thread_id else [])
+
+    def close(self):
+        """Delete the spare threads no session has taken."""
+        with self._lock:
+            self._closed = True
+            spares, self._spares = self._spares, []
+        self._delete(spares)
@@ -0,0 +1,86 @@
+import asyncio
+
+import helpers
+import router
+import runtime
+import token_budget
+import tool_dispatch
+import tracing
+
+# asyncio-native version of fun_call_db_agent.run_conversation.
+#
+# One event loop can drive hundreds of concurrent conversations: the LLM calls
+# are awaited on a shared AsyncOpenAI client (one HTTP connection pool) and
+# the tool calls run on tool_dispatch's bounded thread pool, so there is no
+# thread per request.
+
+llm_name = runtime.llm_name
+
+tools = token_budget.compact_tools(helpers.tools_sql)
+
+
+def get_aclient():
+    # created on first use, shared by the whole process (see runtime.py)
+    return runtime.async_openai_client()
+
+
+async def arun_conversation(
+    query="""What is the average salary and the count of female employees
+    in the ABS 85 Administrative Services division?""",
+    client=None,
+    shared_tools=None,
+    messages=None,
+):
+    """`shared_tools` is passed to tool_dispatch.arun_tool_calls; `messages`
+    is a list to hold the conversation (so the caller can see the tool calls)."""
+    client = get_aclient() if client is None else client
+    messages = [] if messages is None else messages
+    messages.append(
+        {
+            "role": "user",
+            "content": query,
+        }
+    )
+
+    with tracing.span("conversation", question=query):
+        routed = router.match(query)
+        if routed is not None:
+            # the tool runs off the event loop, like the dispatched ones
+            text = await asyncio.to_thread(router.run_route, routed, messages)
+            if text is not None:
+                return router.completion(text)
+        else:
+            with tracing.span("llm", model=llm_name) as span:
+                response = await client.chat.completions.create(
+                    model=llm_name,
+                    messages=token_budget.fit(messages, tools, span=span),
+                    tools=tools,
+                    tool_choice="auto",
+                )
+                tracing.record_usage(span, response)
+            response_message = response.choices[0].message
+
+            tool_calls = response_message.tool_calls
+            if not tool_calls:
+                return response
+            messages.append(response_message)
+            messages.extend(
+                await tool_dispatch.arun_tool_calls(tool_calls, shared=shared_tools)
+            )
+        with tracing.span("llm", model=llm_name) as span:
+            response = await client.chat.completions.create(
+                model=llm_name,
+                messages=token_budget.fit(messages, span=span),
+            )
+            tracing.record_usage(span, response)
+
+    return response
+
+
+if __name__ == "__main__":
+    res = asyncio.run(
+        arun_conversation(
+            query="""What is the total longevity pay for employees with the grade 'M3'?"""
+        )
+    )
+    print(res.choices[0].message.content)
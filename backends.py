@@ -0,0 +1,77 @@
+import os
+import sqlite3
+
+import helpers
+import runtime
+
+# Pluggable engines behind the function-calling tools.
+#
+# A backend is anything with a `name`, a `functions()` method returning the
+# tool name -> callable registry for the names in helpers.tools_sql, and a
+# `data_version()` fingerprint of the data it answers from (tool_cache.py
+# memoizes results per backend and version). "sqlite" is the default
+# (helpers.py: SQLite plus rollups); "numpy" answers from in-process arrays
+# (numpy_backend.py). Pick one with the TOOL_BACKEND environment variable (or
+# .env entry).
+
+default_backend = "sqlite"
+
+table_name = runtime.table_name
+
+# db path -> (file stamp, version)
+_sqlite_versions = {}
+
+
+def sqlite_data_version(executor):
+    """The fingerprint ingest.py records for the CSV loaded into the database.
+    It is only re-read when the db file changes on disk, so checking it costs
+    one stat() per call."""
+    stamp = executor.file_stamp()
+    cached = _sqlite_versions.get(executor.path)
+    if cached is not None and stamp is not None and cached[0] == stamp:
+        return cached[1]
+    try:
+        row = executor.fetch_one(
+            "SELECT sha256 FROM _ingest_meta WHERE table_name = ?", (table_name,)
+        )
+    except sqlite3.Error:
+        row = None
+    # without ingest bookkeeping fall back to the file stamp itself
+    version = row["sha256"] if row else stamp
+    _sqlite_versions[executor.path] = (stamp, version)
+    return version
+
+
+class SQLiteBackend:
+    name = "sqlite"
+
+    def functions(self):
+        return helpers.available_functions
+
+    def data_version(self):
+        return sqlite_data_version(runtime.executor())
+
+
+def _numpy_backend():
+    # imported lazily: building the arrays reads the whole dataset
+    import numpy_backend
+
+    return numpy_backend.get()
+
+
+BACKENDS = {
+    "sqlite": SQLiteBackend,
+    "numpy": _numpy_backend,
+}
+
+
+def get_backend(name=None):
+    name = name or os.getenv("TOOL_BACKEND", default_backend)
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown tool backend {name!r}, expected one of {list(BACKENDS)}")
+    return BACKENDS[name]()
+
+
+def available_functions(name=None):
+    """Tool registry of the configured backend."""
+    return get_backend(name).functions()
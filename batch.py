@@ -0,0 +1,269 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import time
+
+import answer_cache
+import runtime
+import tool_dispatch
+from async_agent import arun_conversation
+from stats import percentile
+
+# Batch question runner for the function-calling agent.
+#
+# Reads a file of questions (one per line, e.g. questions_sql_agent.md, where
+# blank lines and "Section:" headings are skipped, or JSONL with a "question"
+# field), drops repeats (same normalized text, see answer_cache.normalize),
+# and answers the rest concurrently with async_agent: at most `concurrency`
+# conversations at a time, optionally spaced to a requests-per-minute budget,
+# with the DB side bounded by tool_dispatch's thread pool. Every unique
+# question still makes its own LLM calls: LLM requests are not batched. A tool
+# call the model asks for that another question of the batch already made is
+# not executed again but shares that result, and each record carries a
+# "group" id (a hash of its tool calls) that only labels the questions that
+# needed the same data.
+#
+# Every answer is appended to the output JSONL as soon as it is known, so
+# the file is also the checkpoint: a rerun skips the questions already
+# answered there (by position and text) and retries the ones that failed.
+#
+#     python batch.py questions_sql_agent.md -o answers.jsonl -c 32 --rpm 3000
+
+output_path = "./batch_answers.jsonl"
+concurrency = 16
+
+
+def read_questions(path):
+    with open(path) as f:
+        if path.endswith(".jsonl"):
+            questions = []
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    questions.append(
+                        record["question"] if isinstance(record, dict) else str(record)
+                    )
+            return questions
+        return [
+            line.strip()
+            for line in f
+            if line.strip() and not line.strip().endswith(":")
+        ]
+
+
+def read_checkpoint(path, questions):
+    """{position: record} of the questions answered in an earlier run."""
+    done = {}
+    try:
+        with open(path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # a line cut short by a crash
+                i = record.get("id")
+                if (
+                    record.get("status") == "ok"
+                    and isinstance(i, int)
+                    and i < len(questions)
+                    and answer_cache.normalize(questions[i])
+                    == answer_cache.normalize(record.get("question", ""))
+                ):
+                    done[i] = record
+    except FileNotFoundError:
+        pass
+    return done
+
+
+def _ends_with_newline(path):
+    with open(path, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+
+class RateLimiter:
+    """Spaces request starts evenly to stay under `per_minute`."""
+
+    def __init__(self, per_minute):
+        self.interval = 60.0 / per_minute
+        self._next = 0.0
+
+    async def wait(self):
+        # reserve the next slot first, so waiters keep their order
+        now = time.monotonic()
+        start = max(now, self._next)
+        self._next = start + self.interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+
+class RateLimitedClient:
+    """The part of AsyncOpenAI the agent uses, with every request rate limited."""
+
+    def __init__(self, client, limiter):
+        self._client = client
+        self._limiter = limiter
+        self.chat = self
+        self.completions = self
+
+    async def create(self, **kwargs):
+        await self._limiter.wait()
+        return await self._client.chat.completions.create(**kwargs)
+
+
+def _tool_calls(messages):
+    calls = []
+    for message in messages:
+        for tool_call in getattr(message, "tool_calls", None) or []:
+            calls.append(tool_dispatch.call_key(tool_call))
+    return calls
+
+
+def _group(calls):
+    # questions with the same set of tool calls get the same group id
+    if not calls:
+        return None
+    canonical = json.dumps(sorted(calls))
+    return hashlib.sha1(canonical.encode()).hexdigest()[:12]
+
+
+async def run_batch(
+    questions,
+    output=output_path,
+    client=None,
+    concurrency=concurrency,
+    requests_per_minute=None,
+    restart=False,
+):
+    runtime.engine()  # load / migrate the database before the workers start
+    client = runtime.async_openai_client() if client is None else client
+    if requests_per_minute:
+        client = RateLimitedClient(client, RateLimiter(requests_per_minute))
+    if restart and os.path.exists(output):
+        os.remove(output)
+    done = read_checkpoint(output, questions)
+
+    # normalized question -> positions, first one answered for all
+    positions = {}
+    for i, question in enumerate(questions):
+        positions.setdefault(answer_cache.normalize(question), []).append(i)
+
+    semaphore = asyncio.Semaphore(concurrency)
+    shared_tools = {}
+    latencies = []
+    groups = set()
+    counts = {"answered": 0, "errors": 0, "tool_calls": 0}
+    out = open(output, "a")
+    if out.tell() and not _ends_with_newline(output):
+        out.write("\n")  # end the line a crash cut short
+
+    def write(record):
+        out.write(json.dumps(record, default=str) + "\n")
+        out.flush()
+
+    async def answer(ids):
+        first = ids[0]
+        record = done.get(first)
+        if record is None:
+            question = questions[first]
+            messages = []
+            async with semaphore:
+                start_time = time.perf_counter()
+                try:
+                    response = await arun_conversation(
+                        question,
+                        client=client,
+                        shared_tools=shared_tools,
+                        messages=messages,
+                    )
+                    record = {
+                        "status": "ok",
+                        "answer": response.choices[0].message.content,
+                    }
+                except Exception as e:
+                    print(e)
+                    record = {"status": "error", "error": f"{type(e).__name__}: {e}"}
+                seconds = time.perf_counter() - start_time
+            calls = _tool_calls(messages)
+            record = {
+                "id": first,
+                "question": question,
+                **record,
+                "tool_calls": [{"name": n, "arguments": a} for n, a in calls],
+                "group": _group(calls),
+                "seconds": round(seconds, 4),
+            }
+            write(record)
+            counts["answered" if record["status"] == "ok" else "errors"] += 1
+            counts["tool_calls"] += len(calls)
+            latencies.append(seconds)
+            if record["group"]:
+                groups.add(record["group"])
+        if record["status"] != "ok":
+            return
+        for i in ids[1:]:
+            if i not in done:
+                write(
+                    {
+                        **record,
+                        "id": i,
+                        "question": questions[i],
+                        "duplicate_of": first,
+                        "seconds": 0.0,
+                    }
+                )
+
+    start_time = time.perf_counter()
+    try:
+        await asyncio.gather(*[answer(ids) for ids in positions.values()])
+    finally:
+        out.close()
+    elapsed = time.perf_counter() - start_time
+
+    return {
+        "questions": len(questions),
+        "unique": len(positions),
+        "resumed": len(done),
+        **counts,
+        "tool_groups": len(groups),
+        "tool_executions": len(shared_tools),
+        "seconds": round(elapsed, 3),
+        "throughput_per_s": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "p50_s": round(percentile(latencies, 50), 3) if latencies else None,
+        "p99_s": round(percentile(latencies, 99), 3) if latencies else None,
+        "output": output,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Answer a file of questions")
+    parser.add_argument("questions", help="text/markdown (one per line) or JSONL file")
+    parser.add_argument("-o", "--output", default=output_path)
+    parser.add_argument("-c", "--concurrency", type=int, default=concurrency)
+    parser.add_argument(
+        "--rpm", type=float, help="LLM requests per minute to stay under"
+    )
+    parser.add_argument(
+        "--restart", action="store_true", help="ignore answers from earlier runs"
+    )
+    parser.add_argument("--base-url", help="OpenAI-compatible endpoint to use")
+    args = parser.parse_args()
+
+    client = None
+    if args.base_url:
+        from openai import AsyncOpenAI
+
+        client = AsyncOpenAI(api_key=runtime.openai_key or "fake", base_url=args.base_url)
+    summary = asyncio.run(
+        run_batch(
+            read_questions(args.questions),
+            output=args.output,
+            client=client,
+            concurrency=args.concurrency,
+            requests_per_minute=args.rpm,
+            restart=args.restart,
+        )
+    )
+    print(json.dumps(summary, indent=2))
@@ -0,0 +1,4 @@
+# Performance benchmarks for ingestion, rollups, the tool functions and the
+# function-calling conversation loop, on synthetic salary datasets.
+#
+#     python -m benchmarks --rows 10000 1000000 --output results.json
@@ -0,0 +1,52 @@
+import argparse
+import json
+import tempfile
+
+from benchmarks import suite
+
+SIZES = [10_000, 1_000_000, 10_000_000]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Benchmark ingestion, rollups, tools and conversations",
+    )
+    parser.add_argument("--rows", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--departments", type=int, default=42)
+    parser.add_argument("--divisions", type=int, default=627)
+    parser.add_argument("--grades", type=int, default=98)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=1000, help="calls per tool")
+    parser.add_argument("--conversations", type=int, default=50)
+    parser.add_argument(
+        "--skip",
+        nargs="*",
+        default=[],
+        choices=["rollups", "tools", "sql", "conversation"],
+    )
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--workdir", help="keep the generated data here")
+    args = parser.parse_args()
+
+    report = {"environment": suite.environment(), "results": []}
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.rows:
+            report["results"].append(
+                suite.run(
+                    args.workdir or tmp,
+                    rows,
+                    repeat=args.repeat,
+                    conversations=args.conversations,
+                    skip=args.skip,
+                    seed=args.seed,
+                    departments=args.departments,
+                    divisions=args.divisions,
+                    grades=args.grades,
+                )
+            )
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
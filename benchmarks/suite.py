@@ -0,0 +1,257 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from openai import OpenAI
+from sqlalchemy import create_engine
+
+import fake_llm
+import helpers
+import ingest
+import rollups
+import router
+import runtime
+import tool_cache
+from benchmarks import synthetic
+from executor import SQLiteExecutor
+from numpy_backend import NumpyBackend
+from stats import percentile
+
+# The individual benchmarks. Each returns a JSON-serializable dict; times are
+# in seconds unless the key says otherwise.
+
+
+def timings(function, repeat, unit=1e6):
+    """mean / p50 / p99 of `repeat` calls, in microseconds by default."""
+    function()  # warm up (statement cache, rollup snapshot, connection)
+    samples = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        function()
+        samples.append((time.perf_counter() - start_time) * unit)
+    return {
+        "mean": round(sum(samples) / len(samples), 2),
+        "p50": round(percentile(samples, 50), 2),
+        "p99": round(percentile(samples, 99), 2),
+    }
+
+
+def use_database(db_path):
+    """Point the tools and the agents at another (already loaded) database."""
+    runtime.database_file_path = db_path
+    # the loaded engine, so runtime.engine() does not ingest runtime.file_url
+    runtime.get(
+        "engine", lambda: create_engine(f"sqlite:///{db_path}"), version=db_path
+    )
+    tool_cache.memo.clear()
+    rollups.invalidate()
+
+
+def same_result(a, b):
+    # the engines add floats in a different order
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(same_result(a[k], b[k]) for k in a)
+    if isinstance(a, list) and isinstance(b, list):
+        return len(a) == len(b) and all(same_result(x, y) for x, y in zip(a, b))
+    if isinstance(a, float) and isinstance(b, float):
+        return bool(np.isclose(a, b, rtol=1e-9, atol=0.01))
+    return a == b
+
+
+def bench_ingest(csv_path, db_path, rows, seed=0, **cardinality):
+    engine = create_engine(f"sqlite:///{db_path}")
+    result = {}
+    start_time = time.perf_counter()
+    ingest.ensure_loaded(csv_path, engine)
+    result["create"] = round(time.perf_counter() - start_time, 4)
+    result["create_rows_per_s"] = round(rows / result["create"])
+
+    start_time = time.perf_counter()
+    ingest.ensure_loaded(csv_path, engine)
+    result["unchanged"] = round(time.perf_counter() - start_time, 6)
+
+    # append 1% new rows; only the old tail chunk and the new rows are written
+    appended = max(rows // 100, 1)
+    synthetic.generate(appended, seed=seed, part=10_000, **cardinality).to_csv(
+        csv_path, mode="a", header=False, index=False
+    )
+    start_time = time.perf_counter()
+    outcome = ingest.ensure_loaded(csv_path, engine)
+    result["append"] = round(time.perf_counter() - start_time, 4)
+    result["append_rows"] = appended
+    result["append_rows_written"] = outcome["rows_written"]
+    return result
+
+
+def bench_rollups(db_path, repeat=3):
+    engine = create_engine(f"sqlite:///{db_path}")
+    with engine.connect() as connection:
+        # full rebuild, rolled back so the database is left as it was
+        rebuild = timings(
+            lambda: rollups.rebuild(connection, ingest.table_name), repeat, unit=1
+        )
+        connection.rollback()
+        # what ingest does per rewritten chunk: subtract and re-add its rows
+        lo, hi = 1, 1 + ingest.chunk_size
+        chunk = timings(
+            lambda: (
+                rollups.apply_rows(connection, ingest.table_name, lo, hi, sign=-1),
+                rollups.apply_rows(connection, ingest.table_name, lo, hi),
+            ),
+            repeat,
+            unit=1,
+        )
+        connection.rollback()
+    return {"rebuild_s": rebuild, "chunk_refresh_s": chunk}
+
+
+def bench_tools(csv_path, db_path, arguments, repeat=1000):
+    use_database(db_path)
+    start_time = time.perf_counter()
+    numpy_engine = NumpyBackend.from_csv(
+        csv_path, os.path.splitext(csv_path)[0] + "_columnar"
+    )
+    result = {"numpy_setup_s": round(time.perf_counter() - start_time, 4)}
+
+    backends = {
+        "sqlite": helpers.available_functions,
+        "numpy": numpy_engine.functions(),
+    }
+    for name, kwargs in arguments.items():
+        expected = backends["sqlite"][name](**kwargs)
+        result[name] = {
+            "agree": same_result(backends["numpy"][name](**kwargs), expected)
+        }
+        for backend, functions in backends.items():
+            function = functions[name]
+            result[name][f"{backend}_us"] = timings(lambda: function(**kwargs), repeat)
+    return result
+
+
+# ad-hoc SQL of the kind the SQL agent writes: against the salaries_2023 view
+# (which joins every lookup table for every row) and against the storage
+# table joined only to the lookup tables the query needs
+SQL_QUERIES = {
+    "avg_salary": (
+        "SELECT AVG(Base_Salary) FROM salaries_2023",
+        "SELECT AVG(Base_Salary) FROM salaries_2023_rows",
+    ),
+    "count_women": (
+        "SELECT COUNT(*) FROM salaries_2023 WHERE Gender = 'F'",
+        "SELECT COUNT(*) FROM salaries_2023_rows AS r "
+        "JOIN dim_gender AS g ON g.code = r.Gender_code WHERE g.value = 'F'",
+    ),
+    "overtime_by_department": (
+        "SELECT Department_Name, SUM(Overtime_Pay) FROM salaries_2023 "
+        "GROUP BY Department_Name",
+        "SELECT d.value, SUM(r.Overtime_Pay) FROM salaries_2023_rows AS r "
+        "JOIN dim_department_name AS d ON d.code = r.Department_Name_code "
+        "GROUP BY d.value",
+    ),
+}
+
+
+def bench_sql(db_path, repeat=100):
+    executor = SQLiteExecutor(db_path, read_only=True)
+
+    def rows(query):
+        return sorted(list(row.values()) for row in executor.fetch_all(query))
+
+    result = {}
+    for name, (view_query, storage_query) in SQL_QUERIES.items():
+        result[name] = {"agree": same_result(rows(view_query), rows(storage_query))}
+        for path, query in (("view", view_query), ("storage", storage_query)):
+            result[name][f"{path}_ms"] = timings(
+                lambda: executor.fetch_all(query), repeat, unit=1e3
+            )
+    executor.close()
+    return result
+
+
+def bench_conversation(db_path, questions, conversations=50, latency=0.0):
+    try:
+        import fun_call_db_agent
+    except ImportError as e:
+        print(e)
+        return {"skipped": str(e)}
+
+    use_database(db_path)
+    server, base_url = fake_llm.start_server(latency=latency)
+    client = OpenAI(base_url=base_url, api_key="fake")
+    result = {"fake_llm_latency_s": latency}
+    mode = router.mode
+    try:
+        # through the LLM, then with the fast-path router answering the
+        # questions it recognizes
+        for name, router.mode in (("ms", "off"), ("routed_ms", "template")):
+            asked = iter(questions * (conversations // len(questions) + 1))
+            result[name] = timings(
+                lambda: fun_call_db_agent.run_conversation(next(asked), client),
+                conversations,
+                unit=1e3,
+            )
+    finally:
+        router.mode = mode
+        server.shutdown()
+    result["memo"] = tool_cache.memo.stats()
+    return result
+
+
+def run(workdir, rows, repeat=1000, conversations=50, skip=(), seed=0, **cardinality):
+    """Run every benchmark on a fresh dataset of `rows` rows."""
+    csv_path = os.path.join(workdir, f"salaries_{rows}.csv")
+    db_path = os.path.join(workdir, f"salary_{rows}.db")
+    for path in (db_path, db_path + "-wal", db_path + "-shm"):
+        if os.path.exists(path):
+            os.remove(path)
+    start_time = time.perf_counter()
+    synthetic.write_csv(csv_path, rows, seed=seed, **cardinality)
+    result = {
+        "rows": rows,
+        "cardinality": cardinality,
+        "generate_s": round(time.perf_counter() - start_time, 3),
+    }
+
+    # ingest always runs: the other benchmarks need the database
+    result["ingest"] = bench_ingest(csv_path, db_path, rows, seed=seed, **cardinality)
+    if "rollups" not in skip:
+        result["rollups"] = bench_rollups(db_path)
+    # tool arguments and questions that hit the largest groups of the data
+    sample = synthetic.generate(min(rows, 100_000), seed=seed, **cardinality)
+    arguments = synthetic.sample_arguments(sample)
+    if "tools" not in skip:
+        result["tools"] = bench_tools(csv_path, db_path, arguments, repeat)
+    if "sql" not in skip:
+        result["sql"] = bench_sql(db_path, max(repeat // 10, 10))
+    if "conversation" not in skip:
+        questions = synthetic.sample_questions(arguments)
+        result["conversation"] = bench_conversation(db_path, questions, conversations)
+    runtime.executor().close()
+    return result
+
+
+def environment():
+    import platform
+    import sqlite3
+    import subprocess
+
+    try:
+        revision = subprocess.run(
+            ["git", "describe", "--always", "--dirty"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = None
+    return {
+        "revision": revision,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "sqlite": sqlite3.sqlite_version,
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+    }
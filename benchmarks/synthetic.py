@@ -0,0 +1,130 @@
+import numpy as np
+import pandas as pd
+
+# Synthetic salary datasets with the schema of data/salaries_2023.csv.
+#
+# Sizes and cardinalities are configurable; the defaults match the real file
+# (42 departments, 627 divisions, 98 grades). Group sizes are skewed like the
+# real data (a few large departments, a long tail of small divisions), about
+# half of the employees have no overtime, most have no longevity pay and a
+# few have no grade.
+
+COLUMNS = [
+    "Department",
+    "Department_Name",
+    "Division",
+    "Gender",
+    "Base_Salary",
+    "Overtime_Pay",
+    "Longevity_Pay",
+    "Grade",
+]
+
+chunk_rows = 1_000_000
+
+
+def _skewed(rng, n, size, exponent=0.8):
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    return rng.choice(n, size=size, p=weights / weights.sum())
+
+
+def _grades(n):
+    # the real grades are a mix of numbers ("21") and letter codes ("M3")
+    numeric = [str(10 + i) for i in range(n // 2)]
+    letters = [f"{'MNPTF'[i % 5]}{i // 5 + 1}" for i in range(n - len(numeric))]
+    return letters + numeric
+
+
+def generate(rows, departments=42, divisions=627, grades=98, seed=0, part=0):
+    """Return a DataFrame of `rows` synthetic employees.
+
+    The departments, divisions and grades depend only on `seed`, so the parts
+    of one dataset (`part` = 0, 1, ...) share them.
+    """
+    rng = np.random.default_rng(seed)
+    department_codes = np.array([f"D{i:02d}" for i in range(departments)])
+    department_names = np.array([f"Department {i:02d}" for i in range(departments)])
+    # every division belongs to one department, named after it like the real
+    # data ("ABS 85 Administrative Services")
+    division_department = _skewed(rng, departments, divisions, exponent=0.5)
+    division_department[:departments] = np.arange(min(departments, divisions))
+    division_names = np.array(
+        [
+            f"{department_codes[d]} {10 + i % 90} Division {i}"
+            for i, d in enumerate(division_department)
+        ]
+    )
+    grade_names = np.array(_grades(grades), dtype=object)
+
+    rng = np.random.default_rng([seed, part])
+    division = _skewed(rng, divisions, rows)
+    department = division_department[division]
+    grade = grade_names[_skewed(rng, grades, rows, exponent=0.5)]
+    grade[rng.random(rows) < 0.003] = None
+
+    base_salary = np.clip(rng.normal(90_000, 31_000, rows), 11_000, 292_000)
+    overtime = np.where(
+        rng.random(rows) < 0.45, 0.0, rng.exponential(14_000, rows)
+    )
+    longevity = np.where(
+        rng.random(rows) < 0.72, 0.0, rng.exponential(5_500, rows)
+    )
+    return pd.DataFrame(
+        {
+            "Department": department_codes[department],
+            "Department_Name": department_names[department],
+            "Division": division_names[division],
+            "Gender": np.where(rng.random(rows) < 0.58, "M", "F"),
+            "Base_Salary": base_salary.round(2),
+            "Overtime_Pay": overtime.round(2),
+            "Longevity_Pay": longevity.round(2),
+            "Grade": grade,
+        },
+        columns=COLUMNS,
+    )
+
+
+def write_csv(path, rows, seed=0, **cardinality):
+    """Write a synthetic CSV in chunks of `chunk_rows` (bounded memory)."""
+    for part, start in enumerate(range(0, max(rows, 1), chunk_rows)):
+        df = generate(min(chunk_rows, rows - start), seed=seed, part=part, **cardinality)
+        df.to_csv(path, mode="a" if part else "w", header=not part, index=False)
+    return path
+
+
+def sample_arguments(df):
+    """Tool arguments that hit the largest groups of a generated dataset."""
+    return {
+        "get_avg_salary_and_female_count_for_division": {
+            "division_name": df["Division"].mode()[0]
+        },
+        "get_total_overtime_pay_for_department": {
+            "department_name": df["Department_Name"].mode()[0]
+        },
+        "get_employee_count_by_gender_in_department": {
+            "department_name": df["Department_Name"].mode()[0]
+        },
+        "get_total_longevity_pay_for_grade": {"grade": df["Grade"].mode()[0]},
+        "get_employees_with_overtime_above": {
+            "amount": float(df["Overtime_Pay"].quantile(0.9))
+        },
+    }
+
+
+def sample_questions(arguments):
+    """One question per tool, naming the values in `arguments` (see
+    sample_arguments), in the shapes fake_llm.py and router.py recognize."""
+    return [
+        "What is the total longevity pay for employees with the grade "
+        f"'{arguments['get_total_longevity_pay_for_grade']['grade']}'?",
+        "What is the total overtime pay for the "
+        f"'{arguments['get_total_overtime_pay_for_department']['department_name']}'"
+        " department?",
+        "How many employees of each gender work in "
+        f"'{arguments['get_employee_count_by_gender_in_department']['department_name']}'?",
+        "What is the average salary of women in the "
+        f"'{arguments['get_avg_salary_and_female_count_for_division']['division_name']}'"
+        " division?",
+        "Which employees have overtime pay above "
+        f"{arguments['get_employees_with_overtime_above']['amount']:.0f}?",
+    ]
@@ -0,0 +1,195 @@
+import contextlib
+import json
+import os
+import shutil
+import time
+
+try:
+    import fcntl
+except ImportError:  # not on Windows; builds are then not serialised
+    fcntl = None
+
+import numpy as np
+import pandas as pd
+
+import runtime
+from encoding import CATEGORICAL_COLUMNS, CSV_DTYPES
+
+# Columnar, memory-mapped cache of the salary CSV for the pandas agent.
+#
+# The CSV is converted once into one raw binary file per column: float64 for
+# the pay columns and integer dictionary codes for the low-cardinality string
+# columns (categories are kept in the manifest). Loading maps the files
+# copy-on-write, so start-up does no parsing, the DataFrame holds no Python
+# string objects, and every process serving the app shares the same page
+# cache pages. The cache is rebuilt when the CSV's size or mtime changes;
+# processes starting together on a stale cache take turns on a lock file, so
+# only the first one builds and the others load its result.
+
+file_url = runtime.file_url
+cache_dir = runtime.columnar_cache_dir
+
+chunk_size = 200_000
+MANIFEST = "manifest.json"
+LOCK = "build.lock"
+
+
+def _source_stamp(csv_path):
+    stat = os.stat(csv_path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _codes_dtype(n_categories):
+    # the dtype pandas itself uses for Categorical codes, so mapping the file
+    # into a Categorical does not copy it
+    if n_categories < 2**7:
+        return np.int8
+    if n_categories < 2**15:
+        return np.int16
+    return np.int32
+
+
+@contextlib.contextmanager
+def _build_lock(cache_dir):
+    # exclusive across processes; released when the file is closed
+    with open(os.path.join(cache_dir, LOCK), "w") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        yield
+
+
+def _build_time(name):
+    # build-<time_ns> -> time_ns
+    try:
+        return int(name[len("build-") :])
+    except ValueError:
+        return None
+
+
+def build(csv_path=file_url, cache_dir=cache_dir, chunksize=chunk_size):
+    """Convert `csv_path` into a new column cache; returns its manifest.
+    Call it holding the build lock (load() does)."""
+    stamp = _source_stamp(csv_path)
+    build_dir = os.path.join(cache_dir, f"build-{time.time_ns()}")
+    os.makedirs(build_dir)
+
+    files = {}
+    categories = {}  # column -> {value: code}
+    columns = None
+    rows = 0
+    try:
+        for chunk in pd.read_csv(csv_path, dtype=CSV_DTYPES, chunksize=chunksize):
+            chunk = chunk.fillna(value=0)
+            if columns is None:
+                columns = list(chunk.columns)
+                for column in columns:
+                    path = os.path.join(build_dir, column + ".bin")
+                    files[column] = open(path, "wb")
+            for column in columns:
+                if column in CATEGORICAL_COLUMNS:
+                    # factorize the chunk, then map its uniques to global codes
+                    mapping = categories.setdefault(column, {})
+                    local_codes, uniques = pd.factorize(chunk[column])
+                    to_global = np.array(
+                        [mapping.setdefault(v, len(mapping)) for v in uniques],
+                        dtype=np.int32,
+                    )
+                    files[column].write(to_global[local_codes].tobytes())
+                else:
+                    files[column].write(
+                        chunk[column].to_numpy(dtype=np.float64).tobytes()
+                    )
+            rows += len(chunk)
+    finally:
+        for f in files.values():
+            f.close()
+
+    manifest = {"source": stamp, "rows": rows, "dir": os.path.basename(build_dir)}
+    manifest["columns"] = []
+    for column in columns or []:
+        if column in CATEGORICAL_COLUMNS:
+            values = list(categories[column])
+            dtype = _codes_dtype(len(values))
+            path = os.path.join(build_dir, column + ".bin")
+            codes = np.fromfile(path, dtype=np.int32)
+            codes.astype(dtype).tofile(path)
+            # numpy scalars are not JSON serializable
+            values = [v.item() if hasattr(v, "item") else v for v in values]
+            manifest["columns"].append(
+                {"name": column, "dtype": np.dtype(dtype).name, "categories": values}
+            )
+        else:
+            manifest["columns"].append({"name": column, "dtype": "float64"})
+
+    with open(os.path.join(build_dir, MANIFEST), "w") as f:
+        json.dump(manifest, f)
+    # publish atomically, then drop the builds older than the one published
+    # before: a reader may just have resolved that one from the pointer, and
+    # mapped files of older ones stay valid on POSIX
+    pointer = os.path.join(cache_dir, MANIFEST)
+    try:
+        with open(pointer) as f:
+            previous = _build_time(json.load(f)["dir"])
+    except (FileNotFoundError, ValueError, KeyError):
+        previous = None
+    with open(pointer + ".tmp", "w") as f:
+        json.dump(manifest, f)
+    os.replace(pointer + ".tmp", pointer)
+    if previous is not None:
+        for name in os.listdir(cache_dir):
+            built = _build_time(name) if name.startswith("build-") else None
+            if built is not None and built < previous:
+                shutil.rmtree(os.path.join(cache_dir, name), ignore_errors=True)
+    return manifest
+
+
+def _current_manifest(csv_path, cache_dir):
+    try:
+        with open(os.path.join(cache_dir, MANIFEST)) as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    if manifest["source"] != _source_stamp(csv_path):
+        return None
+    return manifest
+
+
+def load(csv_path=file_url, cache_dir=cache_dir):
+    """Return the CSV as a DataFrame backed by memory-mapped column files.
+
+    Same values as pd.read_csv(csv_path).fillna(0), with the string columns
+    as pandas categoricals.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    manifest = _current_manifest(csv_path, cache_dir)
+    if manifest is None:
+        with _build_lock(cache_dir):
+            # another process may have built it while we waited
+            manifest = _current_manifest(csv_path, cache_dir) or build(
+                csv_path, cache_dir
+            )
+    build_dir = os.path.join(cache_dir, manifest["dir"])
+    rows = manifest["rows"]
+
+    data = {}
+    for column in manifest["columns"]:
+        path = os.path.join(build_dir, column["name"] + ".bin")
+        # copy-on-write: shared pages, yet the agent may still modify the frame
+        values = (
+            np.memmap(path, dtype=column["dtype"], mode="c", shape=(rows,))
+            if rows
+            else np.empty(0, dtype=column["dtype"])
+        )
+        if "categories" in column:
+            values = pd.Categorical.from_codes(
+                values, categories=pd.Index(column["categories"], dtype=object)
+            )
+        data[column["name"]] = values
+    return pd.DataFrame(data, copy=False)
+
+
+if __name__ == "__main__":
+    start_time = time.time()
+    df = load()
+    print(f"Loaded {len(df)} rows in {time.time() - start_time:.4f}s")
+    print(df.memory_usage(deep=True))
@@ -1,33 +1,37 @@
-from langchain.schema import HumanMessage, SystemMessage
-import os
-from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
-import pandas as pd
+import answer_cache
+import runtime
+import streaming
+import token_budget
+import tracing
 
-# Load environment variables from .env file
-load_dotenv()
+# The LLM, DataFrame and agent are built on first use and shared by every
+# Streamlit rerun (see runtime.py); langchain is imported only then.
 
-openai_key = os.getenv("OPENAI_API_KEY")
+llm_name = runtime.llm_name
 
-llm_name = "gpt-3.5-turbo"
-model = ChatOpenAI(api_key=openai_key, model=llm_name)
+# read csv file (memory-mapped column cache, built once per CSV version)
+file_url = runtime.file_url
 
-# read csv file
-df = pd.read_csv("./data/salaries_2023.csv").fillna(value=0)
 
-# print(df.head())
+def build_agent():
+    from langchain_experimental.agents.agent_toolkits import (
+        create_pandas_dataframe_agent,
+    )
 
-from langchain_experimental.agents.agent_toolkits import (
-    create_pandas_dataframe_agent,
-    create_csv_agent,
-)
+    return create_pandas_dataframe_agent(
+        # streams its tokens, so the final answer shows as it is written
+        llm=runtime.chat_model(streaming=True),
+        df=runtime.dataframe(),
+        verbose=True,
+    )
+
+
+def agent():
+    # rebuilt with the new DataFrame when the CSV changes
+    return runtime.get("csv_agent", build_agent, version=runtime.file_version())
 
-agent = create_pandas_dataframe_agent(
-    llm=model,
-    df=df,
-    verbose=True,
-)
-# res = agent.invoke("how many rows are there in the dataframe?")
+
+# res = agent().invoke("how many rows are there in the dataframe?")
 
 # print(res)
 
@@ -56,9 +60,47 @@ to the answer on a section that starts with: "\n\nExplanation:\n".
 In the explanation, mention the column names that you used to get
 to the final answer.
 """
+# minified once, they are sent with every step of the agent
+_prompt_prefix = token_budget.minify(CSV_PROMPT_PREFIX)
+_prompt_suffix = token_budget.minify(CSV_PROMPT_SUFFIX)
+
 QUESTION = "Which grade has the highest average base salary, and compare the average female pay vs male pay?"
 
-res = agent.invoke(CSV_PROMPT_PREFIX + QUESTION + CSV_PROMPT_SUFFIX)
+
+def answer_question(question):
+    """Run the agent, reusing the cached answer for repeat questions.
+
+    Returns (answer, from_cache)."""
+    stream, answer = stream_answer(question)
+    if stream is None:
+        return answer, True
+    for _ in stream.events():
+        pass
+    return stream.output, False
+
+
+def stream_answer(question):
+    """(None, cached answer) for a repeat question, otherwise (AgentStream,
+    None): the agent runs in the background and the answer is cached once
+    the stream is consumed."""
+    cache = answer_cache.get_cache("csv_agent")
+    version = answer_cache.file_version(file_url)
+    answer = cache.get(question, version)
+    if answer is not None:
+        return None, answer
+
+    def invoke(callbacks):
+        res = agent().invoke(
+            "\n".join([_prompt_prefix, question, _prompt_suffix]),
+            config={"callbacks": callbacks},
+        )
+        cache.put(question, res["output"], version)
+        return res
+
+    return streaming.AgentStream(invoke, callbacks=[tracing.LangChainTracer()]), None
+
+
+# res, _ = answer_question(QUESTION)
 
 # print(f"Final result: {res["output"]}")
 
@@ -67,7 +109,7 @@ import streamlit as st
 st.title("Database AI Agent with LangChain")
 
 st.write("### Dataset Preview")
-st.write(df.head())
+st.write(runtime.dataframe().head())
 
 # User input for the question
 st.write("### Ask a Question")
@@ -78,7 +120,24 @@ question = st.text_input(
 
 # Run the agent and display the result
 if st.button("Run Query"):
-    QUERY = CSV_PROMPT_PREFIX + question + CSV_PROMPT_SUFFIX
-    res = agent.invoke(QUERY)
-    st.write("### Final Answer")
-    st.markdown(res["output"])
+    with tracing.trace("question", question=question) as trace:
+        stream, answer = stream_answer(question)
+        if stream is None:
+            st.write("### Final Answer")
+            st.caption("Answered from cache")
+            st.markdown(answer)
+        else:
+            # the pandas code the agent runs and its output as they happen,
+            # then the final answer token by token
+            steps = st.status("Analyzing the data...")
+            st.write("### Final Answer")
+            st.write_stream(
+                stream.text(
+                    on_step=lambda event: steps.markdown(streaming.describe_step(event))
+                )
+            )
+            steps.update(label="Agent steps", state="complete")
+    if trace.trace is not None:
+        # where the time went: LLM calls vs DataFrame (python tool) runs
+        with st.expander("Timing breakdown"):
+            st.table(trace.trace.breakdown())
@@ -0,0 +1,119 @@
+import threading
+
+import runtime
+from executor import text
+
+# Dictionary encoding of the low-cardinality salary columns.
+#
+# Gender, Grade, Department, Department_Name and Division have a handful to a
+# few hundred distinct values. In memory they are pandas categoricals (see
+# columnar.py); in SQLite each one gets a lookup table dim_<column>(code,
+# value) and the row storage table salaries_2023_rows holds only the integer
+# codes. A view named salaries_2023 joins them back, so SQL written against
+# the original table (e.g. by the LangChain agent) keeps working, while the
+# tools in helpers.py translate names to codes and filter on integers.
+#
+# The view costs a lookup per row and categorical column, even for columns a
+# query does not use (SQLite keeps inner joins, and drops unused left joins
+# only outside aggregates): on the real data AVG(Base_Salary) over the view
+# takes about 3 ms against 1 ms on the old flat table. The SQL agent is
+# therefore told to aggregate on the storage table and join only the lookup
+# tables it needs, which is faster than the flat table (0.7 ms for the same
+# query); see bench_sql in benchmarks/suite.py.
+
+table_name = runtime.table_name
+
+CATEGORICAL_COLUMNS = ["Department", "Department_Name", "Division", "Gender", "Grade"]
+
+# read_csv dtypes: chunked reads infer types per chunk, and a chunk whose
+# grades are all numbers plus a blank would otherwise turn "21" into 21.0
+CSV_DTYPES = {column: str for column in CATEGORICAL_COLUMNS}
+
+# executor path -> (file stamp, {column: {value: code}}, {column: {code: value}})
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def dim_table(column):
+    return f"dim_{column.lower()}"
+
+
+def code_column(column):
+    return f"{column}_code"
+
+
+def storage_table(table=table_name):
+    return f"{table}_rows"
+
+
+def create_dim_tables(connection):
+    for column in CATEGORICAL_COLUMNS:
+        connection.execute(
+            text(
+                f"""
+            CREATE TABLE IF NOT EXISTS {dim_table(column)} (
+                code INTEGER PRIMARY KEY,
+                value TEXT NOT NULL UNIQUE
+            );
+            """
+            )
+        )
+
+
+def _dim_mapping(connection, column):
+    rows = connection.execute(text(f"SELECT value, code FROM {dim_table(column)}"))
+    return dict(rows.all())
+
+
+def encode_chunk(connection, chunk):
+    """Replace the categorical columns of `chunk` by their integer codes,
+    adding unseen values to the lookup tables. Returns a new DataFrame with
+    the storage table's column names."""
+    import pandas as pd  # only ingest needs it
+
+    encoded = {}
+    for column in chunk.columns:
+        if column not in CATEGORICAL_COLUMNS:
+            encoded[column] = chunk[column]
+            continue
+        # stored as TEXT, so 0 (a filled-in missing value) becomes "0"
+        values = chunk[column].astype(str)
+        connection.exec_driver_sql(
+            f"INSERT OR IGNORE INTO {dim_table(column)} (value) VALUES (?)",
+            [(v,) for v in values.unique()],
+        )
+        encoded[code_column(column)] = values.map(_dim_mapping(connection, column))
+    return pd.DataFrame(encoded)
+
+
+def _load(executor):
+    codes, values = {}, {}
+    for column in CATEGORICAL_COLUMNS:
+        rows = executor.fetch_all(f"SELECT code, value FROM {dim_table(column)}")
+        codes[column] = {row["value"]: row["code"] for row in rows}
+        values[column] = {row["code"]: row["value"] for row in rows}
+    return codes, values
+
+
+def _maps(executor):
+    stamp = executor.file_stamp()
+    with _cache_lock:
+        cached = _cache.get(executor.path)
+        if cached is None or stamp is None or cached[0] != stamp:
+            cached = (stamp, *_load(executor))
+            _cache[executor.path] = cached
+    return cached
+
+
+def code_for(executor, column, value):
+    """Integer code of `value` in `column`, or None if it does not occur."""
+    return _maps(executor)[1][column].get(str(value))
+
+
+def value_for(executor, column, code):
+    return _maps(executor)[2][column].get(code)
+
+
+def values(executor, column):
+    """All known values of `column`."""
+    return list(_maps(executor)[1][column])
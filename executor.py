@@ -0,0 +1,103 @@
+import os
+import sqlite3
+import threading
+
+import tracing
+
+# Shared read-side query executor for the tool functions.
+#
+# Every thread keeps one persistent sqlite3 connection per database, tuned with
+# WAL, mmap and a larger page cache. sqlite3 caches compiled statements per
+# connection keyed by SQL text, so constant queries with bound parameters are
+# prepared once and reused. Rows come back as plain dicts: no DataFrame is
+# built for what is usually a single aggregate row.
+
+PRAGMAS = [
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA cache_size = -65536",
+    "PRAGMA temp_store = MEMORY",
+    # tool calls only ever read
+    "PRAGMA query_only = ON",
+]
+
+statement_cache_size = 256
+
+
+def text(statement):
+    """sqlalchemy.text(statement), importing SQLAlchemy only when the schema
+    is written (ingest, migrations), not when the tools are imported."""
+    from sqlalchemy import text
+
+    return text(statement)
+
+
+class SQLiteExecutor:
+    def __init__(self, path, read_only=False):
+        self.path = path
+        # read_only opens the file with mode=ro: nothing on the connection can
+        # write, whatever SQL it is given (see sql_guard.py)
+        self.read_only = read_only
+        self._local = threading.local()
+
+    def connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            if self.read_only:
+                connection = sqlite3.connect(
+                    f"file:{self.path}?mode=ro",
+                    uri=True,
+                    cached_statements=statement_cache_size,
+                )
+            else:
+                connection = sqlite3.connect(
+                    self.path, cached_statements=statement_cache_size
+                )
+            for pragma in PRAGMAS:
+                if self.read_only and "journal_mode" in pragma:
+                    continue  # changing it is a write; readers follow the file
+                try:
+                    connection.execute(pragma)
+                except sqlite3.OperationalError as e:
+                    # e.g. WAL on a read-only file; the defaults still work
+                    print(e)
+            self._local.connection = connection
+        return connection
+
+    def fetch_all(self, query, params=()):
+        with tracing.span("sql", statement=query.strip()) as span:
+            cursor = self.connection().execute(query, params)
+            columns = [d[0] for d in cursor.description]
+            rows = [dict(zip(columns, row)) for row in cursor]
+            span.set(rows=len(rows))
+        return rows
+
+    def fetch_one(self, query, params=()):
+        with tracing.span("sql", statement=query.strip()) as span:
+            cursor = self.connection().execute(query, params)
+            row = cursor.fetchone()
+            span.set(rows=int(row is not None))
+        if row is None:
+            return None
+        return dict(zip([d[0] for d in cursor.description], row))
+
+    def file_stamp(self):
+        """(mtime, size) of the db file and its WAL; any committed write
+        changes it, so it is a cheap way to notice that the data changed."""
+        if self.path == ":memory:":
+            return None
+        stamp = []
+        for suffix in ("", "-wal"):
+            try:
+                stat = os.stat(self.path + suffix)
+                stamp.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                stamp.append(None)
+        return tuple(stamp)
+
+    def close(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
@@ -0,0 +1,285 @@
+import argparse
+import itertools
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# A tiny OpenAI-compatible chat completions server for offline testing.
+#
+# It answers POST /v1/chat/completions deterministically: when the last
+# message is from the user and tools are offered it picks a salary tool by
+# keyword and extracts the argument from the question; once tool results are
+# in the conversation it returns them as the final answer.
+#
+# A script (JSON list or JSONL file) replaces those rules with canned
+# replies: each step has an optional "role" and "when" regex tested against
+# the last message and the "message" to answer with; the first matching step
+# wins. Latency is the time to the first token, tokens_per_second paces the
+# rest of the reply (whitespace-separated words count as tokens), and
+# "stream": true requests get server-sent event chunks like the real API.
+#
+#     python fake_llm.py --latency 0.5 --tokens-per-second 50 --script s.jsonl
+#     OPENAI_BASE_URL=http://127.0.0.1:8001/v1 OPENAI_API_KEY=fake python fun_call_db_agent.py
+
+default_latency = 0.0
+default_tokens_per_second = None  # None: the whole reply at once
+
+_call_ids = itertools.count()
+
+
+def _pick_tool(question):
+    quoted = re.findall(r"'([^']+)'", question)
+    numbers = re.findall(r"\d+(?:\.\d+)?", question)
+    lowered = question.lower()
+    if "longevity" in lowered:
+        return "get_total_longevity_pay_for_grade", {
+            "grade": quoted[0] if quoted else "M3"
+        }
+    if "overtime" in lowered and ("above" in lowered or "more than" in lowered):
+        return "get_employees_with_overtime_above", {
+            "amount": float(numbers[-1]) if numbers else 1000.0
+        }
+    if "overtime" in lowered:
+        return "get_total_overtime_pay_for_department", {
+            "department_name": quoted[0] if quoted else "Alcohol Beverage Services"
+        }
+    if "gender" in lowered or "how many" in lowered:
+        return "get_employee_count_by_gender_in_department", {
+            "department_name": quoted[0] if quoted else "Alcohol Beverage Services"
+        }
+    if "division" in lowered:
+        return "get_avg_salary_and_female_count_for_division", {
+            "division_name": quoted[0] if quoted else "ABS 85 Administrative Services"
+        }
+    return None
+
+
+def default_responder(request):
+    """Build the assistant message for a chat completion request."""
+    messages = request.get("messages", [])
+    last = messages[-1] if messages else {}
+    if last.get("role") == "tool":
+        results = [m["content"] for m in messages if m.get("role") == "tool"]
+        return {"role": "assistant", "content": "Result: " + "; ".join(results)}
+    picked = _pick_tool(str(last.get("content", ""))) if request.get("tools") else None
+    if picked is None:
+        return {"role": "assistant", "content": "I don't know"}
+    name, arguments = picked
+    return {
+        "role": "assistant",
+        "content": None,
+        "tool_calls": [
+            {
+                "id": "call_0",
+                "type": "function",
+                "function": {"name": name, "arguments": json.dumps(arguments)},
+            }
+        ],
+    }
+
+
+def load_script(path):
+    """Read script steps from a JSON list or a JSONL file."""
+    with open(path) as f:
+        text = f.read()
+    try:
+        steps = json.loads(text)
+    except json.JSONDecodeError:
+        steps = [json.loads(line) for line in text.splitlines() if line.strip()]
+    return steps if isinstance(steps, list) else [steps]
+
+
+def _scripted_message(message):
+    message = {"role": "assistant", "content": None, **message}
+    tool_calls = []
+    for tool_call in message.get("tool_calls") or []:
+        function = tool_call.get("function", tool_call)
+        arguments = function.get("arguments", {})
+        tool_calls.append(
+            {
+                "id": tool_call.get("id") or f"call_{next(_call_ids)}",
+                "type": "function",
+                "function": {
+                    "name": function["name"],
+                    # scripts may give the arguments as an object
+                    "arguments": arguments
+                    if isinstance(arguments, str)
+                    else json.dumps(arguments),
+                },
+            }
+        )
+    if tool_calls:
+        message["tool_calls"] = tool_calls
+    else:
+        message.pop("tool_calls", None)
+    return message
+
+
+def scripted_responder(steps, fallback=default_responder):
+    """Responder replaying `steps`; requests no step matches go to `fallback`."""
+    compiled = [
+        (step.get("role"), re.compile(step.get("when", ""), re.IGNORECASE), step)
+        for step in steps
+    ]
+
+    def respond(request):
+        messages = request.get("messages", [])
+        last = messages[-1] if messages else {}
+        content = str(last.get("content") or "")
+        for role, when, step in compiled:
+            if (role is None or role == last.get("role")) and when.search(content):
+                return _scripted_message(step["message"])
+        return fallback(request)
+
+    return respond
+
+
+def completion(request, message):
+    prompt_tokens = sum(
+        len(str(m.get("content") or "").split()) for m in request.get("messages", [])
+    )
+    completion_tokens = len(str(message.get("content") or "").split())
+    return {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": request.get("model", "fake"),
+        "choices": [
+            {
+                "index": 0,
+                "message": message,
+                "finish_reason": "tool_calls" if message.get("tool_calls") else "stop",
+            }
+        ],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+
+def _chunk(request, delta, finish_reason=None):
+    return {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": request.get("model", "fake"),
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+
+
+def stream_chunks(request, message):
+    """Yield (tokens, chunk) pairs for a streamed reply, one token per chunk."""
+    yield 0, _chunk(request, {"role": "assistant", "content": ""})
+    content = message.get("content") or ""
+    for token in re.findall(r"\s*\S+", content):
+        yield 1, _chunk(request, {"content": token})
+    for index, tool_call in enumerate(message.get("tool_calls") or []):
+        yield 1, _chunk(request, {"tool_calls": [{"index": index, **tool_call}]})
+    finish_reason = "tool_calls" if message.get("tool_calls") else "stop"
+    yield 0, _chunk(request, {}, finish_reason)
+    if (request.get("stream_options") or {}).get("include_usage"):
+        usage = completion(request, message)["usage"]
+        yield 0, {**_chunk(request, {}), "choices": [], "usage": usage}
+
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+    # headers and body are separate writes; without this Nagle + delayed ACK
+    # add ~40 ms to every response
+    disable_nagle_algorithm = True
+    latency = default_latency
+    tokens_per_second = default_tokens_per_second
+    responder = staticmethod(default_responder)
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self.send_error(404)
+            return
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        request = json.loads(body or b"{}")
+        message = self.responder(request)
+        if self.latency:
+            time.sleep(self.latency)
+        if request.get("stream"):
+            self._stream(request, message)
+            return
+        result = completion(request, message)
+        if self.tokens_per_second:
+            time.sleep(result["usage"]["completion_tokens"] / self.tokens_per_second)
+        payload = json.dumps(result).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _stream(self, request, message):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for tokens, chunk in stream_chunks(request, message):
+            if tokens and self.tokens_per_second:
+                time.sleep(tokens / self.tokens_per_second)
+            self._write_chunk(f"data: {json.dumps(chunk)}\n\n")
+        self._write_chunk("data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _write_chunk(self, text):
+        data = text.encode()
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # load tests open hundreds of connections at once
+    request_queue_size = 1024
+
+
+def start_server(
+    host="127.0.0.1",
+    port=0,
+    latency=default_latency,
+    tokens_per_second=default_tokens_per_second,
+    script=None,
+):
+    """Serve in a daemon thread; returns (server, base_url). port=0 picks a free
+    port. `script` is a list of steps or the path of a script file."""
+    attributes = {"latency": latency, "tokens_per_second": tokens_per_second}
+    if script is not None:
+        steps = load_script(script) if isinstance(script, str) else script
+        attributes["responder"] = staticmethod(scripted_responder(steps))
+    handler = type("Handler", (FakeLLMHandler,), attributes)
+    server = FakeLLMServer((host, port), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake OpenAI chat completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument(
+        "--latency", type=float, default=default_latency, help="time to first token (s)"
+    )
+    parser.add_argument("--tokens-per-second", type=float)
+    parser.add_argument("--script", help="JSON/JSONL file of scripted replies")
+    args = parser.parse_args()
+
+    server, base_url = start_server(
+        args.host, args.port, args.latency, args.tokens_per_second, args.script
+    )
+    print(f"Fake LLM listening on {base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -1,34 +1,32 @@
-from langchain.schema import HumanMessage, SystemMessage
-import os
-from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
+import runtime
 
-# Load environment variables from .env file
-load_dotenv()
+llm_name = runtime.llm_name
 
-openai_key = os.getenv("OPENAI_API_KEY")
 
-llm_name = "gpt-3.5-turbo"
-model = ChatOpenAI(api_key=openai_key, model=llm_name)
+def example_messages():
+    # langchain is imported on first use, not with the module (see runtime.py)
+    from langchain.schema import HumanMessage, SystemMessage
 
-messages = [
-    SystemMessage(
-        content="You are a helpful assistant who is extremely competent as a Computer Scientist! Your name is Rob."
-    ),
-    HumanMessage(content="who was the very first computer scientist?"),
-]
+    return [
+        SystemMessage(
+            content="You are a helpful assistant who is extremely competent as a Computer Scientist! Your name is Rob."
+        ),
+        HumanMessage(content="who was the very first computer scientist?"),
+    ]
 
 
-# res = model.invoke(messages)
+# res = runtime.chat_model().invoke(example_messages())
 # print(res)
 
 
 def first_agent(messages):
-    res = model.invoke(messages)
+    res = runtime.chat_model().invoke(messages)
     return res
 
 
 def run_agent():
+    from langchain.schema import HumanMessage
+
     print("Simple AI Agent: Type 'exit' to quit")
     while True:
         user_input = input("You: ")
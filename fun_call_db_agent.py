@@ -1,59 +1,35 @@
-import json
-import os
-from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
-import pandas as pd
-
-from sqlalchemy import create_engine
-import numpy as np
-from sqlalchemy import text
-from openai import OpenAI
-
 import helpers
-from helpers import (
-    get_avg_salary_and_female_count_for_division,
-    get_total_overtime_pay_for_department,
-    get_total_longevity_pay_for_grade,
-    get_employee_count_by_gender_in_department,
-    get_employees_with_overtime_above,
-)
-
-
-# Load environment variables from .env file
-load_dotenv()
-
-openai_key = os.getenv("OPENAI_API_KEY")
-
-
-llm_name = "gpt-3.5-turbo"
-model = ChatOpenAI(api_key=openai_key, model=llm_name)
+import router
+import runtime
+import token_budget
+import tool_dispatch
+import tracing
 
-# for the weather function calling
-client = OpenAI(api_key=openai_key)
+# The OpenAI client and the database are set up on first use (see
+# runtime.py), so importing this module is cheap. Questions of a known shape
+# are answered by router.py without the model (or with one call instead of
+# two). Requests carry the minified tool schemas and are kept under the
+# per-request token budget (see token_budget.py).
 
-from langchain.agents import create_sql_agent
-from langchain_community.agent_toolkits.sql.toolkit import SQLDatabaseToolkit
-from langchain_community.utilities import SQLDatabase
-
-# create a db from csv file
+llm_name = runtime.llm_name
 
 # Path to your SQLite database file
-database_file_path = "./db/salary.db"
-
+database_file_path = runtime.database_file_path
+file_url = runtime.file_url
 
-# Create an engine to connect to the SQLite database
-# SQLite only requires the path to the database file
-engine = create_engine(f"sqlite:///{database_file_path}")
-file_url = "./data/salaries_2023.csv"
-os.makedirs(os.path.dirname(database_file_path), exist_ok=True)
-df = pd.read_csv(file_url).fillna(value=0)
-df.to_sql("salaries_2023", con=engine, if_exists="replace", index=False)
+tools = token_budget.compact_tools(helpers.tools_sql)
 
 
 def run_conversation(
     query="""What is the average salary and the count of female employees
     #                   in the ABS 85 Administrative Services division?""",
+    client=None,
+    stream=False,
 ):
+    """The final ChatCompletion, or with stream=True a generator of the
+    answer text as the model writes it."""
+    client = runtime.openai_client() if client is None else client
+    runtime.engine()  # load / migrate the database once per process
 
     messages = [
         # {
@@ -71,67 +47,134 @@ def run_conversation(
         # },
     ]
 
+    if stream:
+        return _stream_turns(client, messages, query)
+    with tracing.span("conversation", question=query):
+        routed = router.match(query)
+        if routed is not None:
+            text = router.run_route(routed, messages)
+            if text is not None:
+                return router.completion(text)
+            return _final_response(client, messages)
+        return _run_turns(client, messages)
+
+
+def _run_turns(client, messages):
     # Call the model with the conversation and available functions
-    response = client.chat.completions.create(
-        model=llm_name,
-        messages=messages,
-        tools=helpers.tools_sql,
-        tool_choice="auto",  # auto is default, but we'll be explicit
-    )
+    with tracing.span("llm", model=llm_name) as span:
+        response = client.chat.completions.create(
+            model=llm_name,
+            messages=token_budget.fit(messages, tools, span=span),
+            tools=tools,
+            tool_choice="auto",  # auto is default, but we'll be explicit
+        )
+        tracing.record_usage(span, response)
     response_message = response.choices[0].message
     # print(response_message.model_dump_json(indent=2))
     # print("tool calls: ", response_message.tool_calls)
 
     tool_calls = response_message.tool_calls
     if tool_calls:
-        # Step 3: call the function
-        available_functions = {
-            "get_avg_salary_and_female_count_for_division": get_avg_salary_and_female_count_for_division,
-            "get_total_overtime_pay_for_department": get_total_overtime_pay_for_department,
-            "get_total_longevity_pay_for_grade": get_total_longevity_pay_for_grade,
-            "get_employee_count_by_gender_in_department": get_employee_count_by_gender_in_department,
-            "get_employees_with_overtime_above": get_employees_with_overtime_above,
-        }
         messages.append(response_message)  # extend conversation with assistant's reply
 
-        # Step 4: send the info for each function call and function response to the model
-        for tool_call in tool_calls:
-            function_name = tool_call.function.name
-            function_to_call = available_functions[function_name]
-            function_args = json.loads(tool_call.function.arguments)
-            if function_name == "get_employees_with_overtime_above":
-                function_response = function_to_call(amount=function_args.get("amount"))
-            elif function_name == "get_total_longevity_pay_for_grade":
-                function_response = function_to_call(grade=function_args.get("grade"))
-            else:
-                function_response = function_to_call(**function_args)
-            messages.append(
-                {
-                    "tool_call_id": tool_call.id,
-                    "role": "tool",
-                    "name": function_name,
-                    "content": str(function_response),
-                }
-            )  # extend conversation with function responses
-            second_response = client.chat.completions.create(
-                model=llm_name,
-                messages=messages,
-            )  # get a new response from the model where it can see the function response
-
-        return second_response
+        # Step 3: run every tool call of this turn concurrently
+        messages.extend(tool_dispatch.run_tool_calls(tool_calls))
 
+        # Step 4: one follow-up call that sees all the function responses
+        return _final_response(client, messages)
 
-# Example calls to the functions
-if __name__ == "__main__":
-    res = (
-        run_conversation(
-            query="""What is the total longevity pay for employees with the grade 'M3'?"""
+    return response
+
+
+def _final_response(client, messages):
+    with tracing.span("llm", model=llm_name) as span:
+        response = client.chat.completions.create(
+            model=llm_name,
+            messages=token_budget.fit(messages, span=span),
+        )
+        tracing.record_usage(span, response)
+    return response
+
+
+def _stream_completion(client, messages, tools=None):
+    # yields content deltas; returns the tool calls assembled from theirs
+    params = {"tools": tools, "tool_choice": "auto"} if tools else {}
+    with tracing.span("llm", model=llm_name, stream=True) as span:
+        chunks = client.chat.completions.create(
+            model=llm_name,
+            messages=token_budget.fit(messages, tools, span=span),
+            stream=True,
+            stream_options={"include_usage": True},
+            **params,
         )
-        .choices[0]
-        .message.content
+        tool_calls = {}  # index -> {"id", "name", "arguments"}
+        for chunk in chunks:
+            if chunk.usage is not None:
+                tracing.record_usage(span, chunk)
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            if delta.content:
+                yield delta.content
+            for part in delta.tool_calls or []:
+                call = tool_calls.setdefault(
+                    part.index, {"id": None, "name": "", "arguments": ""}
+                )
+                call["id"] = part.id or call["id"]
+                if part.function is not None:
+                    call["name"] += part.function.name or ""
+                    call["arguments"] += part.function.arguments or ""
+    return [tool_calls[index] for index in sorted(tool_calls)]
+
+
+def _stream_turns(client, messages, query):
+    from openai.types.chat.chat_completion_message_tool_call import (
+        ChatCompletionMessageToolCall,
+        Function,
     )
 
-    print(res)
+    with tracing.span("conversation", question=query, stream=True):
+        routed = router.match(query)
+        if routed is not None:
+            text = router.run_route(routed, messages)
+            if text is not None:
+                yield text
+            else:
+                yield from _stream_completion(client, messages)
+            return
+        # a direct answer streams from the first call; otherwise the tool
+        # calls are assembled, run, and the follow-up answer streams
+        calls = yield from _stream_completion(client, messages, tools)
+        if not calls:
+            return
+        tool_calls = [
+            ChatCompletionMessageToolCall(
+                id=call["id"],
+                type="function",
+                function=Function(name=call["name"], arguments=call["arguments"]),
+            )
+            for call in calls
+        ]
+        messages.append(
+            {
+                "role": "assistant",
+                "content": None,
+                "tool_calls": [tool_call.model_dump() for tool_call in tool_calls],
+            }
+        )
+        messages.extend(tool_dispatch.run_tool_calls(tool_calls))
+        yield from _stream_completion(client, messages)
+
+
+# Example calls to the functions
+if __name__ == "__main__":
+    # the answer is printed as it is generated
+    for text in run_conversation(
+        query="""What is the total longevity pay for employees with the grade 'M3'?""",
+        stream=True,
+    ):
+        print(text, end="", flush=True)
+    print()
     # run_conversation()
     # Step 1: First direct call to the functions =
     # division_name = "ABS 85 Administrative Services"
@@ -1,19 +1,8 @@
-import os
-from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
 import json
-from openai import OpenAI
 
-# Load environment variables from .env file
-load_dotenv()
+import runtime
 
-openai_key = os.getenv("OPENAI_API_KEY")
-
-llm_name = "gpt-3.5-turbo"  # use this cause is cheaper!
-model = ChatOpenAI(api_key=openai_key, model=llm_name)
-
-# for the weather function calling
-client = OpenAI(api_key=openai_key)
+llm_name = runtime.llm_name  # use this cause is cheaper!
 
 
 # Example dummy function hard coded to return the same weather
@@ -62,6 +51,7 @@ def run_conversation():
             },
         }
     ]
+    client = runtime.openai_client()
     # Call the model with the conversation and available functions
     response = client.chat.completions.create(
         model="gpt-4o",
@@ -1,212 +1,195 @@
-from sqlalchemy import create_engine, text
-import pandas as pd
-import numpy as np
 import json
+import base64
+
+import encoding
+import runtime
+import schema
+import tool_registry
+
+# tool calls go through one persistent, tuned connection per thread
+# (runtime.executor()) with bound parameters (never string-formatted LLM
+# arguments); names are translated to the integer codes the storage uses
+# (see encoding.py)
+
+# rows per page returned by get_employees_with_overtime_above
+page_size = 10
+
+
+def _encode_cursor(amount, last_pay, last_rowid):
+    token = json.dumps([amount, last_pay, last_rowid]).encode()
+    return base64.urlsafe_b64encode(token).decode()
+
+
+def _decode_cursor(cursor, amount):
+    cursor_amount, last_pay, last_rowid = json.loads(base64.urlsafe_b64decode(cursor))
+    if cursor_amount != amount:
+        raise ValueError(f"cursor belongs to amount {cursor_amount}, not {amount}")
+    return last_pay, last_rowid
+
+
+def _decode_row(row):
+    # storage row -> the column names and values the model knows
+    decoded = {}
+    for column, value in row.items():
+        if column == "row_id":
+            continue
+        if column.endswith("_code"):
+            column = column[: -len("_code")]
+            value = encoding.value_for(runtime.executor(), column, value)
+        decoded[column] = value
+    return decoded
+
+
+def get_employees_with_overtime_above(amount, cursor=None):
+    # a bounded summary plus one page of rows; the full row list used to blow
+    # past the model's context ("request too large"). Database errors
+    # propagate, so they are reported instead of memoized as "no employees".
+    empty = {"count": 0, "employees": [], "next_cursor": None}
+    amount = float(amount)
+    query, _ = schema.TOOL_QUERIES["get_employees_with_overtime_above"]
+    executor = runtime.executor()
+    summary = executor.fetch_one(query, {"amount": amount})
+    if not summary or not summary["count"]:
+        return empty
 
-# Create an engine to connect to the SQLite database
-database_file_path = "./db/salary.db"
-engine = create_engine(f"sqlite:///{database_file_path}")
-
-
-tools_sql = [
-    {
-        "type": "function",
-        "function": {
-            "name": "get_avg_salary_and_female_count_for_division",
-            "description": """Retrieves the average salary and the count of 
-                              female employees in a specific division.""",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "division_name": {
-                        "type": "string",
-                        "description": """The name of the division 
-                                          (e.g., 'ABS 85 Administrative Services').""",
-                    }
-                },
-                "required": ["division_name"],
-            },
-        },
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "get_total_overtime_pay_for_department",
-            "description": """Retrieves the total overtime pay for a 
-                              specific department.""",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "department_name": {
-                        "type": "string",
-                        "description": """The name of the department
-                                          (e.g., 'Alcohol Beverage Services').""",
-                    }
-                },
-                "required": ["department_name"],
-            },
-        },
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "get_total_longevity_pay_for_grade",
-            "description": """Retrieves the total longevity pay for a 
-                              specific grade.""",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "grade": {
-                        "type": "string",
-                        "description": """The grade of the employees
-                                          (e.g., 'M3', 'N25').""",
-                    }
-                },
-                "required": ["grade"],
-            },
-        },
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "get_employee_count_by_gender_in_department",
-            "description": """Retrieves the count of employees by gender 
-                              in a specific department.""",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "department_name": {
-                        "type": "string",
-                        "description": """The name of the department
-                                          (e.g., 'Alcohol Beverage Services').""",
-                    }
-                },
-                "required": ["department_name"],
-            },
-        },
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "get_employees_with_overtime_above",
-            "description": """Retrieves the employees with overtime pay 
-                              above a specified amount.""",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "amount": {
-                        "type": "number",
-                        "description": """The minimum amount of overtime pay
-                                          (e.g., 1000.0).""",
-                    }
-                },
-                "required": ["amount"],
-            },
+    try:
+        last_pay, last_rowid = (
+            _decode_cursor(cursor, amount) if cursor else (1e308, 1 << 62)
+        )
+    except (ValueError, TypeError) as e:
+        return {"error": f"Invalid cursor: {e}"}
+    query, _ = schema.TOOL_QUERIES["get_employees_with_overtime_above (page)"]
+    rows = executor.fetch_all(
+        query,
+        {
+            "amount": amount,
+            "last_pay": last_pay,
+            "last_rowid": last_rowid,
+            "limit": page_size + 1,
         },
-    },
+    )
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = _encode_cursor(
+            amount, rows[-1]["Overtime_Pay"], rows[-1]["row_id"]
+        )
+    rows = [_decode_row(row) for row in rows]
+
+    total = summary["total_overtime_pay"]
+    return {
+        "count": summary["count"],
+        "total_overtime_pay": round(total, 2),
+        "avg_overtime_pay": round(total / summary["count"], 2),
+        "max_overtime_pay": summary["max_overtime_pay"],
+        "employees": rows,
+        "next_cursor": next_cursor,
+    }
+
+
+# every tool the agents can call; the aggregate ones are declared (see
+# tool_registry.py), which generates their schema, validation, and the rollup
+# lookup or indexed query that answers them
+TOOLS = [
+    tool_registry.Tool(
+        "get_avg_salary_and_female_count_for_division",
+        "Retrieves the average salary and the count of female employees in a "
+        "specific division.",
+        params=[
+            tool_registry.Param(
+                "division_name",
+                "The name of the division (e.g., 'ABS 85 Administrative Services').",
+                column="Division",
+            )
+        ],
+        where={"Gender": "F"},
+        aggregates=[
+            tool_registry.Aggregate("avg_salary", "avg", "Base_Salary"),
+            tool_registry.Aggregate("female_count", "count"),
+        ],
+        empty=json.dumps({"avg_salary": float("nan"), "female_count": 0}),
+    ),
+    tool_registry.Tool(
+        "get_total_overtime_pay_for_department",
+        "Retrieves the total overtime pay for a specific department.",
+        params=[
+            tool_registry.Param(
+                "department_name",
+                "The name of the department (e.g., 'Alcohol Beverage Services').",
+                column="Department_Name",
+            )
+        ],
+        aggregates=[
+            tool_registry.Aggregate("total_overtime_pay", "sum", "Overtime_Pay", digits=2)
+        ],
+    ),
+    tool_registry.Tool(
+        "get_total_longevity_pay_for_grade",
+        "Retrieves the total longevity pay for a specific grade.",
+        params=[
+            tool_registry.Param(
+                "grade", "The grade of the employees (e.g., 'M3', 'N25').", column="Grade"
+            )
+        ],
+        aggregates=[
+            tool_registry.Aggregate(
+                "total_longevity_pay", "sum", "Longevity_Pay", digits=2
+            )
+        ],
+    ),
+    tool_registry.Tool(
+        "get_employee_count_by_gender_in_department",
+        "Retrieves the count of employees by gender in a specific department.",
+        params=[
+            tool_registry.Param(
+                "department_name",
+                "The name of the department (e.g., 'Alcohol Beverage Services').",
+                column="Department_Name",
+            )
+        ],
+        group_by="Gender",
+        aggregates=[tool_registry.Aggregate("employee_count", "count")],
+    ),
+    tool_registry.FunctionTool(
+        "get_employees_with_overtime_above",
+        "Retrieves how many employees have overtime pay above a specified "
+        "amount, their total and maximum overtime pay, and the top earners one "
+        "page at a time (highest overtime first).",
+        params=[
+            tool_registry.Param(
+                "amount",
+                "The minimum amount of overtime pay (e.g., 1000.0).",
+                type="number",
+            ),
+            tool_registry.Param(
+                "cursor",
+                "The next_cursor value from a previous call, to get the next "
+                "page of employees.",
+                required=False,
+            ),
+        ],
+        function=get_employees_with_overtime_above,
+    ),
 ]
 
+tools_sql = tool_registry.schemas(TOOLS)
 
-def get_avg_salary_and_female_count_for_division(division_name):
-    try:
-        query = f"""
-        SELECT AVG(Base_Salary) AS avg_salary, COUNT(*) AS female_count
-        FROM salaries_2023
-        WHERE Division = '{division_name}' AND Gender = 'F';
-        """
-        query = text(query)
-
-        with engine.connect() as connection:
-            result = pd.read_sql_query(query, connection)
-        if not result.empty:
-
-            return result.to_dict("records")[0]
-        else:
-            return json.dumps({"avg_salary": np.nan, "female_count": 0})
-            # return {"avg_salary": np.nan, "female_count": 0}
-    except Exception as e:
-        print(e)
-        return json.dumps({"avg_salary": np.nan, "female_count": 0})
-        # return {"avg_salary": np.nan, "female_count": 0}
-
-
-def get_total_overtime_pay_for_department(department_name):
-    try:
-        query = f"""
-        SELECT SUM(Overtime_Pay) AS total_overtime_pay
-        FROM salaries_2023
-        WHERE Department_Name = '{department_name}';
-        """
-        query = text(query)
-
-        with engine.connect() as connection:
-            result = pd.read_sql_query(query, connection)
-        if not result.empty:
-
-            return result.to_dict("records")[0]
-        else:
-            return {"total_overtime_pay": 0}
-    except Exception as e:
-        print(e)
-        return {"total_overtime_pay": 0}
-
-
-def get_employees_with_overtime_above(amount):
-    try:
-        query = f"""
-        SELECT * 
-        FROM salaries_2023
-        WHERE Overtime_Pay > {amount};
-        """
-        query = text(query)
-
-        with engine.connect() as connection:
-            result = pd.read_sql_query(query, connection)
-        if not result.empty:
-            return result.to_dict("records")
-        else:
-            return []
-    except Exception as e:
-        print(e)
-        return []
-
-
-def get_employee_count_by_gender_in_department(department_name):
-    try:
-        query = f"""
-        SELECT Gender, COUNT(*) AS employee_count
-        FROM salaries_2023
-        WHERE Department_Name = '{department_name}'
-        GROUP BY Gender;
-        """
-        query = text(query)
-
-        with engine.connect() as connection:
-            result = pd.read_sql_query(query, connection)
-        if not result.empty:
-            return result.to_dict("records")
-        else:
-            return []
-    except Exception as e:
-        print(e)
-        return []
-
-
-def get_total_longevity_pay_for_grade(grade):
-    try:
-        query = f"""
-        SELECT SUM(Longevity_Pay) AS total_longevity_pay
-        FROM salaries_2023
-        WHERE Grade = '{grade}';
-        """
-        query = text(query)
-
-        with engine.connect() as connection:
-            result = pd.read_sql_query(query, connection)
-        if not result.empty:
-            return result.to_dict("records")[0]
-        else:
-            return {"total_longevity_pay": 0}
-    except Exception as e:
-        print(e)
-        return {"total_longevity_pay": 0}
+# name -> callable for every tool declared in tools_sql
+available_functions = tool_registry.functions(TOOLS, runtime.executor)
+
+# the declared tools under their old module-level names
+get_avg_salary_and_female_count_for_division = available_functions[
+    "get_avg_salary_and_female_count_for_division"
+]
+get_total_overtime_pay_for_department = available_functions[
+    "get_total_overtime_pay_for_department"
+]
+get_total_longevity_pay_for_grade = available_functions[
+    "get_total_longevity_pay_for_grade"
+]
+get_employee_count_by_gender_in_department = available_functions[
+    "get_employee_count_by_gender_in_department"
+]
+get_employees_with_overtime_above = available_functions[
+    "get_employees_with_overtime_above"
+]
@@ -0,0 +1,305 @@
+import hashlib
+import os
+import time
+
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+import encoding
+import helpers
+import rollups
+import runtime
+import schema
+import schema_cache
+import tool_registry
+
+# Incremental CSV -> SQLite loader for the salary table.
+#
+# The CSV is fingerprinted (size, mtime, sha256) and the fingerprint is kept in
+# the database next to the data. Startup against an already-loaded db only
+# costs an os.stat(); when the file changes it is streamed in fixed-size row
+# chunks and only the chunks whose content digest differs are rewritten, each
+# one in its own transaction, so memory stays bounded by the chunk size. The
+# aggregate rollups (rollups.py) are adjusted inside the same transactions.
+# Rows are stored dictionary encoded (encoding.py); the table name is a view.
+# The schema description given to the SQL agent (schema_cache.py) is rebuilt
+# together with the fingerprint.
+
+database_file_path = runtime.database_file_path
+file_url = runtime.file_url
+table_name = runtime.table_name
+
+chunk_size = 50_000
+hash_block_size = 1 << 20
+
+META_TABLE = "_ingest_meta"
+CHUNKS_TABLE = "_ingest_chunks"
+
+
+def file_fingerprint(csv_path, prefix_size=None):
+    """Return size, mtime and sha256 of the file, plus the sha256 of its
+    first `prefix_size` bytes when asked (used to detect pure appends)."""
+    stat = os.stat(csv_path)
+    digest = hashlib.sha256()
+    prefix_digest = hashlib.sha256().hexdigest() if prefix_size == 0 else None
+    read = 0
+    with open(csv_path, "rb") as f:
+        while True:
+            block = f.read(hash_block_size)
+            if not block:
+                break
+            if prefix_size and read < prefix_size <= read + len(block):
+                head = digest.copy()
+                head.update(block[: prefix_size - read])
+                prefix_digest = head.hexdigest()
+            digest.update(block)
+            read += len(block)
+    return {
+        "size": stat.st_size,
+        "mtime": stat.st_mtime,
+        "sha256": digest.hexdigest(),
+        "prefix_sha256": prefix_digest,
+    }
+
+
+def chunk_digest(chunk):
+    # content hash of the parsed rows, independent of the DataFrame index
+    hashed = pd.util.hash_pandas_object(chunk, index=False).values
+    return hashlib.sha1(hashed.tobytes()).hexdigest()
+
+
+def _create_meta_tables(connection):
+    connection.execute(
+        text(
+            f"""
+        CREATE TABLE IF NOT EXISTS {META_TABLE} (
+            table_name TEXT PRIMARY KEY,
+            csv_path TEXT,
+            size INTEGER,
+            mtime REAL,
+            sha256 TEXT,
+            rows INTEGER,
+            chunk_size INTEGER,
+            loaded_at REAL
+        );
+        """
+        )
+    )
+    connection.execute(
+        text(
+            f"""
+        CREATE TABLE IF NOT EXISTS {CHUNKS_TABLE} (
+            table_name TEXT,
+            chunk_no INTEGER,
+            rows INTEGER,
+            digest TEXT,
+            PRIMARY KEY (table_name, chunk_no)
+        );
+        """
+        )
+    )
+
+
+def _table_exists(connection, table):
+    row = connection.execute(
+        text("SELECT 1 FROM sqlite_master WHERE name = :name"),
+        {"name": table},
+    ).first()
+    return row is not None
+
+
+def read_meta(engine, table=table_name):
+    """Return the stored fingerprint for `table`, or None if it was never loaded."""
+    with engine.begin() as connection:
+        _create_meta_tables(connection)
+        row = connection.execute(
+            text(f"SELECT * FROM {META_TABLE} WHERE table_name = :table"),
+            {"table": table},
+        ).mappings().first()
+        if row is None or not _table_exists(connection, table):
+            return None
+        return dict(row)
+
+
+def data_version(engine, table=table_name):
+    """Content hash of the CSV the table was last loaded from (None if not loaded)."""
+    meta = read_meta(engine, table)
+    return meta["sha256"] if meta else None
+
+
+def _stored_chunks(connection, table):
+    rows = connection.execute(
+        text(
+            f"SELECT chunk_no, rows, digest FROM {CHUNKS_TABLE} WHERE table_name = :table"
+        ),
+        {"table": table},
+    ).all()
+    return {chunk_no: (n, digest) for chunk_no, n, digest in rows}
+
+
+def _write_chunk(connection, table, chunk_no, first_rowid, chunk, old_rows):
+    # rows are addressed by rowid = line number in the CSV, so a changed chunk
+    # can be swapped in place without touching its neighbours
+    storage = encoding.storage_table(table)
+    if old_rows:
+        rollups.apply_rows(
+            connection, table, first_rowid, first_rowid + old_rows, sign=-1
+        )
+        connection.execute(
+            text(f"DELETE FROM {storage} WHERE rowid >= :lo AND rowid < :hi"),
+            {"lo": first_rowid, "hi": first_rowid + old_rows},
+        )
+    chunk = encoding.encode_chunk(connection, chunk)
+    columns = ", ".join(f'"{c}"' for c in chunk.columns)
+    placeholders = ", ".join("?" for _ in range(len(chunk.columns) + 1))
+    rows = [
+        (first_rowid + i, *values)
+        for i, values in enumerate(chunk.itertuples(index=False, name=None))
+    ]
+    connection.exec_driver_sql(
+        f"INSERT INTO {storage} (rowid, {columns}) VALUES ({placeholders})", rows
+    )
+    rollups.apply_rows(connection, table, first_rowid, first_rowid + len(rows))
+
+
+def ensure_loaded(
+    csv_path=file_url, engine=None, table=table_name, chunksize=chunk_size
+):
+    """Bring `table` in sync with `csv_path`, doing as little work as possible.
+
+    Returns a dict with the outcome: status is "unchanged", "appended",
+    "updated" or "created", plus the number of rows written and total rows.
+    """
+    start_time = time.time()
+    if engine is None:
+        os.makedirs(os.path.dirname(database_file_path), exist_ok=True)
+        engine = create_engine(f"sqlite:///{database_file_path}")
+
+    schema.migrate(engine, table)
+    # indexes of the declared tools, including ones added since the migrations
+    schema.ensure_indexes(engine, tool_registry.indexes(helpers.TOOLS), table)
+    meta = read_meta(engine, table)
+    if meta and meta["chunk_size"] != chunksize:
+        meta = None  # chunk digests are not comparable, start over
+
+    stat = os.stat(csv_path)
+    if meta and meta["size"] == stat.st_size and meta["mtime"] == stat.st_mtime:
+        return {
+            "status": "unchanged",
+            "rows_written": 0,
+            "rows": meta["rows"],
+            "seconds": time.time() - start_time,
+        }
+
+    fingerprint = file_fingerprint(
+        csv_path, prefix_size=meta["size"] if meta and stat.st_size > meta["size"] else None
+    )
+
+    if meta and fingerprint["sha256"] == meta["sha256"]:
+        # touched but not modified
+        status, first_chunk = "unchanged", None
+    elif meta and fingerprint["prefix_sha256"] == meta["sha256"]:
+        # pure append: every full chunk before the old tail is still valid
+        status, first_chunk = "appended", meta["rows"] // chunksize
+    elif meta:
+        status, first_chunk = "updated", 0
+    else:
+        status, first_chunk = "created", 0
+
+    rows_written = 0
+    total_rows = meta["rows"] if meta else 0
+    if first_chunk is not None:
+        with engine.begin() as connection:
+            if status == "created":
+                # keep the typed schema, indexes and lookup tables, drop
+                # only the rows
+                connection.execute(
+                    text(f"DELETE FROM {encoding.storage_table(table)}")
+                )
+                rollups.clear(connection, table)
+                connection.execute(
+                    text(f"DELETE FROM {CHUNKS_TABLE} WHERE table_name = :table"),
+                    {"table": table},
+                )
+            stored = _stored_chunks(connection, table)
+
+        reader = pd.read_csv(
+            csv_path,
+            dtype=encoding.CSV_DTYPES,
+            chunksize=chunksize,
+            skiprows=range(1, first_chunk * chunksize + 1) if first_chunk else None,
+        )
+        chunk_no = first_chunk
+        total_rows = first_chunk * chunksize
+        for chunk in reader:
+            chunk = chunk.fillna(value=0)
+            digest = chunk_digest(chunk)
+            old_rows, old_digest = stored.get(chunk_no, (0, None))
+            if digest != old_digest:
+                with engine.begin() as connection:
+                    _write_chunk(
+                        connection, table, chunk_no, total_rows + 1, chunk, old_rows
+                    )
+                    connection.execute(
+                        text(
+                            f"INSERT OR REPLACE INTO {CHUNKS_TABLE} "
+                            "VALUES (:table, :chunk_no, :rows, :digest)"
+                        ),
+                        {
+                            "table": table,
+                            "chunk_no": chunk_no,
+                            "rows": len(chunk),
+                            "digest": digest,
+                        },
+                    )
+                rows_written += len(chunk)
+            total_rows += len(chunk)
+            chunk_no += 1
+
+        # the file may have shrunk
+        with engine.begin() as connection:
+            rollups.apply_rows(connection, table, total_rows + 1, sign=-1)
+            connection.execute(
+                text(f"DELETE FROM {encoding.storage_table(table)} WHERE rowid > :rows"),
+                {"rows": total_rows},
+            )
+            connection.execute(
+                text(
+                    f"DELETE FROM {CHUNKS_TABLE} "
+                    "WHERE table_name = :table AND chunk_no >= :chunk_no"
+                ),
+                {"table": table, "chunk_no": chunk_no},
+            )
+        if rows_written:
+            schema.analyze(engine, table)
+
+    with engine.begin() as connection:
+        connection.execute(
+            text(
+                f"INSERT OR REPLACE INTO {META_TABLE} VALUES "
+                "(:table, :csv_path, :size, :mtime, :sha256, :rows, :chunk_size, :loaded_at)"
+            ),
+            {
+                "table": table,
+                "csv_path": csv_path,
+                "size": fingerprint["size"],
+                "mtime": fingerprint["mtime"],
+                "sha256": fingerprint["sha256"],
+                "rows": total_rows,
+                "chunk_size": chunksize,
+                "loaded_at": time.time(),
+            },
+        )
+        if status != "unchanged":
+            schema_cache.refresh(connection, fingerprint["sha256"], table)
+
+    return {
+        "status": status,
+        "rows_written": rows_written,
+        "rows": total_rows,
+        "seconds": time.time() - start_time,
+    }
+
+
+if __name__ == "__main__":
+    print(ensure_loaded())
@@ -0,0 +1,95 @@
+import argparse
+import asyncio
+import json
+import time
+
+from openai import AsyncOpenAI
+
+import fake_llm
+import ingest
+import router
+from async_agent import arun_conversation
+from stats import percentile
+
+# Load test for the async agent: drives N conversations with bounded
+# concurrency against the local fake LLM server and reports throughput and
+# latency percentiles. Only the agent overhead (prompt building, tool dispatch,
+# DB time) and the configured fake model latency are measured.
+
+QUESTIONS = [
+    "What is the total longevity pay for employees with the grade 'M3'?",
+    "What is the total overtime pay for the 'Alcohol Beverage Services' department?",
+    "How many employees of each gender work in 'Alcohol Beverage Services'?",
+    "What is the average salary of women in the 'ABS 85 Administrative Services' division?",
+    "Which employees have overtime pay above 90000?",
+]
+
+
+async def run_load_test(base_url, conversations=200, concurrency=50):
+    client = AsyncOpenAI(api_key="fake", base_url=base_url, max_retries=0)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one(i):
+        nonlocal errors
+        async with semaphore:
+            start_time = time.perf_counter()
+            try:
+                await arun_conversation(QUESTIONS[i % len(QUESTIONS)], client=client)
+            except Exception as e:
+                errors += 1
+                print(e)
+                return
+            latencies.append(time.perf_counter() - start_time)
+
+    start_time = time.perf_counter()
+    await asyncio.gather(*[one(i) for i in range(conversations)])
+    elapsed = time.perf_counter() - start_time
+    await client.close()
+
+    return {
+        "conversations": conversations,
+        "concurrency": concurrency,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "throughput_per_s": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2) if latencies else None,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Load test the async agent against a fake LLM"
+    )
+    parser.add_argument("-n", "--conversations", type=int, default=200)
+    parser.add_argument("-c", "--concurrency", type=int, default=50)
+    parser.add_argument(
+        "--latency", type=float, default=0.2, help="fake LLM latency per call (s)"
+    )
+    parser.add_argument("--tokens-per-second", type=float)
+    parser.add_argument("--script", help="JSON/JSONL file of scripted replies")
+    parser.add_argument("--base-url", help="use an already running server instead")
+    parser.add_argument(
+        "--router",
+        choices=["off", "template", "llm"],
+        default="off",
+        help="fast-path routing (off: every question goes through the LLM)",
+    )
+    args = parser.parse_args()
+    router.mode = args.router
+
+    # the tools need the database loaded and migrated, as the agents do
+    ingest.ensure_loaded()
+
+    base_url = args.base_url
+    if base_url is None:
+        server, base_url = fake_llm.start_server(
+            latency=args.latency,
+            tokens_per_second=args.tokens_per_second,
+            script=args.script,
+        )
+
+    result = asyncio.run(run_load_test(base_url, args.conversations, args.concurrency))
+    print(json.dumps(result, indent=2))
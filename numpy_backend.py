@@ -0,0 +1,197 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+import columnar
+import helpers
+import rollups
+
+# In-process NumPy engine for the tool functions.
+#
+# The salary columns are kept as contiguous float64 arrays and every
+# categorical column as an integer group index (np.unique inverse indices).
+# Per (dimension value, gender) counts and pay sums are reduced once with
+# np.bincount, so the aggregate tools are array lookups; the overtime tool
+# binary-searches a presorted copy of Overtime_Pay with prefix sums. Results
+# (including pagination cursors) are the same as the SQLite tools in
+# helpers.py.
+
+DIMENSIONS = rollups.DIMENSIONS
+PAY_COLUMNS = rollups.PAY_COLUMNS
+ROW_COLUMNS = ["Department_Name", "Division", "Grade", "Gender"]
+
+
+def _factorize(column):
+    """(labels, inverse) of a column, labels as the strings SQLite stores."""
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        # unique over the small integer codes instead of the strings
+        uniques, inverse = np.unique(column.cat.codes.to_numpy(), return_inverse=True)
+        labels = column.cat.categories.to_numpy()[uniques]
+    else:
+        labels, inverse = np.unique(column.astype(str).to_numpy(), return_inverse=True)
+    return np.array([str(v) for v in labels], dtype=object), inverse
+
+
+class NumpyBackend:
+    name = "numpy"
+
+    def __init__(self, df, version=None):
+        # fingerprint of the data the arrays hold (see backends.py)
+        self.version = version
+        self.rows = len(df)
+        self.pay = {
+            c: np.ascontiguousarray(df[c].to_numpy(dtype=np.float64))
+            for c in PAY_COLUMNS
+        }
+        self.labels, self.inverse, self.codes = {}, {}, {}
+        for column in set(DIMENSIONS + ROW_COLUMNS):
+            labels, inverse = _factorize(df[column])
+            self.labels[column] = labels
+            self.inverse[column] = inverse
+            self.codes[column] = {label: i for i, label in enumerate(labels)}
+
+        # dimension -> {"n": (groups, genders) counts, pay column: sums}
+        genders = len(self.labels["Gender"])
+        self.groups = {}
+        for dimension in DIMENSIONS:
+            size = len(self.labels[dimension]) * genders
+            index = self.inverse[dimension] * genders + self.inverse["Gender"]
+            stats = {"n": np.bincount(index, minlength=size).reshape(-1, genders)}
+            for column in PAY_COLUMNS:
+                stats[column] = np.bincount(
+                    index, weights=self.pay[column], minlength=size
+                ).reshape(-1, genders)
+            self.groups[dimension] = stats
+
+        # overtime ascending by (Overtime_Pay, rowid); rowid = CSV line number
+        # as in the SQLite storage
+        order = np.argsort(self.pay["Overtime_Pay"], kind="stable")
+        self.overtime_order = order
+        self.overtime_sorted = self.pay["Overtime_Pay"][order]
+        self.overtime_rowids = order + 1
+        self.overtime_cumsum = np.concatenate(([0.0], np.cumsum(self.overtime_sorted)))
+
+    @classmethod
+    def from_csv(cls, csv_path=columnar.file_url, cache_dir=columnar.cache_dir):
+        stat = os.stat(csv_path)
+        return cls(
+            columnar.load(csv_path, cache_dir),
+            version=(csv_path, stat.st_size, stat.st_mtime_ns),
+        )
+
+    def data_version(self):
+        return self.version
+
+    def _group(self, dimension, value):
+        """Row of per-gender stats for one dimension value, or None."""
+        code = self.codes[dimension].get(str(value))
+        if code is None:
+            return None
+        stats = self.groups[dimension]
+        return {k: v[code] for k, v in stats.items()}
+
+    def get_avg_salary_and_female_count_for_division(self, division_name):
+        group = self._group("Division", division_name)
+        female = self.codes["Gender"].get("F")
+        if group is not None and female is not None and group["n"][female]:
+            n = int(group["n"][female])
+            return {
+                "avg_salary": float(group["Base_Salary"][female]) / n,
+                "female_count": n,
+            }
+        return json.dumps({"avg_salary": np.nan, "female_count": 0})
+
+    def get_total_overtime_pay_for_department(self, department_name):
+        group = self._group("Department_Name", department_name)
+        if group is None:
+            return {"total_overtime_pay": 0}
+        return {"total_overtime_pay": round(float(group["Overtime_Pay"].sum()), 2)}
+
+    def get_employee_count_by_gender_in_department(self, department_name):
+        group = self._group("Department_Name", department_name)
+        if group is None:
+            return []
+        counts = {
+            label: int(n) for label, n in zip(self.labels["Gender"], group["n"]) if n
+        }
+        return [
+            {"Gender": gender, "employee_count": counts[gender]}
+            for gender in sorted(counts)
+        ]
+
+    def get_total_longevity_pay_for_grade(self, grade):
+        group = self._group("Grade", grade)
+        if group is None:
+            return {"total_longevity_pay": 0}
+        return {"total_longevity_pay": round(float(group["Longevity_Pay"].sum()), 2)}
+
+    def get_employees_with_overtime_above(self, amount, cursor=None):
+        empty = {"count": 0, "employees": [], "next_cursor": None}
+        amount = float(amount)
+        pays, rowids = self.overtime_sorted, self.overtime_rowids
+        lo = int(np.searchsorted(pays, amount, side="right"))
+        count = self.rows - lo
+        if not count:
+            return empty
+
+        # rows strictly before the cursor in (Overtime_Pay, rowid) DESC order
+        # are those below it in the ascending arrays
+        hi = self.rows
+        if cursor:
+            try:
+                last_pay, last_rowid = helpers._decode_cursor(cursor, amount)
+            except (ValueError, TypeError) as e:
+                return {"error": f"Invalid cursor: {e}"}
+            start = int(np.searchsorted(pays, last_pay, side="left"))
+            end = int(np.searchsorted(pays, last_pay, side="right"))
+            hi = start + int(np.searchsorted(rowids[start:end], last_rowid))
+        first = max(lo, hi - helpers.page_size)
+        page = self.overtime_order[first:hi][::-1]
+
+        employees = [
+            {
+                **{c: self.labels[c][self.inverse[c][i]] for c in ROW_COLUMNS},
+                "Overtime_Pay": float(pays_i),
+            }
+            for i, pays_i in zip(page, self.pay["Overtime_Pay"][page])
+        ]
+        next_cursor = None
+        if first > lo:
+            next_cursor = helpers._encode_cursor(
+                amount, employees[-1]["Overtime_Pay"], int(page[-1]) + 1
+            )
+        total = float(self.overtime_cumsum[-1] - self.overtime_cumsum[lo])
+        return {
+            "count": count,
+            "total_overtime_pay": round(total, 2),
+            "avg_overtime_pay": round(total / count, 2),
+            "max_overtime_pay": float(pays[-1]),
+            "employees": employees,
+            "next_cursor": next_cursor,
+        }
+
+    def functions(self):
+        # the same argument validation as the SQLite tools (see
+        # tool_registry.py); tools without an array implementation run on SQLite
+        return {
+            tool.name: tool.validated(getattr(self, tool.name))
+            if hasattr(self, tool.name)
+            else helpers.available_functions[tool.name]
+            for tool in helpers.TOOLS
+        }
+
+
+# csv path -> (size, mtime, backend); rebuilt when the CSV changes
+_instances = {}
+
+
+def get(csv_path=columnar.file_url, cache_dir=columnar.cache_dir):
+    stat = os.stat(csv_path)
+    cached = _instances.get(csv_path)
+    if cached is None or cached[:2] != (stat.st_size, stat.st_mtime_ns):
+        backend = NumpyBackend.from_csv(csv_path, cache_dir)
+        cached = (stat.st_size, stat.st_mtime_ns, backend)
+        _instances[csv_path] = cached
+    return cached[2]
@@ -0,0 +1,44 @@
+import token_budget
+
+# Keeps tool results small enough for the model's context.
+#
+# Every tool result passes through shape() before it is serialized into a
+# tool message. Long row lists are replaced by their count plus the first
+# rows, and anything still over the character budget (measured on the
+# compact serialization, see token_budget.serialize) is cut down row by row
+# (or, as a last resort, truncated as text) with an explicit marker so the
+# model knows it did not see everything.
+
+max_rows = 20
+max_chars = 4000
+
+
+def _size(result):
+    return len(token_budget.serialize(result))
+
+
+def _shrink_rows(result, rows_key, budget):
+    rows = result[rows_key]
+    while rows and _size(result) > budget:
+        rows = rows[: len(rows) // 2] if len(rows) > 1 else []
+        result = {**result, rows_key: rows, "truncated": True}
+    return result
+
+
+def shape(result, max_rows=max_rows, max_chars=max_chars):
+    """Return a bounded version of a tool result (the input is not modified)."""
+    if isinstance(result, list) and len(result) > max_rows:
+        result = {"count": len(result), "rows": result[:max_rows], "truncated": True}
+    if _size(result) <= max_chars:
+        return result
+
+    if isinstance(result, list):
+        result = {"count": len(result), "rows": result, "truncated": True}
+    if isinstance(result, dict):
+        for key, value in result.items():
+            if isinstance(value, list):
+                result = _shrink_rows(result, key, max_chars)
+                break
+        if _size(result) <= max_chars:
+            return result
+    return token_budget.serialize(result)[:max_chars] + " ...[truncated]"
@@ -0,0 +1,136 @@
+import encoding
+import runtime
+from executor import text
+
+# Materialized aggregate rollups for the salary table.
+#
+# For every (dimension value, gender) pair we keep the row count and, for each
+# pay column, the sum and sum of squares. ingest.py maintains the rollups in the
+# same transaction that rewrites a chunk of rows (subtract the old rows, add the
+# new ones), so they never drift from the table. Readers load the whole rollup
+# into a dict once and only reload it when the database file changes, which
+# makes the aggregate tools in helpers.py plain dictionary lookups. Keys and
+# genders are the integer codes of the encoded storage (see encoding.py).
+
+table_name = runtime.table_name
+
+DIMENSIONS = ["Division", "Department_Name", "Grade"]
+PAY_COLUMNS = ["Base_Salary", "Overtime_Pay", "Longevity_Pay"]
+
+STAT_COLUMNS = ["n"] + [
+    f"{prefix}_{column}" for column in PAY_COLUMNS for prefix in ("sum", "sumsq")
+]
+
+# database path -> (file stamp, {(dimension, code): {gender code: stats}})
+_cache = {}
+
+
+def rollup_table(table=table_name):
+    return f"{table}_rollup"
+
+
+def create_table(connection, table=table_name):
+    stats = ",\n            ".join(
+        f"{c} INTEGER NOT NULL" if c == "n" else f"{c} REAL NOT NULL"
+        for c in STAT_COLUMNS
+    )
+    connection.execute(
+        text(
+            f"""
+        CREATE TABLE IF NOT EXISTS {rollup_table(table)} (
+            dimension TEXT NOT NULL,
+            key INTEGER NOT NULL,
+            gender INTEGER NOT NULL,
+            {stats},
+            PRIMARY KEY (dimension, key, gender)
+        );
+        """
+        )
+    )
+
+
+def apply_rows(connection, table=table_name, lo=1, hi=None, sign=1):
+    """Add (sign=1) or subtract (sign=-1) the rows with lo <= rowid < hi."""
+    aggregates = ["COUNT(*)"]
+    for column in PAY_COLUMNS:
+        aggregates += [f"SUM({column})", f"SUM({column} * {column})"]
+    selected = ", ".join(f":sign * {a}" for a in aggregates)
+    updates = ", ".join(f"{c} = {c} + excluded.{c}" for c in STAT_COLUMNS)
+    where = "rowid >= :lo" + (" AND rowid < :hi" if hi is not None else "")
+    for dimension in DIMENSIONS:
+        connection.execute(
+            text(
+                f"""
+            INSERT INTO {rollup_table(table)}
+                (dimension, key, gender, {", ".join(STAT_COLUMNS)})
+            SELECT :dimension, {encoding.code_column(dimension)},
+                   {encoding.code_column("Gender")}, {selected}
+            FROM {encoding.storage_table(table)}
+            WHERE {where}
+            GROUP BY 2, 3
+            ON CONFLICT (dimension, key, gender) DO UPDATE SET {updates};
+            """
+            ),
+            {"dimension": dimension, "sign": sign, "lo": lo, "hi": hi},
+        )
+    if sign < 0:
+        connection.execute(text(f"DELETE FROM {rollup_table(table)} WHERE n <= 0"))
+
+
+def clear(connection, table=table_name):
+    connection.execute(text(f"DELETE FROM {rollup_table(table)}"))
+
+
+def rebuild(connection, table=table_name):
+    clear(connection, table)
+    apply_rows(connection, table)
+
+
+def _load(executor, table):
+    groups = {}
+    rows = executor.fetch_all(
+        f"SELECT dimension, key, gender, {', '.join(STAT_COLUMNS)} "
+        f"FROM {rollup_table(table)}"
+    )
+    for row in rows:
+        stats = {c: row[c] for c in STAT_COLUMNS}
+        groups.setdefault((row["dimension"], row["key"]), {})[row["gender"]] = stats
+    return groups
+
+
+def snapshot(executor, table=table_name):
+    """Return the rollups as {(dimension, code): {gender code: stats}}."""
+    stamp = executor.file_stamp()
+    cached = _cache.get((executor.path, table))
+    if cached is None or stamp is None or cached[0] != stamp:
+        cached = (stamp, _load(executor, table))
+        _cache[(executor.path, table)] = cached
+    return cached[1]
+
+
+def invalidate():
+    _cache.clear()
+
+
+def lookup(executor, dimension, code, table=table_name):
+    """Per-gender stats for one dimension code ({} if the code is unknown)."""
+    return snapshot(executor, table).get((dimension, code), {})
+
+
+def combine(groups):
+    """Sum per-gender stats into a single stats dict."""
+    total = dict.fromkeys(STAT_COLUMNS, 0)
+    for stats in groups.values():
+        for column in STAT_COLUMNS:
+            total[column] += stats[column]
+    return total
+
+
+def mean_and_std(stats, column):
+    """Mean and population standard deviation of a pay column from its stats."""
+    n = stats["n"]
+    if not n:
+        return None, None
+    mean = stats[f"sum_{column}"] / n
+    variance = max(stats[f"sumsq_{column}"] / n - mean * mean, 0.0)
+    return mean, variance**0.5
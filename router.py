@@ -0,0 +1,470 @@
+import difflib
+import itertools
+import json
+import os
+import re
+import threading
+import time
+
+import answer_cache
+import encoding
+import helpers
+import runtime
+import tool_dispatch
+import tracing
+
+# Deterministic fast path for questions that map onto a single tool call.
+#
+# Each route names a tool of helpers.tools_sql, the words a question must
+# contain (one of each group) or must not contain, and fills the tool's
+# required parameters from its JSON schema: names are looked up among the
+# values actually in the table (Division, Department_Name or its code,
+# Grade), exactly or fuzzily, and amounts are the numbers left over. A
+# question is routed only when exactly one route matches and every name and
+# number we recognized fills a parameter. Questions the routes cannot express
+# go to the LLM instead: negations ("not", "excluding", "except"), names
+# joined by "and"/"or", and grade-like or capitalised words left over after
+# matching (a name we did not recognize). These checks are heuristics, not a
+# parser, so the default only lets the router pick the tool.
+#
+# ROUTER=llm (default) runs the tool locally and lets the model phrase the
+# answer from its result (one round trip instead of two); ROUTER=template
+# answers routed questions from a fixed template with no LLM call;
+# ROUTER=off disables it.
+
+mode = os.getenv("ROUTER", "llm")
+
+# minimum difflib ratio of a fuzzy name match, and its lead over the
+# next best value
+fuzzy_cutoff = 0.88
+fuzzy_margin = 0.04
+
+# tool parameter -> the column its values come from (None: a number)
+PARAMETER_COLUMNS = {
+    "division_name": "Division",
+    "department_name": "Department_Name",
+    "grade": "Grade",
+    "amount": None,
+}
+
+_COMPARISONS = {"above", "over", "more", "exceed", "exceeding", "greater", "higher"}
+_OTHER_MEASURES = {"average", "avg", "mean", "median", "max", "maximum", "min",
+                   "minimum", "highest", "lowest", "top", "compare", "compared", "vs"}
+_GENDER_WORDS = {"female", "male", "women", "men", "woman", "man", "gender"}
+
+# words are compared after answer_cache.content_words (lower case, plurals
+# folded), so "employees" is "employee" and "salaries" is "salary"
+ROUTES = {
+    "get_avg_salary_and_female_count_for_division": {
+        "requires": [
+            {"female", "women", "woman"},
+            {"average", "avg", "mean", "salary", "count", "many", "number"},
+        ],
+        "forbids": {"male", "men", "man", "total", "sum", "overtime", "longevity",
+                    "median", "max", "maximum", "min", "minimum", "highest",
+                    "lowest", "compare", "compared", "vs"},
+    },
+    "get_total_overtime_pay_for_department": {
+        "requires": [{"overtime"}, {"total", "sum"}],
+        "forbids": _OTHER_MEASURES | _GENDER_WORDS | _COMPARISONS
+        | {"longevity", "salary", "below", "under", "less"},
+    },
+    "get_total_longevity_pay_for_grade": {
+        "requires": [{"longevity"}, {"total", "sum"}],
+        "forbids": _OTHER_MEASURES | _GENDER_WORDS | _COMPARISONS
+        | {"overtime", "salary", "below", "under", "less"},
+    },
+    "get_employee_count_by_gender_in_department": {
+        "requires": [_GENDER_WORDS, {"many", "count", "number"}],
+        "forbids": _OTHER_MEASURES | _COMPARISONS
+        | {"salary", "pay", "overtime", "longevity", "total", "sum"},
+    },
+    "get_employees_with_overtime_above": {
+        "requires": [{"overtime"}, _COMPARISONS],
+        "forbids": _GENDER_WORDS
+        | {"longevity", "salary", "median", "below", "under", "less", "each", "per"},
+    },
+}
+
+# a question naming one of these without a value we recognized is about
+# something we could not identify (e.g. "the police department")
+COLUMN_WORDS = {"department": "Department_Name", "division": "Division", "grade": "Grade"}
+
+_schemas = {tool["function"]["name"]: tool["function"] for tool in helpers.tools_sql}
+for _name in ROUTES:
+    # every route must be a declared tool whose parameters we can fill
+    assert set(_schemas[_name]["parameters"]["required"]) <= set(PARAMETER_COLUMNS)
+
+# words that make a question about something other than the named value
+NEGATIONS = {"not", "no", "excluding", "exclude", "excludes", "except",
+             "without", "besides", "outside", "other"}
+CONJUNCTIONS = {"and", "or", "&", "nor", "vs", "versus", "plus"}
+# words that may sit between a name and a conjunction joining a second one
+_FILLER = {"the", "department", "departments", "division", "divisions",
+           "grade", "grades", "dept"}
+_GRADE_LIKE = re.compile(r"[A-Za-z]?\d+")
+
+_NUMBER = re.compile(r"\$?\b\d[\d,]*(?:\.\d+)?\s*(k\b)?", re.I)
+_TOKEN = re.compile(r"[\w'&]+")
+
+# executor path -> (file stamp, index)
+_indexes = {}
+_indexes_lock = threading.Lock()
+_call_ids = itertools.count()
+
+
+def _build_index(executor):
+    values = {
+        column: encoding.values(executor, column)
+        for column in ("Division", "Department_Name", "Grade")
+    }
+    # department codes ("ABS") stand for their department name
+    storage = encoding.storage_table()
+    rows = executor.fetch_all(
+        f"SELECT DISTINCT Department_code AS department, "
+        f"Department_Name_code AS name FROM {storage}"
+    )
+    codes = {}
+    for row in rows:
+        code = encoding.value_for(executor, "Department", row["department"])
+        name = encoding.value_for(executor, "Department_Name", row["name"])
+        if code and name:
+            codes[code] = name
+    # token -> values containing it, to shortlist fuzzy candidates
+    tokens = {}
+    for column in ("Division", "Department_Name"):
+        for value in values[column]:
+            for token in set(_TOKEN.findall(value.lower())):
+                tokens.setdefault(token, set()).add((column, value))
+    by_initial = {}
+    for token in tokens:
+        by_initial.setdefault(token[0], []).append(token)
+    return {
+        "values": values,
+        "grades": {value.upper(): value for value in values["Grade"]},
+        "department_codes": codes,
+        "tokens": tokens,
+        "by_initial": by_initial,
+    }
+
+
+def _index():
+    executor = runtime.executor()
+    stamp = executor.file_stamp()
+    with _indexes_lock:
+        cached = _indexes.get(executor.path)
+        if cached is None or stamp is None or cached[0] != stamp:
+            cached = (stamp, _build_index(executor))
+            _indexes[executor.path] = cached
+    return cached[1]
+
+
+def _exact_mentions(question, index):
+    lowered = question.lower()
+    mentions = []
+    for column in ("Division", "Department_Name"):
+        for value in index["values"][column]:
+            needle = value.lower()
+            start = lowered.find(needle)
+            while start >= 0:
+                end = start + len(needle)
+                if (start == 0 or not lowered[start - 1].isalnum()) and (
+                    end == len(lowered) or not lowered[end].isalnum()
+                ):
+                    mentions.append((start, end, column, value))
+                start = lowered.find(needle, start + 1)
+    for match in _TOKEN.finditer(question):
+        code = match.group(0)
+        if code in index["department_codes"]:  # codes are upper case
+            mentions.append(
+                (match.start(), match.end(), "Department_Name",
+                 index["department_codes"][code])
+            )
+    # "grade M3", "grade 21", or a quoted 'M3'
+    for match in re.finditer(
+        r"\bgrades?\s+'?([\w]+)'?|'([\w]+)'", question, re.I
+    ):
+        group = 1 if match.group(1) else 2
+        grade = index["grades"].get(match.group(group).upper())
+        if grade is not None:
+            mentions.append((match.start(group), match.end(group), "Grade", grade))
+    return mentions
+
+
+def _word_candidates(token, index):
+    # values containing the word, or a close spelling of it
+    candidates = index["tokens"].get(token)
+    if candidates is not None:
+        return candidates
+    # typos rarely hit the first letter; this keeps the search small
+    close = difflib.get_close_matches(
+        token, index["by_initial"].get(token[0], ()), n=2, cutoff=0.85
+    )
+    return set().union(*(index["tokens"][c] for c in close))
+
+
+def _fuzzy_mentions(question, index, taken):
+    # windows of question words compared with the values sharing a word
+    # with them
+    words = [
+        m for m in _TOKEN.finditer(question)
+        if not any(start <= m.start() < end for start, end, *_ in taken)
+    ]
+    candidates_of = {}
+    for word in words:
+        token = word.group(0).lower()
+        if len(token) >= 3 and token not in answer_cache.STOPWORDS:
+            if token not in candidates_of:
+                candidates_of[token] = _word_candidates(token, index)
+    best = {}  # column -> [(ratio, value, span)]
+    for i in range(len(words)):
+        candidates = set()
+        for j in range(i + 1, min(i + 10, len(words)) + 1):
+            window = words[i:j]
+            if j > i + 1 and window[-1].start() - window[-2].end() > 2:
+                break  # not contiguous (a name was cut out between them)
+            candidates |= candidates_of.get(window[-1].group(0).lower(), set())
+            if not candidates:
+                continue
+            text = question[window[0].start() : window[-1].end()].lower()
+            matcher = difflib.SequenceMatcher(None, b=text)
+            for column, value in candidates:
+                matcher.set_seq1(value.lower())
+                if (
+                    matcher.real_quick_ratio() < fuzzy_cutoff
+                    or matcher.quick_ratio() < fuzzy_cutoff
+                ):
+                    continue
+                ratio = matcher.ratio()
+                if ratio >= fuzzy_cutoff:
+                    span = (window[0].start(), window[-1].end())
+                    best.setdefault(column, []).append((ratio, value, span))
+    mentions = []
+    for column, scored in best.items():
+        scored.sort(reverse=True)
+        ratio, value, span = scored[0]
+        runner_up = next((r for r, v, _ in scored if v != value), 0.0)
+        if ratio - runner_up >= fuzzy_margin:
+            mentions.append((*span, column, value))
+    return mentions
+
+
+def _without_nested(mentions):
+    # "ABS" inside "ABS 85 Administration" is part of the division name
+    kept = []
+    for mention in sorted(mentions, key=lambda m: (m[0], -(m[1] - m[0]))):
+        if any(s <= mention[0] and mention[1] <= e for s, e, *_ in kept):
+            continue
+        kept.append(mention)
+    return kept
+
+
+def _numbers(question, mentions):
+    numbers = []
+    for match in _NUMBER.finditer(question):
+        if any(s <= match.start() < e for s, e, *_ in mentions):
+            continue
+        text = match.group(0).strip().lstrip("$").lower()
+        value = float(text.rstrip("k").strip().replace(",", ""))
+        numbers.append(value * 1000 if text.endswith("k") else value)
+    return numbers
+
+
+def _ambiguous(question, mentions):
+    """True when the question says more than its mentions and numbers: a
+    negation, names joined by a conjunction, or an unmatched name."""
+    tokens = list(_TOKEN.finditer(question))
+    lowered = [t.group(0).lower() for t in tokens]
+    if any(w in NEGATIONS or w.endswith("n't") for w in lowered):
+        return True
+
+    def covered(token, spans):
+        return any(s <= token.start() < e for s, e, *_ in spans)
+
+    # "X and Y", "grade M3 or N25", "X department and the Y department"
+    for i, token in enumerate(tokens):
+        if not covered(token, mentions):
+            continue
+        j = i + 1
+        while j < len(tokens) and covered(tokens[j], mentions):
+            j += 1
+        while j < len(tokens) and lowered[j] in _FILLER:
+            j += 1
+        if j < len(tokens) and lowered[j] in CONJUNCTIONS:
+            return True
+
+    numbers = [m.span() for m in _NUMBER.finditer(question)]
+    sentence_start = True
+    for token, word in zip(tokens, lowered):
+        text = token.group(0)
+        first, sentence_start = sentence_start, False
+        if question[token.end() : token.end() + 1] in (".", "?", "!"):
+            sentence_start = True
+        if covered(token, mentions) or covered(token, numbers):
+            continue
+        if _GRADE_LIKE.fullmatch(text):
+            return True
+        if text[0].isupper() and not first and word not in answer_cache.STOPWORDS:
+            return True
+    return False
+
+
+def route(question):
+    """(tool name, arguments) for a question of a known shape, else None."""
+    index = _index()
+    mentions = _without_nested(_exact_mentions(question, index))
+    mentions = _without_nested(mentions + _fuzzy_mentions(question, index, mentions))
+    if _ambiguous(question, mentions):
+        return None
+    numbers = _numbers(question, mentions)
+    names = {}
+    for _, _, column, value in mentions:
+        names.setdefault(column, set()).add(value)
+    words = frozenset(answer_cache.content_words(answer_cache.normalize(question)))
+    if any(w in words and c not in names for w, c in COLUMN_WORDS.items()):
+        return None
+
+    matches = []
+    for name, rule in ROUTES.items():
+        if not all(words & group for group in rule["requires"]):
+            continue
+        if words & rule["forbids"]:
+            continue
+        required = _schemas[name]["parameters"]["required"]
+        columns = {PARAMETER_COLUMNS[p] for p in required}
+        # every name and number must be used, each parameter exactly once
+        if set(names) != columns - {None}:
+            continue
+        if any(len(names[c]) != 1 for c in names):
+            continue
+        if len(numbers) != (1 if None in columns else 0):
+            continue
+        arguments = {
+            p: numbers[0] if PARAMETER_COLUMNS[p] is None
+            else next(iter(names[PARAMETER_COLUMNS[p]]))
+            for p in required
+        }
+        matches.append((name, arguments))
+    return matches[0] if len(matches) == 1 else None
+
+
+def match(question):
+    """route(question), or None when routing is off or fails (the caller
+    then asks the LLM)."""
+    if mode == "off":
+        return None
+    with tracing.span("route") as span:
+        try:
+            routed = route(question)
+        except Exception as e:
+            print(e)
+            return None
+        span.set(tool=routed[0] if routed else None)
+    return routed
+
+
+def _money(value):
+    return f"${value:,.2f}"
+
+
+def template(name, arguments, result):
+    """The answer text for a routed tool result."""
+    if name == "get_avg_salary_and_female_count_for_division":
+        division = arguments["division_name"]
+        if not isinstance(result, dict) or not result.get("female_count"):
+            return f"There are no female employees in the {division} division."
+        return (
+            f"There are {result['female_count']:,} female employees in the "
+            f"{division} division; their average base salary is "
+            f"{_money(result['avg_salary'])}."
+        )
+    if name == "get_total_overtime_pay_for_department":
+        return (
+            f"The total overtime pay for the {arguments['department_name']} "
+            f"department is {_money(result['total_overtime_pay'])}."
+        )
+    if name == "get_total_longevity_pay_for_grade":
+        return (
+            f"The total longevity pay for employees with grade "
+            f"{arguments['grade']} is {_money(result['total_longevity_pay'])}."
+        )
+    if name == "get_employee_count_by_gender_in_department":
+        labels = {"F": "female", "M": "male"}
+        counts = ", ".join(
+            f"{row['employee_count']:,} {labels.get(row['Gender'], row['Gender'])}"
+            for row in result
+        )
+        return (
+            f"The {arguments['department_name']} department has {counts} "
+            f"employees."
+        )
+    if name == "get_employees_with_overtime_above":
+        amount = _money(arguments["amount"])
+        if not result.get("count"):
+            return f"No employees have overtime pay above {amount}."
+        lines = [
+            f"{result['count']:,} employees have overtime pay above {amount}: "
+            f"{_money(result['total_overtime_pay'])} in total, "
+            f"{_money(result['avg_overtime_pay'])} on average and "
+            f"{_money(result['max_overtime_pay'])} at most.",
+            "",
+            "Highest overtime pay:",
+        ]
+        for row in result["employees"]:
+            lines.append(
+                f"- {_money(row['Overtime_Pay'])}: {row['Division']} "
+                f"({row['Department_Name']}), grade {row['Grade']}"
+            )
+        return "\n".join(lines)
+    return None
+
+
+def run_route(routed, messages):
+    """Run the routed tool call and add it and its result to `messages` as
+    if the model had asked for it. Returns the templated answer, or None
+    when mode is "llm" or the tool failed (the model phrases the answer
+    from `messages`)."""
+    from openai.types.chat import ChatCompletionMessage
+    from openai.types.chat.chat_completion_message_tool_call import (
+        ChatCompletionMessageToolCall,
+        Function,
+    )
+
+    name, arguments = routed
+    tool_call = ChatCompletionMessageToolCall(
+        id=f"call_route_{next(_call_ids)}",
+        type="function",
+        function=Function(name=name, arguments=json.dumps(arguments)),
+    )
+    try:
+        result = tool_dispatch.call_tool(name, tool_call.function.arguments)
+    except Exception as e:
+        print(e)
+        result = {"error": str(e)}
+    messages.append(
+        ChatCompletionMessage(role="assistant", content=None, tool_calls=[tool_call])
+    )
+    messages.append(tool_dispatch.tool_message(tool_call, result))
+    if mode == "llm" or (isinstance(result, dict) and "error" in result):
+        return None  # errors are explained by the model
+    return template(name, arguments, result)
+
+
+def completion(text, model="router"):
+    """A ChatCompletion holding `text`, for callers that expect one."""
+    from openai.types.chat import ChatCompletion, ChatCompletionMessage
+    from openai.types.chat.chat_completion import Choice
+
+    return ChatCompletion(
+        id=f"chatcmpl-route-{next(_call_ids)}",
+        object="chat.completion",
+        created=int(time.time()),
+        model=model,
+        choices=[
+            Choice(
+                index=0,
+                finish_reason="stop",
+                message=ChatCompletionMessage(role="assistant", content=text),
+            )
+        ],
+    )
@@ -0,0 +1,154 @@
+import time
+
+import tool_dispatch
+
+# Drives an Assistants API run to completion.
+#
+# The preferred path streams run events, so tool calls are handled the moment
+# the run requires action and the answer is available as soon as the model is
+# done. If streaming is unavailable it falls back to polling with exponential
+# backoff (starting at 100 ms) instead of a fixed sleep. Either way all tool
+# outputs of a step are submitted in a single call, and the time spent in each
+# phase is reported.
+
+TERMINAL_STATUSES = ["completed", "cancelled", "expired", "failed", "incomplete"]
+
+initial_poll_interval = 0.1
+max_poll_interval = 2.0
+
+
+def _tool_outputs(run, functions=None):
+    tool_calls = run.required_action.submit_tool_outputs.tool_calls
+    messages = tool_dispatch.run_tool_calls(tool_calls, functions)
+    return [
+        {"tool_call_id": m["tool_call_id"], "output": m["content"]} for m in messages
+    ]
+
+
+class _Timings:
+    def __init__(self):
+        self.start_time = time.perf_counter()
+        self.phases = {}
+        self._mark = self.start_time
+
+    def lap(self, phase):
+        now = time.perf_counter()
+        self.phases[phase] = self.phases.get(phase, 0.0) + now - self._mark
+        self._mark = now
+
+    def as_dict(self):
+        result = {phase: round(s, 4) for phase, s in self.phases.items()}
+        result["total"] = round(time.perf_counter() - self.start_time, 4)
+        return result
+
+
+def _run_params(additional_messages):
+    # new messages go in with the run instead of a messages.create round trip
+    return {"additional_messages": additional_messages} if additional_messages else {}
+
+
+def _drive_streaming(
+    client, thread_id, assistant_id, functions, timings, seen, additional_messages
+):
+    run = None
+    manager = client.beta.threads.runs.stream(
+        thread_id=thread_id,
+        assistant_id=assistant_id,
+        **_run_params(additional_messages),
+    )
+    while manager is not None:
+        next_manager = None
+        with manager as stream:
+            for event in stream:
+                if not event.event.startswith("thread.run."):
+                    continue
+                run = seen["run"] = event.data
+                if event.event == "thread.run.requires_action":
+                    timings.lap("model")
+                    tool_outputs = _tool_outputs(run, functions)
+                    timings.lap("tools")
+                    next_manager = client.beta.threads.runs.submit_tool_outputs_stream(
+                        thread_id=thread_id, run_id=run.id, tool_outputs=tool_outputs
+                    )
+                elif run.status in TERMINAL_STATUSES:
+                    timings.lap("model")
+        manager = next_manager
+    return run
+
+
+def _drive_polling(
+    client, thread_id, assistant_id, functions, timings, run=None, additional_messages=None
+):
+    if run is None:
+        run = client.beta.threads.runs.create(
+            thread_id=thread_id,
+            assistant_id=assistant_id,
+            **_run_params(additional_messages),
+        )
+        timings.lap("submit")
+    interval = initial_poll_interval
+    while run.status not in TERMINAL_STATUSES:
+        if run.status == "requires_action":
+            timings.lap("model")
+            tool_outputs = _tool_outputs(run, functions)
+            timings.lap("tools")
+            run = client.beta.threads.runs.submit_tool_outputs(
+                thread_id=thread_id, run_id=run.id, tool_outputs=tool_outputs
+            )
+            timings.lap("submit")
+            interval = initial_poll_interval
+            continue
+        time.sleep(interval)
+        interval = min(interval * 2, max_poll_interval)
+        run = client.beta.threads.runs.retrieve(thread_id=thread_id, run_id=run.id)
+    timings.lap("model")
+    return run
+
+
+def drive_run(
+    client,
+    thread_id,
+    assistant_id,
+    functions=None,
+    stream=True,
+    additional_messages=None,
+):
+    """Run `assistant_id` on `thread_id` until it finishes, first adding
+    `additional_messages` (e.g. [{"role": "user", "content": question}]).
+
+    Returns (run, timings) where timings maps phase -> seconds ("model",
+    "tools", "submit") plus "total".
+    """
+    timings = _Timings()
+    if not stream:
+        run = _drive_polling(
+            client,
+            thread_id,
+            assistant_id,
+            functions,
+            timings,
+            additional_messages=additional_messages,
+        )
+        return run, timings.as_dict()
+
+    seen = {"run": None}
+    try:
+        run = _drive_streaming(
+            client,
+            thread_id,
+            assistant_id,
+            functions,
+            timings,
+            seen,
+            additional_messages,
+        )
+    except Exception as e:
+        print(f"Streaming failed, polling instead: {e}")
+        run = seen["run"]
+        if run is not None:
+            # the streamed run exists already, keep following it
+            run = client.beta.threads.runs.retrieve(thread_id=thread_id, run_id=run.id)
+        run = _drive_polling(
+            client, thread_id, assistant_id, functions, timings, run, additional_messages
+        )
+    return run, timings.as_dict()
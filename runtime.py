@@ -0,0 +1,138 @@
+import os
+import threading
+
+from dotenv import load_dotenv
+
+# Shared, lazily built runtime objects.
+#
+# The LLM clients, the database engine and executor, the DataFrame and the
+# agents are built on first use, once per process, and heavy libraries
+# (langchain, openai, SQLAlchemy, pandas) are imported only by the factory
+# that needs them. The data paths and table name are defined here only; the
+# other modules take them from this module. This module stays imported across
+# Streamlit reruns (only the page script is re-executed), so the instances
+# live as long as the server process, as with st.cache_resource, without
+# importing streamlit here.
+
+# Load environment variables from .env file
+load_dotenv()
+
+openai_key = os.getenv("OPENAI_API_KEY")
+# another OpenAI-compatible endpoint, e.g. the local fake_llm.py server
+openai_base_url = os.getenv("OPENAI_BASE_URL")
+
+llm_name = "gpt-3.5-turbo"
+
+# the salary data, for every module that reads or writes it
+database_file_path = "./db/salary.db"
+file_url = "./data/salaries_2023.csv"
+table_name = "salaries_2023"
+# memory-mapped column files of the CSV (see columnar.py)
+columnar_cache_dir = "./db/columnar"
+
+_instances = {}
+_lock = threading.RLock()
+
+
+def get(name, factory, version=None):
+    """The process-wide instance `name`, built by factory() on first use and
+    rebuilt whenever `version` differs from the one it was built for."""
+    entry = _instances.get(name)
+    if entry is not None and entry[0] == version:
+        return entry[1]
+    with _lock:
+        entry = _instances.get(name)
+        if entry is None or entry[0] != version:
+            entry = (version, factory())
+            _instances[name] = entry
+        return entry[1]
+
+
+def file_version(path=file_url):
+    stat = os.stat(path)
+    return (stat.st_size, stat.st_mtime_ns)
+
+
+def reset(name=None):
+    """Forget one instance (or all), e.g. after changing configuration."""
+    with _lock:
+        if name is None:
+            _instances.clear()
+        else:
+            _instances.pop(name, None)
+
+
+def chat_model(streaming=False):
+    """The shared ChatOpenAI model; streaming=True reports every token to
+    the callbacks (see streaming.py)."""
+
+    def build():
+        from langchain_openai import ChatOpenAI
+
+        return ChatOpenAI(
+            api_key=openai_key,
+            model=llm_name,
+            base_url=openai_base_url,
+            streaming=streaming,
+        )
+
+    return get("chat_model_streaming" if streaming else "chat_model", build)
+
+
+def openai_client():
+    def build():
+        from openai import OpenAI
+
+        return OpenAI(api_key=openai_key, base_url=openai_base_url)
+
+    return get("openai_client", build)
+
+
+def async_openai_client():
+    def build():
+        from openai import AsyncOpenAI
+
+        return AsyncOpenAI(api_key=openai_key, base_url=openai_base_url)
+
+    return get("async_openai_client", build)
+
+
+def executor():
+    """Read-side executor of the salary database (see executor.py) for the
+    current database_file_path."""
+
+    def build():
+        from executor import SQLiteExecutor
+
+        return SQLiteExecutor(database_file_path)
+
+    return get("executor", build, version=database_file_path)
+
+
+def engine():
+    """SQLAlchemy engine of the salary database, loaded and migrated."""
+
+    def build():
+        from sqlalchemy import create_engine
+
+        import ingest
+
+        os.makedirs(os.path.dirname(database_file_path), exist_ok=True)
+        engine = create_engine(f"sqlite:///{database_file_path}")
+        # only (re)loads the rows that changed since the last run
+        ingest.ensure_loaded(file_url, engine)
+        return engine
+
+    return get("engine", build, version=database_file_path)
+
+
+def dataframe():
+    """The salary CSV as a memory-mapped DataFrame (see columnar.py),
+    reloaded when the file changes."""
+
+    def build():
+        import columnar
+
+        return columnar.load(file_url)
+
+    return get("dataframe", build, version=file_version())
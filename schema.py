@@ -0,0 +1,354 @@
+import encoding
+import rollups
+import runtime
+from executor import text
+
+# Schema / migration manager for the salaries_2023 table.
+#
+# The rows live in a typed, dictionary-encoded storage table (see encoding.py)
+# behind a salaries_2023 view, with composite covering indexes shaped after
+# the queries the function-calling tools in helpers.py run, so each tool call
+# is an index search instead of a full table scan. Migrations are tracked
+# with SQLite's PRAGMA user_version and are applied in order exactly once.
+
+database_file_path = runtime.database_file_path
+table_name = runtime.table_name
+
+COLUMNS = [
+    ("Department", "TEXT"),
+    ("Department_Name", "TEXT"),
+    ("Division", "TEXT"),
+    ("Gender", "TEXT"),
+    ("Base_Salary", "REAL NOT NULL DEFAULT 0"),
+    ("Overtime_Pay", "REAL NOT NULL DEFAULT 0"),
+    ("Longevity_Pay", "REAL NOT NULL DEFAULT 0"),
+    ("Grade", "TEXT"),
+]
+
+# indexes of the original TEXT table (migration 2); they went away with that
+# table when the storage became dictionary encoded
+TEXT_INDEXES = {
+    "idx_division_gender_salary": ("Division", "Gender", "Base_Salary"),
+    "idx_department_gender_overtime": ("Department_Name", "Gender", "Overtime_Pay"),
+    "idx_grade_longevity": ("Grade", "Longevity_Pay"),
+    "idx_overtime": ("Overtime_Pay",),
+}
+
+# name -> indexed columns of the encoded storage table; trailing columns make
+# the index covering so SQLite never has to visit the rows for aggregates.
+# Declared tools answered by a query get theirs from tool_registry.indexes()
+INDEXES = {
+    # get_avg_salary_and_female_count_for_division
+    "idx_rows_division_gender_salary": (
+        "Division_code",
+        "Gender_code",
+        "Base_Salary",
+    ),
+    # get_employee_count_by_gender_in_department and
+    # get_total_overtime_pay_for_department share this one
+    "idx_rows_department_gender_overtime": (
+        "Department_Name_code",
+        "Gender_code",
+        "Overtime_Pay",
+    ),
+    # get_total_longevity_pay_for_grade
+    "idx_rows_grade_longevity": ("Grade_code", "Longevity_Pay"),
+    # get_employees_with_overtime_above (range search, keyset pages)
+    "idx_rows_overtime": ("Overtime_Pay",),
+}
+
+# the query shapes the tools (and SQL written against the salaries_2023 view)
+# run, with sample parameters for EXPLAIN
+TOOL_QUERIES = {
+    "get_avg_salary_and_female_count_for_division": (
+        f"""
+        SELECT AVG(Base_Salary) AS avg_salary, COUNT(*) AS female_count
+        FROM {table_name}
+        WHERE Division = :division_name AND Gender = 'F';
+        """,
+        {"division_name": "ABS 85 Administrative Services"},
+    ),
+    "get_total_overtime_pay_for_department": (
+        f"""
+        SELECT SUM(Overtime_Pay) AS total_overtime_pay
+        FROM {table_name}
+        WHERE Department_Name = :department_name;
+        """,
+        {"department_name": "Alcohol Beverage Services"},
+    ),
+    "get_employees_with_overtime_above": (
+        f"""
+        SELECT COUNT(*) AS count, SUM(Overtime_Pay) AS total_overtime_pay,
+               MAX(Overtime_Pay) AS max_overtime_pay
+        FROM {encoding.storage_table(table_name)}
+        WHERE Overtime_Pay > :amount;
+        """,
+        {"amount": 1000.0},
+    ),
+    # keyset pagination: one page of rows after the (pay, rowid) cursor
+    "get_employees_with_overtime_above (page)": (
+        f"""
+        SELECT rowid AS row_id, Department_Name_code, Division_code, Grade_code,
+               Gender_code, Overtime_Pay
+        FROM {encoding.storage_table(table_name)}
+        WHERE Overtime_Pay > :amount
+          AND (Overtime_Pay, rowid) < (:last_pay, :last_rowid)
+        ORDER BY Overtime_Pay DESC, rowid DESC
+        LIMIT :limit;
+        """,
+        {"amount": 1000.0, "last_pay": 1e308, "last_rowid": 1 << 62, "limit": 11},
+    ),
+    "get_employee_count_by_gender_in_department": (
+        f"""
+        SELECT Gender, COUNT(*) AS employee_count
+        FROM {table_name}
+        WHERE Department_Name = :department_name
+        GROUP BY Gender;
+        """,
+        {"department_name": "Alcohol Beverage Services"},
+    ),
+    "get_total_longevity_pay_for_grade": (
+        f"""
+        SELECT SUM(Longevity_Pay) AS total_longevity_pay
+        FROM {table_name}
+        WHERE Grade = :grade;
+        """,
+        {"grade": "M3"},
+    ),
+}
+
+
+def create_table_sql(table=table_name):
+    columns = ",\n    ".join(f'"{name}" {ddl}' for name, ddl in COLUMNS)
+    return f"CREATE TABLE IF NOT EXISTS {table} (\n    {columns}\n)"
+
+
+def create_table(connection, table=table_name):
+    connection.execute(text(create_table_sql(table)))
+
+
+def storage_table_sql(table=table_name):
+    columns = []
+    for name, ddl in COLUMNS:
+        if name in encoding.CATEGORICAL_COLUMNS:
+            columns.append(
+                f'"{encoding.code_column(name)}" INTEGER NOT NULL '
+                f"REFERENCES {encoding.dim_table(name)} (code)"
+            )
+        else:
+            columns.append(f'"{name}" {ddl}')
+    columns = ",\n    ".join(columns)
+    storage = encoding.storage_table(table)
+    return f"CREATE TABLE IF NOT EXISTS {storage} (\n    {columns}\n)"
+
+
+def view_sql(table=table_name):
+    # inner joins (codes are NOT NULL) let the planner start from a lookup
+    # table when a query filters on a value
+    selected, joins = [], []
+    for i, (name, _) in enumerate(COLUMNS):
+        if name in encoding.CATEGORICAL_COLUMNS:
+            selected.append(f'd{i}.value AS "{name}"')
+            joins.append(
+                f"JOIN {encoding.dim_table(name)} AS d{i} "
+                f'ON d{i}.code = r."{encoding.code_column(name)}"'
+            )
+        else:
+            selected.append(f'r."{name}" AS "{name}"')
+    selected = ",\n       ".join(selected)
+    joins = "\n".join(joins)
+    return (
+        f"CREATE VIEW IF NOT EXISTS {table} AS\n"
+        f"SELECT {selected}\n"
+        f"FROM {encoding.storage_table(table)} AS r\n{joins}"
+    )
+
+
+def _current_ddl(connection, table):
+    row = connection.execute(
+        text("SELECT sql FROM sqlite_master WHERE name = :name"),
+        {"name": table},
+    ).first()
+    return row[0] if row else None
+
+
+def _migrate_typed_columns(connection, table):
+    # tables written by DataFrame.to_sql carry pandas' loose types; rebuild
+    # them with the declared schema, keeping rowids (ingest relies on them)
+    ddl = _current_ddl(connection, table)
+    if ddl is None:
+        create_table(connection, table)
+        return
+    if ddl.strip() == create_table_sql(table).replace(" IF NOT EXISTS", ""):
+        return
+    columns = ", ".join(f'"{name}"' for name, _ in COLUMNS)
+    connection.execute(text(f"DROP TABLE IF EXISTS {table}__typed"))
+    connection.execute(text(create_table_sql(f"{table}__typed")))
+    connection.execute(
+        text(
+            f"INSERT INTO {table}__typed (rowid, {columns}) "
+            f"SELECT rowid, {columns} FROM {table}"
+        )
+    )
+    connection.execute(text(f"DROP TABLE {table}"))
+    connection.execute(text(f"ALTER TABLE {table}__typed RENAME TO {table}"))
+
+
+def _create_indexes(connection, table, indexes):
+    for name, columns in indexes.items():
+        column_list = ", ".join(f'"{c}"' for c in columns)
+        connection.execute(
+            text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({column_list})")
+        )
+    connection.execute(text(f"ANALYZE {table}"))
+
+
+def _migrate_indexes(connection, table):
+    _create_indexes(connection, table, TEXT_INDEXES)
+
+
+def _migrate_rollups(connection, table):
+    # Shipped as rollups.create_table + rollups.rebuild over the text table.
+    # Databases that applied it keep their rollups until the next migration,
+    # _migrate_encoded_storage, drops and rebuilds them over the encoded
+    # storage table. rollups.rebuild now reads the code columns, which do not
+    # exist yet at this step, so on a database still below this version the
+    # step is deliberately a no-op; it stays in the list so that user_version
+    # numbers keep their meaning.
+    pass
+
+
+def _migrate_encoded_storage(connection, table):
+    # move the rows into an integer-coded storage table plus lookup tables,
+    # keeping rowids (ingest relies on them), and put a view in place of the
+    # old table
+    storage = encoding.storage_table(table)
+    encoding.create_dim_tables(connection)
+    connection.execute(text(storage_table_sql(table)))
+
+    selected = []
+    for name, _ in COLUMNS:
+        if name in encoding.CATEGORICAL_COLUMNS:
+            value = f"IFNULL(CAST(t.\"{name}\" AS TEXT), '0')"
+            connection.execute(
+                text(
+                    f"INSERT OR IGNORE INTO {encoding.dim_table(name)} (value) "
+                    f"SELECT DISTINCT {value} FROM {table} AS t"
+                )
+            )
+            selected.append(
+                f"(SELECT code FROM {encoding.dim_table(name)} WHERE value = {value})"
+            )
+        else:
+            selected.append(f't."{name}"')
+    columns = ", ".join(
+        f'"{encoding.code_column(name)}"'
+        if name in encoding.CATEGORICAL_COLUMNS
+        else f'"{name}"'
+        for name, _ in COLUMNS
+    )
+    connection.execute(
+        text(
+            f"INSERT INTO {storage} (rowid, {columns}) "
+            f"SELECT t.rowid, {', '.join(selected)} FROM {table} AS t"
+        )
+    )
+    connection.execute(text(f"DROP TABLE {table}"))
+    connection.execute(text(view_sql(table)))
+    _create_indexes(connection, storage, INDEXES)
+
+    connection.execute(text(f"DROP TABLE IF EXISTS {rollups.rollup_table(table)}"))
+    rollups.create_table(connection, table)
+    rollups.rebuild(connection, table)
+
+
+# applied in order; PRAGMA user_version records how many have run
+MIGRATIONS = [
+    _migrate_typed_columns,
+    _migrate_indexes,
+    _migrate_rollups,
+    _migrate_encoded_storage,
+]
+
+
+def schema_version(connection):
+    return connection.execute(text("PRAGMA user_version")).scalar()
+
+
+def migrate(engine, table=table_name):
+    """Apply any pending migrations. Returns the number applied."""
+    with engine.begin() as connection:
+        version = schema_version(connection)
+        if _current_ddl(connection, table) is None:
+            version = 0  # table was dropped behind our back, start over
+        pending = MIGRATIONS[version:]
+        for migration in pending:
+            migration(connection, table)
+        if pending:
+            # PRAGMA does not take bound parameters
+            connection.execute(text(f"PRAGMA user_version = {len(MIGRATIONS)}"))
+    return len(pending)
+
+
+def analyze(engine, table=table_name):
+    """Refresh the planner statistics after the table contents changed."""
+    with engine.begin() as connection:
+        connection.execute(text(f"ANALYZE {encoding.storage_table(table)}"))
+
+
+def ensure_indexes(engine, indexes, table=table_name):
+    """Create the storage indexes in `indexes` ({name: columns}) that do not
+    exist yet (e.g. the ones tool_registry.py derives from declared tools).
+    Returns the names created."""
+    with engine.begin() as connection:
+        existing = {
+            row[0]
+            for row in connection.execute(
+                text("SELECT name FROM sqlite_master WHERE type = 'index'")
+            )
+        }
+        missing = {name: c for name, c in indexes.items() if name not in existing}
+        if missing:
+            _create_indexes(connection, encoding.storage_table(table), missing)
+    return list(missing)
+
+
+def explain_tool_queries(engine, queries=TOOL_QUERIES):
+    """Return {tool name: [EXPLAIN QUERY PLAN detail lines]}."""
+    plans = {}
+    with engine.connect() as connection:
+        for name, (query, params) in queries.items():
+            rows = connection.execute(text("EXPLAIN QUERY PLAN " + query), params)
+            plans[name] = [row[-1] for row in rows]
+    return plans
+
+
+def verify_indexes(engine, queries=TOOL_QUERIES):
+    """Raise if any tool query would scan the table instead of using an index."""
+    failures = {}
+    for name, details in explain_tool_queries(engine, queries).items():
+        if not any("USING" in d and "INDEX" in d for d in details) or any(
+            d.startswith("SCAN") and "INDEX" not in d for d in details
+        ):
+            failures[name] = details
+    if failures:
+        raise RuntimeError(f"Tool queries not using an index: {failures}")
+    return True
+
+
+if __name__ == "__main__":
+    from sqlalchemy import create_engine
+
+    import helpers
+    import tool_registry
+
+    engine = create_engine(f"sqlite:///{database_file_path}")
+    print(f"Applied {migrate(engine)} migration(s)")
+    created = ensure_indexes(engine, tool_registry.indexes(helpers.TOOLS))
+    print(f"Created {len(created)} tool index(es)")
+    queries = {**TOOL_QUERIES, **tool_registry.queries(helpers.TOOLS)}
+    for name, details in explain_tool_queries(engine, queries).items():
+        print(name)
+        for detail in details:
+            print("   ", detail)
+    verify_indexes(engine, queries)
@@ -0,0 +1,136 @@
+import time
+
+from sqlalchemy import text
+
+import encoding
+import runtime
+
+# Precomputed schema description for the LangChain SQL agent.
+#
+# Without it the ReAct agent starts every question with sql_db_list_tables and
+# sql_db_schema (which also runs a sample-rows query), i.e. two extra LLM round
+# trips. The description built here holds the same table info (columns and
+# types, in the CREATE TABLE + sample rows layout SQLDatabase.get_table_info
+# uses) plus distinct-value summaries of the categorical columns and ranges of
+# the numeric ones. ingest.py rebuilds it whenever the CSV changes and it is
+# stored in the database next to the data, keyed by the data version, so the
+# agent prefix (see sql_db_agent.py) can include it at no cost per question.
+
+table_name = runtime.table_name
+
+SUMMARY_TABLE = "_schema_summary"
+
+sample_rows = 3
+# categorical columns with at most this many values are listed in full,
+# the others by their most frequent values
+max_listed_values = 50
+top_values = 10
+
+
+def _create_table(connection):
+    connection.execute(
+        text(
+            f"""
+        CREATE TABLE IF NOT EXISTS {SUMMARY_TABLE} (
+            table_name TEXT PRIMARY KEY,
+            data_version TEXT,
+            summary TEXT,
+            built_at REAL
+        );
+        """
+        )
+    )
+
+
+def _columns(connection, table):
+    rows = connection.exec_driver_sql(f'PRAGMA table_info("{table}")').all()
+    return [(row[1], row[2] or "TEXT") for row in rows]
+
+
+def _table_info(connection, table, columns):
+    definitions = ",\n\t".join(f'"{name}" {type_}' for name, type_ in columns)
+    rows = connection.exec_driver_sql(
+        f'SELECT * FROM "{table}" LIMIT {sample_rows}'
+    ).all()
+    sample = "\n".join("\t".join(str(v) for v in row) for row in rows)
+    header = "\t".join(name for name, _ in columns)
+    return (
+        f"CREATE TABLE {table} (\n\t{definitions}\n)\n\n"
+        f"/*\n{len(rows)} rows from {table} table:\n{header}\n{sample}\n*/"
+    )
+
+
+def _categorical_summary(connection, table, column):
+    # counted on the integer codes of the storage table (indexed, no joins)
+    storage = encoding.storage_table(table)
+    code = encoding.code_column(column)
+    rows = connection.exec_driver_sql(
+        f"SELECT d.value, c.n FROM "
+        f"(SELECT {code} AS code, COUNT(*) AS n FROM {storage} GROUP BY {code}) c "
+        f"JOIN {encoding.dim_table(column)} d ON d.code = c.code "
+        "ORDER BY c.n DESC, d.value"
+    ).all()
+    if len(rows) <= max_listed_values:
+        values = ", ".join(repr(value) for value, _ in sorted(rows))
+        return f"- {column}: {len(rows)} distinct values: {values}"
+    values = ", ".join(f"{value!r} ({n} rows)" for value, n in rows[:top_values])
+    return f"- {column}: {len(rows)} distinct values; most frequent: {values}"
+
+
+def _numeric_summary(connection, table, column):
+    low, high, mean = connection.exec_driver_sql(
+        f'SELECT MIN("{column}"), MAX("{column}"), AVG("{column}") FROM "{table}"'
+    ).one()
+    if low is None:
+        return f"- {column}: no values"
+    return f"- {column}: min {low:g}, max {high:g}, average {mean:.2f}"
+
+
+def build(connection, table=table_name):
+    """The schema description of `table` as prompt text."""
+    columns = _columns(connection, table)
+    (rows,) = connection.exec_driver_sql(f'SELECT COUNT(*) FROM "{table}"').one()
+    lines = [_table_info(connection, table, columns), "", f"{table} has {rows} rows."]
+    lines.append("Column values:")
+    for name, type_ in columns:
+        if name in encoding.CATEGORICAL_COLUMNS:
+            lines.append(_categorical_summary(connection, table, name))
+        elif type_.upper() in ("REAL", "INTEGER", "FLOAT", "NUMERIC"):
+            lines.append(_numeric_summary(connection, table, name))
+    return "\n".join(lines)
+
+
+def refresh(connection, version, table=table_name):
+    """Rebuild and store the description for data `version`."""
+    _create_table(connection)
+    summary = build(connection, table)
+    connection.execute(
+        text(
+            f"INSERT OR REPLACE INTO {SUMMARY_TABLE} "
+            "VALUES (:table, :version, :summary, :built_at)"
+        ),
+        {
+            "table": table,
+            "version": version,
+            "summary": summary,
+            "built_at": time.time(),
+        },
+    )
+    return summary
+
+
+def describe(engine, version, table=table_name):
+    """The stored description for data `version`, rebuilt if it is missing
+    or was built for other data."""
+    with engine.begin() as connection:
+        _create_table(connection)
+        row = connection.execute(
+            text(
+                f"SELECT data_version, summary FROM {SUMMARY_TABLE} "
+                "WHERE table_name = :table"
+            ),
+            {"table": table},
+        ).first()
+        if row is not None and row[0] == version:
+            return row[1]
+        return refresh(connection, version, table)
@@ -1,38 +1,27 @@
-import os
-from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
-import pandas as pd
-
-from sqlalchemy import create_engine
-
-# Load environment variables from .env file
-load_dotenv()
-
-openai_key = os.getenv("OPENAI_API_KEY")
-
-llm_name = "gpt-3.5-turbo"
-model = ChatOpenAI(api_key=openai_key, model=llm_name)
-
-
-from langchain.agents import create_sql_agent
-from langchain_community.agent_toolkits.sql.toolkit import SQLDatabaseToolkit
-from langchain_community.utilities import SQLDatabase
-
-# create a db from csv file
+import answer_cache
+import encoding
+import ingest
+import runtime
+import schema_cache
+import sql_guard
+import streaming
+import token_budget
+import tracing
+
+# The LLM, engine, toolkit and agent are built on first use and shared by
+# every Streamlit rerun (see runtime.py); langchain is imported only then.
+# The table schema, value summaries and sample rows are part of the prompt
+# (see schema_cache.py), so the agent does not spend its first steps on
+# sql_db_list_tables / sql_db_schema; it is rebuilt when the data changes.
+# The SQL it writes runs through sql_guard.py on read-only connections, and
+# the rows come back as CSV. The prompt templates are minified once (see
+# token_budget.py), they are sent with every step of the agent.
+
+llm_name = runtime.llm_name
 
 # Path to your SQLite database file
-database_file_path = "./db/salary.db"
-
-
-# Create an engine to connect to the SQLite database
-# SQLite only requires the path to the database file
-engine = create_engine(f"sqlite:///{database_file_path}")
-file_url = "./data/salaries_2023.csv"
-os.makedirs(os.path.dirname(database_file_path), exist_ok=True)
-df = pd.read_csv(file_url).fillna(value=0)
-df.to_sql("salaries_2023", con=engine, if_exists="replace", index=False)
-
-# print(f"Database created successfully! {df}")
+database_file_path = runtime.database_file_path
+file_url = runtime.file_url
 
 # Part 2: Prepare the sql prompt
 MSSQL_AGENT_PREFIX = """
@@ -96,14 +85,17 @@ FROM salaries_2023
 WHERE state = 'Division'
 
 Observation:
-[(27437.0,), (27088.0,), (26762.0,), (26521.0,), (26472.0,), (26421.0,), (26408.0,)]
+base_salary,grade
+27437.0,M3
+27088.0,M3
+26762.0,M2
 Thought:I now know the final answer
 Final Answer: There were 27437 workers making 100,000.
 
 Explanation:
 I queried the `xyz` table for the `salary` column where the department
-is 'IGM' and the date starts with '2020'. The query returned a list of tuples
-with the bazse salary for each day in 2020. To answer the question,
+is 'IGM' and the date starts with '2020'. The query returned the salary
+for each day in 2020. To answer the question,
 I took the sum of all the salaries in the list, which is 27437.
 I used the following query
 
@@ -115,21 +107,121 @@ SELECT [salary] FROM xyztable WHERE department = 'IGM' AND date LIKE '2020%'"
 """
 
 
-db = SQLDatabase.from_uri(f"sqlite:///{database_file_path}")
-toolkit = SQLDatabaseToolkit(db=db, llm=model)
+SCHEMA_SECTION = """
+## Database schema:
+The table is described below, with sample rows and a summary of the
+values of each column. It is up to date: do not call sql_db_list_tables or
+sql_db_schema, write the query directly.
+
+{schema}
+
+{table} is a view that looks up every text column for every row. Queries
+over many rows are faster on {storage}: the same rows, with the pay columns
+as they are and each text column X replaced by an integer X_code whose
+value is in its lookup table ({lookups}, columns code and value). Join only
+the lookup tables the query needs, e.g.
+SELECT d.value, SUM(r.Overtime_Pay) FROM {storage} AS r
+JOIN {example_lookup} AS d ON d.code = r.{example_code} GROUP BY d.value
+
+"""
+
+
+def agent_prefix(schema_text):
+    # the prefix is formatted with dialect and top_k by create_sql_agent
+    escaped = schema_text.replace("{", "{{").replace("}", "}}")
+    section = token_budget.minify(SCHEMA_SECTION).format(
+        schema=escaped,
+        table=ingest.table_name,
+        storage=encoding.storage_table(ingest.table_name),
+        lookups=", ".join(
+            f"{column}: {encoding.dim_table(column)}"
+            for column in encoding.CATEGORICAL_COLUMNS
+        ),
+        example_lookup=encoding.dim_table("Department_Name"),
+        example_code=encoding.code_column("Department_Name"),
+    )
+    prefix = token_budget.minify(MSSQL_AGENT_PREFIX)
+    return prefix.replace("## Tools:", section + "\n\n## Tools:")
+
 
 QUESTION = """what is the highest average salary by department, and give me the number?"
 """
-sql_agent = create_sql_agent(
-    prefix=MSSQL_AGENT_PREFIX,
-    format_instructions=MSSQL_AGENT_FORMAT_INSTRUCTIONS,
-    llm=model,
-    toolkit=toolkit,
-    top_k=30,
-    verbose=True,
-)
 
-# res = sql_agent.invoke(QUESTION)
+
+def guard():
+    return runtime.get("sql_guard", lambda: sql_guard.Guard(database_file_path))
+
+
+def guarded_database():
+    from langchain_community.utilities import SQLDatabase
+    from sqlalchemy.exc import SQLAlchemyError
+
+    class GuardedSQLDatabase(SQLDatabase):
+        # the query tool calls run_no_throw(); rejections go back to the
+        # model as errors, like failed queries
+        def run(self, command, fetch="all", include_columns=False, **kwargs):
+            if not isinstance(command, str):
+                return super().run(command, fetch, include_columns, **kwargs)
+            columns, rows, truncated = guard().run(command)
+            if fetch == "one":
+                rows = rows[:1]
+            if not rows:
+                return ""
+            if include_columns:
+                result = str([dict(zip(columns, row)) for row in rows])
+            else:
+                # header + rows, far fewer tokens than a list of tuples
+                result = token_budget.to_csv(columns, rows)
+            if truncated:
+                return f"{result}\n(only the first {len(rows)} rows are shown)"
+            return result
+
+        def run_no_throw(self, command, fetch="all", include_columns=False, **kwargs):
+            try:
+                return self.run(command, fetch, include_columns, **kwargs)
+            except (sql_guard.QueryRejected, SQLAlchemyError) as e:
+                return f"Error: {e}"
+
+    # keep the ingest bookkeeping tables out of the agent's view
+    # salaries_2023 is a view over the dictionary-encoded storage, which the
+    # agent may also query directly (see encoding.py)
+    return GuardedSQLDatabase.from_uri(
+        f"sqlite:///file:{database_file_path}?mode=ro&uri=true",
+        include_tables=[
+            ingest.table_name,
+            encoding.storage_table(ingest.table_name),
+            *map(encoding.dim_table, encoding.CATEGORICAL_COLUMNS),
+        ],
+        view_support=True,
+    )
+
+
+def build_sql_agent(version=None):
+    from langchain.agents import create_sql_agent
+    from langchain_community.agent_toolkits.sql.toolkit import SQLDatabaseToolkit
+
+    engine = runtime.engine()  # the database must be loaded before it is reflected
+    if version is None:
+        version = ingest.data_version(engine)
+    db = guarded_database()
+    toolkit = SQLDatabaseToolkit(db=db, llm=runtime.chat_model())
+    return create_sql_agent(
+        prefix=agent_prefix(schema_cache.describe(engine, version)),
+        format_instructions=token_budget.minify(MSSQL_AGENT_FORMAT_INSTRUCTIONS),
+        # streams its tokens, so the final answer shows as it is written
+        llm=runtime.chat_model(streaming=True),
+        toolkit=toolkit,
+        top_k=30,
+        verbose=True,
+    )
+
+
+def sql_agent(version=None):
+    """The agent for data `version` (its prompt embeds the schema summary)."""
+    return runtime.get("sql_agent", lambda: build_sql_agent(version), version)
+
+
+# res = sql_agent().invoke(QUESTION)
 
 # print(res)
 
@@ -141,8 +233,43 @@ question = st.text_input("Enter your query:")
 
 if st.button("Run Query"):
     if question:
-        res = sql_agent.invoke(question)
-
-        st.markdown(res["output"])
+        # repeat (or reworded) questions are answered without the agent until
+        # the data changes
+        cache = answer_cache.get_cache("sql_agent")
+        with tracing.trace("question", question=question) as trace:
+            engine = runtime.engine()
+            # pick up CSV changes without restarting the app (a stat when
+            # nothing changed)
+            ingest.ensure_loaded(file_url, engine)
+            version = ingest.data_version(engine)
+            answer = cache.get(question, version)
+            if answer is None:
+                # show the generated SQL and its results while the agent
+                # works, then the final answer token by token
+                stream = streaming.AgentStream(
+                    lambda callbacks: sql_agent(version).invoke(
+                        question, config={"callbacks": callbacks}
+                    ),
+                    callbacks=[tracing.LangChainTracer()],
+                )
+                steps = st.status("Querying the database...")
+                st.write_stream(
+                    stream.text(
+                        on_step=lambda event: steps.markdown(
+                            streaming.describe_step(event)
+                        )
+                    )
+                )
+                steps.update(label="Agent steps", state="complete")
+                answer = stream.output
+                cache.put(question, answer, version)
+            else:
+                st.caption("Answered from cache")
+                st.markdown(answer)
+
+        if trace.trace is not None:
+            # where the time went: LLM calls vs tool (SQL) runs
+            with st.expander("Timing breakdown"):
+                st.table(trace.trace.breakdown())
 else:
     st.error("Please enter a query.")
@@ -0,0 +1,192 @@
+import re
+import sqlite3
+import threading
+import time
+
+import tracing
+from executor import SQLiteExecutor
+
+# Execution guard for SQL written by the LLM (the LangChain SQL agent).
+#
+# The prompt asks the model for read-only queries limited to top_k rows, but
+# nothing enforced it. Every generated statement now goes through:
+#
+#   1. a lexical check: exactly one SELECT (or WITH ... SELECT) statement,
+#      no DML/DDL/PRAGMA/ATTACH keywords outside string literals;
+#   2. EXPLAIN QUERY PLAN: each full scan is costed at the table's row
+#      count, and scans nested in the same loop multiply (a cartesian or
+#      unindexed join); plans above max_plan_rows are rejected unrun;
+#   3. execution on a read-only connection (mode=ro) with a row limit and a
+#      statement timeout enforced by a SQLite progress handler, plus a cap on
+#      the number of guarded queries running at once.
+#
+# Rejections raise QueryRejected with a message meant to be shown to the
+# model, so it can rewrite the query.
+
+max_rows = 200
+statement_timeout = 5.0  # seconds
+max_plan_rows = 50_000_000
+max_concurrent = 4
+# SQLite VM instructions between two deadline checks
+progress_interval = 10_000
+
+ALLOWED_FIRST_WORDS = ("SELECT", "WITH")
+FORBIDDEN_WORDS = {
+    "INSERT",
+    "UPDATE",
+    "DELETE",
+    "UPSERT",
+    "DROP",
+    "ALTER",
+    "CREATE",
+    "ATTACH",
+    "DETACH",
+    "PRAGMA",
+    "VACUUM",
+    "REINDEX",
+    "ANALYZE",
+    "BEGIN",
+    "COMMIT",
+    "ROLLBACK",
+    "SAVEPOINT",
+    "RELEASE",
+}
+
+# string literals, quoted identifiers and comments, in the order SQLite reads them
+_LEXEMES = re.compile(
+    r"""'(?:[^']|'')*'|"(?:[^"]|"")*"|`(?:[^`]|``)*`|\[[^\]]*\]|--[^\n]*|/\*.*?(?:\*/|$)""",
+    re.S,
+)
+_WORD = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+
+
+class QueryRejected(ValueError):
+    pass
+
+
+def _code_only(sql):
+    # blank out literals and comments, keep the SQL keywords
+    def blank(match):
+        lexeme = match.group(0)
+        return " " if lexeme.startswith(("--", "/*")) else " _ "
+
+    return _LEXEMES.sub(blank, sql)
+
+
+def check_statement(sql):
+    """The statement without trailing semicolons, if it is a single
+    read-only query; raises QueryRejected otherwise."""
+    sql = sql.strip().rstrip(";").strip()
+    code = _code_only(sql)
+    if ";" in code:
+        raise QueryRejected("only one statement can be run at a time")
+    words = [w.upper() for w in _WORD.findall(code)]
+    if not words or words[0] not in ALLOWED_FIRST_WORDS:
+        raise QueryRejected("only SELECT queries are allowed")
+    forbidden = sorted(FORBIDDEN_WORDS.intersection(words))
+    if forbidden:
+        raise QueryRejected(f"{', '.join(forbidden)} is not allowed, only SELECT queries")
+    return sql
+
+
+class Guard:
+    def __init__(
+        self,
+        path,
+        max_rows=max_rows,
+        timeout=statement_timeout,
+        max_plan_rows=max_plan_rows,
+        max_concurrent=max_concurrent,
+    ):
+        self.executor = SQLiteExecutor(path, read_only=True)
+        self.max_rows = max_rows
+        self.timeout = timeout
+        self.max_plan_rows = max_plan_rows
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._sizes = (None, {})  # (file stamp, {table: rows})
+
+    def _table_sizes(self):
+        stamp = self.executor.file_stamp()
+        if self._sizes[0] != stamp or stamp is None:
+            connection = self.executor.connection()
+            sizes = {}
+            for (table,) in connection.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' "
+                "AND name NOT LIKE 'sqlite_%'"
+            ).fetchall():
+                # MAX(rowid) is a b-tree seek, unlike COUNT(*)
+                try:
+                    (rows,) = connection.execute(
+                        f'SELECT MAX(rowid) FROM "{table}"'
+                    ).fetchone()
+                except sqlite3.OperationalError:  # WITHOUT ROWID
+                    rows = None
+                sizes[table] = rows or 0
+            self._sizes = (stamp, sizes)
+        return self._sizes[1]
+
+    def plan_cost(self, sql):
+        """(estimated rows visited, plan lines) of `sql`."""
+        plan = self.executor.connection().execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+        sizes = self._table_sizes()
+        largest = max(sizes.values(), default=0)
+        loops = {}  # parent node -> rows visited by its nested loop
+        for _, parent, _, detail in plan:
+            if not detail.startswith("SCAN ") or detail.startswith("SCAN CONSTANT"):
+                continue
+            name = detail.split()[1]
+            # plans name aliases (of views, CTEs); assume the largest table
+            rows = sizes.get(name, largest)
+            loops[parent] = loops.get(parent, 1) * max(rows, 1)
+        lines = [detail for _, _, _, detail in plan]
+        return sum(loops.values()), lines
+
+    def run(self, sql):
+        """(column names, rows, truncated) of the guarded query."""
+        sql = check_statement(sql)
+        with tracing.span("guarded_sql", statement=sql) as span:
+            if not self._slots.acquire(timeout=self.timeout):
+                raise QueryRejected("the database is busy, try again")
+            try:
+                try:
+                    cost, plan = self.plan_cost(sql)
+                except sqlite3.Error as e:
+                    raise QueryRejected(f"invalid query: {e}")
+                span.set(plan_rows=cost)
+                if cost > self.max_plan_rows:
+                    raise QueryRejected(
+                        f"query would visit about {cost:,} rows ({'; '.join(plan)}); "
+                        "add join conditions or filters on indexed columns"
+                    )
+                columns, rows = self._execute(sql)
+            finally:
+                self._slots.release()
+            truncated = len(rows) > self.max_rows
+            rows = rows[: self.max_rows]
+            span.set(rows=len(rows), truncated=truncated)
+        return columns, rows, truncated
+
+    def _execute(self, sql):
+        connection = self.executor.connection()
+        deadline = time.monotonic() + self.timeout
+        # a non-zero return aborts the statement with "interrupted"
+        connection.set_progress_handler(
+            lambda: time.monotonic() > deadline, progress_interval
+        )
+        try:
+            cursor = connection.execute(sql)
+            rows = cursor.fetchmany(self.max_rows + 1)
+            return [d[0] for d in cursor.description], rows
+        except sqlite3.OperationalError as e:
+            if time.monotonic() > deadline:
+                raise QueryRejected(
+                    f"query cancelled after {self.timeout:g} s; make it cheaper"
+                )
+            raise QueryRejected(str(e))
+        except sqlite3.Error as e:
+            raise QueryRejected(str(e))
+        finally:
+            connection.set_progress_handler(None, 0)
+
+    def close(self):
+        self.executor.close()
@@ -0,0 +1,10 @@
+# Small statistics helpers shared by the load test, the batch runner and the
+# benchmarks, kept here so that none of them imports another's dependencies.
+
+
+def percentile(values, q):
+    values = sorted(values)
+    if not values:
+        return None
+    index = min(len(values) - 1, max(0, round(q / 100 * len(values)) - 1))
+    return values[index]
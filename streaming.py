@@ -0,0 +1,129 @@
+import contextvars
+import queue
+import threading
+
+# Incremental output for the LangChain agents.
+#
+# agent.invoke() only returns once the whole ReAct loop is done. AgentStream
+# runs it on a worker thread with a callback handler that puts events on a
+# queue as they happen: every tool the agent calls (with its input, e.g. the
+# generated SQL), every observation, and the tokens of the final answer
+# (everything the LLM streams after "Final Answer:"). The caller iterates the
+# events on its own thread, which is what Streamlit needs:
+#
+#     stream = AgentStream(lambda callbacks: agent.invoke(q, config={"callbacks": callbacks}))
+#     st.write_stream(stream.text(on_step=lambda event: status.markdown(describe_step(event))))
+#     answer = stream.output
+#
+# Final-answer tokens only arrive if the agent's chat model streams
+# (runtime.chat_model(streaming=True)); otherwise the answer comes in one
+# piece at the end.
+
+FINAL_ANSWER = "Final Answer:"
+
+max_observation_chars = 800
+
+_DONE = object()
+
+try:
+    from langchain_core.callbacks import BaseCallbackHandler
+except ImportError:  # only the LangChain agents stream through callbacks
+    BaseCallbackHandler = object
+
+
+class StreamingCallback(BaseCallbackHandler):
+    """Turns agent callbacks into ("step" | "observation" | "token", ...) events."""
+
+    def __init__(self, emit):
+        self.emit = emit
+        self._llm_text = {}  # run_id -> text so far, None once answering
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._llm_text[run_id] = ""
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._llm_text[run_id] = ""
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        text = self._llm_text.get(run_id, "")
+        if text is None:
+            self.emit(("token", token))
+            return
+        text += token
+        start = text.find(FINAL_ANSWER)
+        if start < 0:
+            self._llm_text[run_id] = text
+            return
+        self._llm_text[run_id] = None
+        rest = text[start + len(FINAL_ANSWER) :].lstrip()
+        if rest:
+            self.emit(("token", rest))
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._llm_text.pop(run_id, None)
+
+    def on_agent_action(self, action, **kwargs):
+        self.emit(("step", action.tool, action.tool_input))
+
+    def on_tool_end(self, output, **kwargs):
+        self.emit(("observation", str(output)))
+
+
+class AgentStream:
+    """Runs invoke(callbacks) in the background and yields its events."""
+
+    def __init__(self, invoke, callbacks=()):
+        self.output = None
+        self._events = queue.Queue()
+        self._error = None
+        handler = StreamingCallback(self._events.put)
+        callbacks = [handler, *callbacks]
+
+        def run():
+            try:
+                result = invoke(callbacks)
+                self.output = result["output"] if isinstance(result, dict) else result
+            except Exception as e:
+                self._error = e
+            finally:
+                self._events.put(_DONE)
+
+        # copy_context: spans opened by the agent nest under the caller's trace
+        context = contextvars.copy_context()
+        self._thread = threading.Thread(target=context.run, args=(run,), daemon=True)
+        self._thread.start()
+
+    def events(self):
+        while True:
+            event = self._events.get()
+            if event is _DONE:
+                break
+            yield event
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+    def text(self, on_step=None):
+        """The final answer as it is generated (for st.write_stream); other
+        events go to on_step."""
+        streamed = False
+        for event in self.events():
+            if event[0] == "token":
+                streamed = True
+                yield event[1]
+            elif on_step is not None:
+                on_step(event)
+        if not streamed and self.output:
+            yield self.output
+
+
+def describe_step(event):
+    """Markdown for a step or observation event."""
+    if event[0] == "step":
+        _, tool, tool_input = event
+        language = "sql" if "sql" in tool else "python"
+        return f"**{tool}**\n```{language}\n{str(tool_input).strip()}\n```"
+    observation = event[1]
+    if len(observation) > max_observation_chars:
+        observation = observation[:max_observation_chars] + " ..."
+    return f"```\n{observation}\n```"
@@ -0,0 +1,47 @@
+import os
+import sys
+
+import pytest
+
+# the modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+rows = 5000
+
+
+@pytest.fixture(scope="session")
+def salary_csv(tmp_path_factory):
+    from benchmarks import synthetic
+
+    path = tmp_path_factory.mktemp("data") / "salaries.csv"
+    synthetic.write_csv(str(path), rows, departments=8, divisions=40, grades=20)
+    return str(path)
+
+
+@pytest.fixture(scope="session")
+def salary_db(salary_csv):
+    from sqlalchemy import create_engine
+
+    import ingest
+
+    path = os.path.join(os.path.dirname(salary_csv), "salary.db")
+    ingest.ensure_loaded(salary_csv, create_engine(f"sqlite:///{path}"))
+    return path
+
+
+@pytest.fixture
+def tools(salary_db):
+    """helpers' tools, pointed at the test database."""
+    import helpers
+    from benchmarks.suite import use_database
+
+    use_database(salary_db)
+    return helpers.available_functions
+
+
+@pytest.fixture(scope="session")
+def numpy_backend(salary_csv):
+    from numpy_backend import NumpyBackend
+
+    cache_dir = os.path.join(os.path.dirname(salary_csv), "columnar")
+    return NumpyBackend.from_csv(salary_csv, cache_dir)
@@ -0,0 +1,36 @@
+import pytest
+
+from answer_cache import AnswerCache
+
+
+@pytest.mark.parametrize(
+    "cached, asked",
+    [
+        (
+            "In which department do men earn more than women?",
+            "In which department do women earn more than men?",
+        ),
+        (
+            "Which division pays more overtime than base salary?",
+            "Which division pays more base salary than overtime?",
+        ),
+    ],
+)
+def test_reordered_comparison_is_a_miss(cached, asked):
+    cache = AnswerCache(max_entries=8)
+    cache.put(cached, "cached answer")
+    assert cache.get(asked) is None
+    assert cache.get(cached) == "cached answer"
+
+
+def test_paraphrase_is_a_hit():
+    cache = AnswerCache(max_entries=8)
+    cache.put("What is the average salary of female employees?", "answer")
+    assert cache.get("what's the average salary for the female employees") == "answer"
+    assert cache.stats()["semantic_hits"] == 1
+
+
+def test_version_change_drops_entries():
+    cache = AnswerCache(max_entries=8)
+    cache.put("total overtime pay", "answer", version="1")
+    assert cache.get("total overtime pay", version="2") is None
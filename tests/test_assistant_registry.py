@@ -0,0 +1,86 @@
+import itertools
+import multiprocessing
+import threading
+import time
+from types import SimpleNamespace
+
+import assistant_registry
+
+
+class FakeClient:
+    def __init__(self):
+        ids = itertools.count()
+        self.created, self.deleted = [], []
+        self._lock = threading.Lock()
+
+        def create_thread():
+            with self._lock:
+                thread_id = f"thread_{next(ids)}"
+                self.created.append(thread_id)
+            return SimpleNamespace(id=thread_id)
+
+        def create_assistant(**fields):
+            return SimpleNamespace(id=f"asst_{fields['name']}_{next(ids)}")
+
+        self.beta = SimpleNamespace(
+            threads=SimpleNamespace(create=create_thread, delete=self.deleted.append),
+            assistants=SimpleNamespace(create=create_assistant),
+        )
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_one_shot_session_creates_only_its_thread():
+    client = FakeClient()
+    pool = assistant_registry.ThreadPool(client, spare=2)
+    thread_id = pool.thread_for("only")
+    assert pool.thread_for("only") == thread_id
+    time.sleep(0.1)
+    assert client.created == [thread_id]
+
+
+def test_later_sessions_get_spares():
+    client = FakeClient()
+    pool = assistant_registry.ThreadPool(client, spare=2)
+    used = {pool.thread_for("first"), pool.thread_for("second")}
+    assert wait_for(lambda: len(client.created) == 4)
+    third = pool.thread_for("third")
+    assert third in client.created[2:]
+    used.add(third)
+    pool.close()
+    # every thread no session took is deleted, including one still being made
+    assert wait_for(
+        lambda: sorted(client.deleted) == sorted(set(client.created) - used)
+    )
+
+
+def test_evicted_and_released_threads_are_deleted():
+    client = FakeClient()
+    pool = assistant_registry.ThreadPool(client, spare=0, max_sessions=1)
+    first = pool.thread_for("first")
+    second = pool.thread_for("second")
+    assert wait_for(lambda: client.deleted == [first])
+    pool.release("second")
+    assert wait_for(lambda: client.deleted == [first, second])
+
+
+def _register(path, name):
+    assistant_registry.get_or_create(FakeClient(), name, "model", [], path=path)
+
+
+def test_processes_keep_each_others_assistants(tmp_path):
+    path = str(tmp_path / "assistants.json")
+    names = [f"assistant {i}" for i in range(8)]
+    processes = [
+        multiprocessing.Process(target=_register, args=(path, name)) for name in names
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    assert sorted(assistant_registry._read(path)) == sorted(names)
@@ -0,0 +1,52 @@
+import pandas as pd
+import pytest
+
+import encoding
+import helpers
+from benchmarks import synthetic
+from benchmarks.suite import same_result
+
+names = [tool.name for tool in helpers.TOOLS]
+
+
+@pytest.fixture(scope="module")
+def arguments(salary_csv):
+    return synthetic.sample_arguments(
+        pd.read_csv(salary_csv, dtype=encoding.CSV_DTYPES)
+    )
+
+
+@pytest.mark.parametrize("name", names)
+def test_backends_agree(name, arguments, tools, numpy_backend):
+    kwargs = arguments[name]
+    expected = tools[name](**kwargs)
+    assert same_result(numpy_backend.functions()[name](**kwargs), expected)
+
+
+@pytest.mark.parametrize(
+    "name, kwargs",
+    [
+        ("get_avg_salary_and_female_count_for_division", {"division_name": "nope"}),
+        ("get_total_overtime_pay_for_department", {"department_name": "nope"}),
+        ("get_employee_count_by_gender_in_department", {"department_name": "nope"}),
+        ("get_total_longevity_pay_for_grade", {"grade": "nope"}),
+        ("get_employees_with_overtime_above", {"amount": 1e12}),
+    ],
+)
+def test_backends_agree_on_unknown_values(name, kwargs, tools, numpy_backend):
+    assert numpy_backend.functions()[name](**kwargs) == tools[name](**kwargs)
+
+
+def test_backends_agree_on_every_page(arguments, tools, numpy_backend):
+    kwargs = arguments["get_employees_with_overtime_above"]
+    sqlite_page = tools["get_employees_with_overtime_above"](**kwargs)
+    numpy_page = numpy_backend.functions()["get_employees_with_overtime_above"](**kwargs)
+    while True:
+        assert same_result(numpy_page, sqlite_page)
+        if sqlite_page["next_cursor"] is None:
+            break
+        cursor = sqlite_page["next_cursor"]
+        sqlite_page = tools["get_employees_with_overtime_above"](**kwargs, cursor=cursor)
+        numpy_page = numpy_backend.functions()["get_employees_with_overtime_above"](
+            **kwargs, cursor=cursor
+        )
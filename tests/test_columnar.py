@@ -0,0 +1,49 @@
+import os
+
+import pandas as pd
+import pytest
+
+import columnar
+import encoding
+from benchmarks import synthetic
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = str(tmp_path / "salaries.csv")
+    synthetic.generate(40, departments=3, divisions=6, grades=5).to_csv(path, index=False)
+    return path
+
+
+def expected(csv_path):
+    return pd.read_csv(csv_path, dtype=encoding.CSV_DTYPES).fillna(value=0)
+
+
+def same_frame(df, csv_path):
+    return df.astype(
+        {c: str for c in df.columns if isinstance(df[c].dtype, pd.CategoricalDtype)}
+    ).equals(expected(csv_path))
+
+
+def test_load_matches_the_csv(csv_path, tmp_path):
+    cache_dir = str(tmp_path / "columnar")
+    assert same_frame(columnar.load(csv_path, cache_dir), csv_path)
+    # the second load reads the cache
+    assert same_frame(columnar.load(csv_path, cache_dir), csv_path)
+
+
+def test_changed_csv_is_rebuilt(csv_path, tmp_path):
+    cache_dir = str(tmp_path / "columnar")
+    old = columnar.load(csv_path, cache_dir)
+    old_pay = old["Overtime_Pay"].copy()
+
+    df = expected(csv_path)
+    df["Overtime_Pay"] += 1000
+    df.to_csv(csv_path, index=False)
+    stat = os.stat(csv_path)
+    os.utime(csv_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    assert same_frame(columnar.load(csv_path, cache_dir), csv_path)
+    # a frame loaded before the rebuild still reads its own build
+    assert old["Overtime_Pay"].equals(old_pay)
+    assert not same_frame(old, csv_path)
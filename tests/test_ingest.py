@@ -0,0 +1,150 @@
+import os
+import sqlite3
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+
+import columnar
+import encoding
+import ingest
+import rollups
+from benchmarks import synthetic
+
+
+def grades(db_path):
+    with sqlite3.connect(db_path) as connection:
+        return {value for (value,) in connection.execute("SELECT value FROM dim_grade")}
+
+
+@pytest.fixture
+def mixed_chunks_csv(tmp_path):
+    # the second chunk's grades are all numbers plus a blank: read on its
+    # own, pandas would make the column float
+    df = synthetic.generate(20, departments=2, divisions=3, grades=4)
+    df["Grade"] = ["M1"] * 10 + ["21"] * 9 + [None]
+    path = tmp_path / "salaries.csv"
+    df.to_csv(path, index=False)
+    return str(path)
+
+
+def test_grades_keep_their_text_across_chunks(mixed_chunks_csv, tmp_path):
+    db_path = str(tmp_path / "salary.db")
+    ingest.ensure_loaded(
+        mixed_chunks_csv, create_engine(f"sqlite:///{db_path}"), chunksize=10
+    )
+    assert grades(db_path) == {"M1", "21", "0"}
+
+
+def test_columnar_categories_keep_their_text(mixed_chunks_csv, tmp_path):
+    cache_dir = str(tmp_path / "columnar")
+    columnar.build(mixed_chunks_csv, cache_dir, chunksize=10)
+    df = columnar.load(mixed_chunks_csv, cache_dir)
+    assert set(map(str, df["Grade"].cat.categories)) == {"M1", "21", "0"}
+    assert (df["Grade"].astype(str) == "21").sum() == 9
+
+
+cardinality = {"departments": 3, "divisions": 6, "grades": 5}
+
+
+def stored_rows(db_path):
+    with sqlite3.connect(db_path) as connection:
+        return connection.execute(
+            "SELECT Division, Department_Name, Grade, Gender, Base_Salary, "
+            "Overtime_Pay, Longevity_Pay FROM salaries_2023 ORDER BY rowid"
+        ).fetchall()
+
+
+def csv_rows(csv_path):
+    df = pd.read_csv(csv_path, dtype=encoding.CSV_DTYPES).fillna(value=0)
+    columns = ["Division", "Department_Name", "Grade", "Gender"]
+    pay = ["Base_Salary", "Overtime_Pay", "Longevity_Pay"]
+    return list(zip(*(df[c].astype(str) for c in columns), *(df[c] for c in pay)))
+
+
+def rollups_match(db_path):
+    # the rollups ingest maintains chunk by chunk against a GROUP BY of the rows
+    with sqlite3.connect(db_path) as connection:
+        for dimension in rollups.DIMENSIONS:
+            code = encoding.code_column(dimension)
+            gender = encoding.code_column("Gender")
+            direct = connection.execute(
+                f"SELECT {code}, {gender}, COUNT(*), ROUND(SUM(Overtime_Pay), 2) "
+                f"FROM salaries_2023_rows GROUP BY 1, 2 ORDER BY 1, 2"
+            ).fetchall()
+            rolled = connection.execute(
+                "SELECT key, gender, n, ROUND(sum_Overtime_Pay, 2) "
+                "FROM salaries_2023_rollup WHERE dimension = ? ORDER BY 1, 2",
+                (dimension,),
+            ).fetchall()
+            if rolled != direct:
+                return False
+    return True
+
+
+@pytest.fixture
+def loaded(tmp_path):
+    """A 35 row CSV (chunks of 10) and the engine it was ingested into."""
+    csv_path = str(tmp_path / "salaries.csv")
+    db_path = str(tmp_path / "salary.db")
+    synthetic.generate(35, **cardinality).to_csv(csv_path, index=False)
+    engine = create_engine(f"sqlite:///{db_path}")
+    outcome = ingest.ensure_loaded(csv_path, engine, chunksize=10)
+    assert outcome["status"] == "created"
+    assert outcome["rows_written"] == outcome["rows"] == 35
+    return csv_path, db_path, engine
+
+
+def touch(path):
+    # a new mtime even when the filesystem's clock granularity is coarse
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_unchanged_file_writes_nothing(loaded):
+    csv_path, db_path, engine = loaded
+    outcome = ingest.ensure_loaded(csv_path, engine, chunksize=10)
+    assert (outcome["status"], outcome["rows_written"]) == ("unchanged", 0)
+
+    touch(csv_path)
+    outcome = ingest.ensure_loaded(csv_path, engine, chunksize=10)
+    assert (outcome["status"], outcome["rows_written"]) == ("unchanged", 0)
+    assert stored_rows(db_path) == csv_rows(csv_path)
+
+
+def test_append_rewrites_only_the_tail(loaded):
+    csv_path, db_path, engine = loaded
+    synthetic.generate(12, part=1, **cardinality).to_csv(
+        csv_path, mode="a", header=False, index=False
+    )
+    outcome = ingest.ensure_loaded(csv_path, engine, chunksize=10)
+    # the old 5 row tail chunk is completed and the rest is new
+    assert outcome["status"] == "appended"
+    assert (outcome["rows"], outcome["rows_written"]) == (47, 17)
+    assert stored_rows(db_path) == csv_rows(csv_path)
+    assert rollups_match(db_path)
+
+
+def test_edit_rewrites_only_its_chunk(loaded):
+    csv_path, db_path, engine = loaded
+    df = pd.read_csv(csv_path, dtype=encoding.CSV_DTYPES)
+    df.loc[15, "Overtime_Pay"] += 1000
+    df.to_csv(csv_path, index=False)
+    touch(csv_path)
+    outcome = ingest.ensure_loaded(csv_path, engine, chunksize=10)
+    assert outcome["status"] == "updated"
+    assert (outcome["rows"], outcome["rows_written"]) == (35, 10)
+    assert stored_rows(db_path) == csv_rows(csv_path)
+    assert rollups_match(db_path)
+
+
+def test_shrunk_file_drops_rows(loaded):
+    csv_path, db_path, engine = loaded
+    df = pd.read_csv(csv_path, dtype=encoding.CSV_DTYPES)
+    df.head(22).to_csv(csv_path, index=False)
+    touch(csv_path)
+    outcome = ingest.ensure_loaded(csv_path, engine, chunksize=10)
+    assert outcome["status"] == "updated"
+    assert outcome["rows"] == 22
+    assert stored_rows(db_path) == csv_rows(csv_path)
+    assert rollups_match(db_path)
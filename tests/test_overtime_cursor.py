@@ -0,0 +1,62 @@
+import pytest
+
+import helpers
+
+amount = 10000.0
+
+
+@pytest.fixture(params=["sqlite", "numpy"])
+def overtime(request, tools, numpy_backend):
+    if request.param == "numpy":
+        return numpy_backend.functions()["get_employees_with_overtime_above"]
+    return tools["get_employees_with_overtime_above"]
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "NQ==",  # valid base64 and JSON, but not a cursor
+        "not base64!",
+        helpers._encode_cursor(amount + 1, 20000.0, 1),  # another amount
+    ],
+)
+def test_invalid_cursor_is_an_error_result(overtime, cursor):
+    result = overtime(amount=amount, cursor=cursor)
+    assert "Invalid cursor" in result["error"]
+
+
+def test_pages_cover_every_row_once(overtime):
+    first = overtime(amount=amount)
+    seen, page = [], first
+    while True:
+        seen += [e["Overtime_Pay"] for e in page["employees"]]
+        if not page["next_cursor"]:
+            break
+        page = overtime(amount=amount, cursor=page["next_cursor"])
+    assert len(seen) == first["count"]
+    assert seen == sorted(seen, reverse=True)
+    assert min(seen) > amount
+
+
+@pytest.mark.parametrize("position", [(0.0, 1), (12345.67, 4321), (1e308, 1 << 62)])
+def test_cursor_round_trip(position):
+    cursor = helpers._encode_cursor(amount, *position)
+    assert tuple(helpers._decode_cursor(cursor, amount)) == position
+
+
+def test_cursor_is_bound_to_its_amount():
+    cursor = helpers._encode_cursor(amount, 20000.0, 1)
+    with pytest.raises(ValueError, match="belongs to amount"):
+        helpers._decode_cursor(cursor, amount + 1)
+
+
+def test_pages_break_ties_by_row(overtime):
+    # almost half the employees have no overtime: one long run of equal pays
+    first = overtime(amount=-1.0)
+    count, page = 0, first
+    while True:
+        count += len(page["employees"])
+        if not page["next_cursor"]:
+            break
+        page = overtime(amount=-1.0, cursor=page["next_cursor"])
+    assert count == first["count"] == 5000
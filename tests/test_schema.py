@@ -0,0 +1,76 @@
+import sqlite3
+
+import pytest
+from sqlalchemy import create_engine
+
+import schema
+from benchmarks import synthetic
+from executor import text
+
+columns = [name for name, _ in schema.COLUMNS]
+
+
+def user_version(db_path):
+    with sqlite3.connect(db_path) as connection:
+        return connection.execute("PRAGMA user_version").fetchone()[0]
+
+
+def view_rows(db_path):
+    with sqlite3.connect(db_path) as connection:
+        return connection.execute(
+            f"SELECT {', '.join(columns)} FROM salaries_2023 ORDER BY rowid"
+        ).fetchall()
+
+
+@pytest.fixture
+def legacy_db(tmp_path):
+    """A database as the app used to write it: DataFrame.to_sql, no migrations."""
+    df = synthetic.generate(50, departments=3, divisions=6, grades=5)
+    df.loc[3, "Grade"] = None
+    db_path = str(tmp_path / "salary.db")
+    df[columns].to_sql("salaries_2023", create_engine(f"sqlite:///{db_path}"), index=False)
+    # the migration stores missing categories as "0", as ingest does
+    expected = list(df[columns].fillna({"Grade": "0"}).itertuples(index=False, name=None))
+    return db_path, expected
+
+
+def test_fresh_database_gets_every_migration(tmp_path):
+    db_path = str(tmp_path / "salary.db")
+    engine = create_engine(f"sqlite:///{db_path}")
+    assert schema.migrate(engine) == len(schema.MIGRATIONS)
+    assert user_version(db_path) == len(schema.MIGRATIONS)
+    assert schema.migrate(engine) == 0
+    assert view_rows(db_path) == []
+
+
+def test_legacy_table_keeps_its_rows(legacy_db):
+    db_path, expected = legacy_db
+    engine = create_engine(f"sqlite:///{db_path}")
+    assert schema.migrate(engine) == len(schema.MIGRATIONS)
+    assert view_rows(db_path) == expected
+    assert schema.migrate(engine) == 0
+    with sqlite3.connect(db_path) as connection:
+        kinds = dict(
+            connection.execute(
+                "SELECT name, type FROM sqlite_master "
+                "WHERE name IN ('salaries_2023', 'salaries_2023_rows')"
+            ).fetchall()
+        )
+        rolled = connection.execute(
+            "SELECT SUM(n) FROM salaries_2023_rollup WHERE dimension = 'Grade'"
+        ).fetchone()[0]
+    assert kinds == {"salaries_2023": "view", "salaries_2023_rows": "table"}
+    assert rolled == len(expected)
+
+
+def test_pending_migrations_run_from_the_recorded_version(legacy_db):
+    # a database migrated by an older release stops at the text indexes
+    db_path, expected = legacy_db
+    engine = create_engine(f"sqlite:///{db_path}")
+    with engine.begin() as connection:
+        for migration in schema.MIGRATIONS[:2]:
+            migration(connection, "salaries_2023")
+        connection.execute(text("PRAGMA user_version = 2"))
+    assert schema.migrate(engine) == len(schema.MIGRATIONS) - 2
+    assert user_version(db_path) == len(schema.MIGRATIONS)
+    assert view_rows(db_path) == expected
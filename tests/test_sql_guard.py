@@ -0,0 +1,69 @@
+import pytest
+
+import sql_guard
+from sql_guard import QueryRejected
+
+
+@pytest.fixture
+def guard(salary_db):
+    guard = sql_guard.Guard(salary_db, max_rows=7, timeout=0.2, max_plan_rows=1_000_000)
+    yield guard
+    guard.close()
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        "DELETE FROM salaries_2023_rows",
+        "UPDATE salaries_2023_rows SET Base_Salary = 0",
+        "DROP TABLE salaries_2023_rows",
+        "PRAGMA user_version = 0",
+        "ATTACH DATABASE 'other.db' AS other",
+        "SELECT 1; DELETE FROM salaries_2023_rows",
+        "WITH t AS (SELECT 1) DELETE FROM salaries_2023_rows",
+        "",
+    ],
+)
+def test_only_single_selects_pass(sql):
+    with pytest.raises(QueryRejected):
+        sql_guard.check_statement(sql)
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        "SELECT COUNT(*) FROM salaries_2023;",
+        "select Grade from salaries_2023 where Division = 'DROP; DELETE'",
+        "WITH t AS (SELECT 1 AS x) SELECT x FROM t -- then DROP it",
+    ],
+)
+def test_selects_pass(sql):
+    # keywords inside literals and comments are not statements
+    assert sql_guard.check_statement(sql) == sql.rstrip(";")
+
+
+def test_rows_are_capped(guard):
+    columns, rows, truncated = guard.run("SELECT Grade, Base_Salary FROM salaries_2023")
+    assert columns == ["Grade", "Base_Salary"]
+    assert (len(rows), truncated) == (7, True)
+
+    columns, rows, truncated = guard.run("SELECT COUNT(*) AS n FROM salaries_2023_rows")
+    assert (columns, rows, truncated) == (["n"], [(5000,)], False)
+
+
+def test_cartesian_join_is_rejected_unrun(guard):
+    with pytest.raises(QueryRejected, match="would visit"):
+        guard.run("SELECT COUNT(*) FROM salaries_2023_rows AS a, salaries_2023_rows AS b")
+
+
+def test_slow_query_is_cancelled(guard):
+    with pytest.raises(QueryRejected, match="cancelled"):
+        guard.run(
+            "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) "
+            "SELECT MAX(i) FROM n"
+        )
+
+
+def test_invalid_query_is_rejected(guard):
+    with pytest.raises(QueryRejected, match="invalid query"):
+        guard.run("SELECT no_such_column FROM salaries_2023_rows")
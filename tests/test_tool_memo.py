@@ -0,0 +1,109 @@
+import json
+import os
+import shutil
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+
+import backends
+import ingest
+import numpy_backend
+import tool_cache
+import tool_dispatch
+from benchmarks import synthetic
+from benchmarks.suite import use_database
+
+name = "get_total_overtime_pay_for_department"
+
+
+@pytest.fixture
+def memo(tools):
+    tool_cache.memo.clear()
+    yield tool_cache.memo
+    tool_cache.memo.clear()
+
+
+@pytest.fixture(scope="module")
+def department(salary_csv):
+    arguments = synthetic.sample_arguments(pd.read_csv(salary_csv))
+    return arguments[name]["department_name"]
+
+
+def call(department):
+    return tool_dispatch.call_tool(name, json.dumps({"department_name": department}))
+
+
+class FixedBackend:
+    name = "fixed"
+
+    def functions(self):
+        return {name: lambda department_name: {"total_overtime_pay": -1}}
+
+    def data_version(self):
+        return "1"
+
+
+def test_backends_do_not_share_entries(memo, monkeypatch, department):
+    sqlite = call(department)
+    hits = memo.stats()["hits"]
+    monkeypatch.setenv("TOOL_BACKEND", "fixed")
+    monkeypatch.setitem(backends.BACKENDS, "fixed", FixedBackend)
+    assert call(department) == {"total_overtime_pay": -1}
+    monkeypatch.setenv("TOOL_BACKEND", "sqlite")
+    assert call(department) == sqlite
+    assert memo.stats()["hits"] == hits + 1
+
+
+def test_numpy_results_follow_the_csv(
+    memo, monkeypatch, salary_csv, department, tmp_path
+):
+    csv_path = str(tmp_path / "salaries.csv")
+    shutil.copy(salary_csv, csv_path)
+    cache_dir = str(tmp_path / "columnar")
+    monkeypatch.setenv("TOOL_BACKEND", "numpy")
+    monkeypatch.setitem(
+        backends.BACKENDS, "numpy", lambda: numpy_backend.get(csv_path, cache_dir)
+    )
+    before = call(department)
+    assert call(department) == before
+    invalidations = memo.stats()["invalidations"]
+
+    # more employees in every department: the arrays are rebuilt and the
+    # memoized result must not be served any more
+    appended = synthetic.generate(
+        1000, part=1, departments=8, divisions=40, grades=20
+    )
+    appended.to_csv(csv_path, mode="a", header=False, index=False)
+    stat = os.stat(csv_path)
+    os.utime(csv_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    after = call(department)
+    assert after["total_overtime_pay"] > before["total_overtime_pay"]
+    assert memo.stats()["invalidations"] == invalidations + 1
+
+
+def test_sqlite_results_follow_a_reload(
+    memo, monkeypatch, salary_csv, salary_db, department, tmp_path
+):
+    csv_path = str(tmp_path / "salaries.csv")
+    db_path = str(tmp_path / "salary.db")
+    shutil.copy(salary_csv, csv_path)
+    shutil.copy(salary_db, db_path)
+    monkeypatch.setenv("TOOL_BACKEND", "sqlite")
+    use_database(db_path)
+    try:
+        before = call(department)
+        assert call(department) == before
+        invalidations = memo.stats()["invalidations"]
+
+        appended = synthetic.generate(
+            1000, part=1, departments=8, divisions=40, grades=20
+        )
+        appended.to_csv(csv_path, mode="a", header=False, index=False)
+        outcome = ingest.ensure_loaded(csv_path, create_engine(f"sqlite:///{db_path}"))
+        assert outcome["status"] == "appended"
+        after = call(department)
+        assert after["total_overtime_pay"] > before["total_overtime_pay"]
+        assert memo.stats()["invalidations"] == invalidations + 1
+    finally:
+        use_database(salary_db)
@@ -0,0 +1,26 @@
+from types import SimpleNamespace
+
+import token_budget
+import tool_dispatch
+import tracing
+
+tool_call = SimpleNamespace(
+    id="call_0", function=SimpleNamespace(name="get_total_overtime_pay_for_department")
+)
+
+
+def test_no_tokenizing_without_tracing(monkeypatch):
+    counted = []
+    monkeypatch.setattr(token_budget, "count_tokens", counted.append)
+    monkeypatch.setattr(tracing, "enabled", False)
+    message = tool_dispatch.tool_message(tool_call, {"total_overtime_pay": 1.5})
+    assert message["content"] == '{"total_overtime_pay":1.5}'
+    assert counted == []
+
+
+def test_tokens_are_recorded_when_tracing(monkeypatch):
+    monkeypatch.setattr(tracing, "enabled", True)
+    with tracing.trace("question") as root:
+        tool_dispatch.tool_message(tool_call, {"total_overtime_pay": 1.5})
+    (serialize,) = [s for s in root.trace.spans if s.name == "serialize"]
+    assert serialize.attributes["tokens"] > 0
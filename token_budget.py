@@ -0,0 +1,246 @@
+import copy
+import json
+import math
+import os
+import re
+import threading
+
+# Prompt assembly under a token budget.
+#
+# Token counts are measured locally with tiktoken and fall back to an
+# estimate (words and punctuation, long words in 4-character pieces, line
+# breaks and runs of blanks) when it or its encoding file is unavailable.
+# Prompts and tool schemas are minified once (indentation and runs of blank
+# lines removed, descriptions on one line), tool results are serialized as
+# compact JSON, or CSV for lists of rows, instead of Python reprs, and fit()
+# keeps every chat completion request under max_prompt_tokens by dropping the
+# oldest turns first and then cutting the largest tool results.
+
+model_name = "gpt-3.5-turbo"
+
+max_prompt_tokens = int(os.getenv("PROMPT_TOKEN_BUDGET", "6000"))
+# a tool result is never cut below this many tokens
+min_result_tokens = 200
+
+# chat format overhead per message and for the reply, as documented for the
+# gpt-3.5/gpt-4 models
+tokens_per_message = 3
+tokens_per_name = 1
+reply_tokens = 3
+
+TRUNCATED = " ...[truncated to fit the token budget]"
+
+_PIECES = re.compile(r"\w+|[^\w\s]|\s*\n\s*| {2,}|\t+")
+_encoding = None
+_encoding_lock = threading.Lock()
+
+
+def _tokenizer():
+    global _encoding
+    if _encoding is None:
+        # once per process, even when the first requests arrive together
+        with _encoding_lock:
+            if _encoding is None:
+                try:
+                    import tiktoken
+
+                    _encoding = tiktoken.encoding_for_model(model_name)
+                except Exception as e:  # not installed, or no BPE file
+                    print(f"{e}; estimating token counts instead")
+                    _encoding = False
+    return _encoding
+
+
+def count_tokens(text):
+    if not text:
+        return 0
+    encoding = _tokenizer()
+    if encoding:
+        return len(encoding.encode(text, disallowed_special=()))
+    return sum(
+        1 if piece.isspace() else math.ceil(len(piece) / 4)
+        for piece in _PIECES.findall(text)
+    )
+
+
+def _field(message, key):
+    # messages are dicts or the SDK's ChatCompletionMessage objects
+    if isinstance(message, dict):
+        return message.get(key)
+    return getattr(message, key, None)
+
+
+def _tool_calls_text(message):
+    parts = []
+    for tool_call in _field(message, "tool_calls") or []:
+        function = _field(tool_call, "function")
+        parts += [_field(function, "name") or "", _field(function, "arguments") or ""]
+    return " ".join(parts)
+
+
+def count_message(message):
+    tokens = tokens_per_message + count_tokens(str(_field(message, "content") or ""))
+    tokens += count_tokens(_tool_calls_text(message))
+    if _field(message, "name"):
+        tokens += tokens_per_name + count_tokens(_field(message, "name"))
+    return tokens
+
+
+def count_tools(tools):
+    # the API renders the schemas into the system prompt; their compact JSON
+    # is a close, slightly high estimate
+    if not tools:
+        return 0
+    return count_tokens(json.dumps(tools, separators=(",", ":")))
+
+
+def count_request(messages, tools=None):
+    """Prompt tokens of a chat completion request."""
+    return sum(count_message(m) for m in messages) + count_tools(tools) + reply_tokens
+
+
+def minify(text):
+    """`text` without indentation, runs of spaces and repeated blank lines
+    (tabs inside a line are kept, they separate columns)."""
+    lines = [re.sub(r" {2,}", " ", line.strip()) for line in text.strip().splitlines()]
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines))
+
+
+def compact_tools(tools):
+    """A copy of the tool schemas with every description on one line."""
+    tools = copy.deepcopy(tools)
+
+    def walk(node):
+        if isinstance(node, dict):
+            for key, value in node.items():
+                if key == "description" and isinstance(value, str):
+                    node[key] = " ".join(value.split())
+                else:
+                    walk(value)
+        elif isinstance(node, list):
+            for item in node:
+                walk(item)
+
+    walk(tools)
+    return tools
+
+
+def _jsonable(value):
+    if isinstance(value, float):
+        return None if math.isnan(value) or math.isinf(value) else value
+    if isinstance(value, dict):
+        return {k: _jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return _table(value) or [_jsonable(v) for v in value]
+    if hasattr(value, "item"):  # numpy scalars
+        return _jsonable(value.item())
+    return value
+
+
+def _table(rows):
+    # rows that are dicts with the same keys -> {"columns": [...], "rows": [[...]]}
+    if len(rows) < 2 or not all(isinstance(r, dict) for r in rows):
+        return None
+    columns = list(rows[0])
+    if any(list(r) != columns for r in rows):
+        return None
+    return {
+        "columns": columns,
+        "rows": [[_jsonable(r[c]) for c in columns] for r in rows],
+    }
+
+
+def to_csv(columns, rows):
+    import csv
+    import io
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(columns)
+    writer.writerows([_jsonable(v) for v in row] for row in rows)
+    return buffer.getvalue().rstrip("\n")
+
+
+def serialize(result):
+    """Compact text of a tool result: CSV for a list of rows, else JSON."""
+    if isinstance(result, str):
+        return result
+    if isinstance(result, (list, tuple)):
+        table = _table(result)
+        if table is not None:
+            return to_csv(table["columns"], table["rows"])
+    return json.dumps(_jsonable(result), separators=(",", ":"), default=str)
+
+
+def truncate(text, max_tokens):
+    """`text` cut to about `max_tokens`, at a line break when there is one."""
+    tokens = count_tokens(text)
+    if tokens <= max_tokens:
+        return text
+    room = max(max_tokens - count_tokens(TRUNCATED), 0)
+    keep = text[: int(len(text) * room / tokens)]
+    if "\n" in keep:
+        keep = keep[: keep.rindex("\n")]
+    return keep + TRUNCATED
+
+
+def _turns(messages):
+    # [system messages], then groups that each start at a user message
+    pinned, turns = [], []
+    for message in messages:
+        role = _field(message, "role")
+        if role == "system" and not turns:
+            pinned.append(message)
+        elif role == "user" or not turns:
+            turns.append([message])
+        else:
+            turns[-1].append(message)
+    return pinned, turns
+
+
+def fit(messages, tools=None, budget=None, span=None):
+    """The messages of one request, trimmed to `budget` prompt tokens.
+
+    Older turns are dropped first (system messages and the current turn are
+    kept whole, so tool calls stay next to their results); then the largest
+    tool results of what is left are cut. The input list is not modified.
+    The estimate is recorded on `span` (a tracing span) when one is given."""
+    budget = max_prompt_tokens if budget is None else budget
+    total = count_request(messages, tools)
+    if total <= budget:
+        if span is not None:
+            span.set(prompt_estimate=total)
+        return messages
+    before = total
+
+    pinned, turns = _turns(messages)
+    while len(turns) > 1 and total > budget:
+        total -= sum(count_message(m) for m in turns.pop(0))
+    kept = pinned + [m for turn in turns for m in turn]
+
+    if total > budget:
+        results = sorted(
+            (
+                (count_message(m), i)
+                for i, m in enumerate(kept)
+                if _field(m, "role") == "tool"
+            ),
+            reverse=True,
+        )
+        for size, i in results:
+            if total <= budget:
+                break
+            allowed = max(min_result_tokens, size - (total - budget))
+            if allowed >= size:
+                continue
+            message = dict(kept[i])
+            message["content"] = truncate(str(message["content"]), allowed)
+            kept[i] = message
+            total -= size - count_message(message)
+    if span is not None:
+        span.set(
+            prompt_estimate=total,
+            trimmed_tokens=before - total,
+            dropped_messages=len(messages) - len(kept),
+        )
+    return kept
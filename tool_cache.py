@@ -0,0 +1,116 @@
+import json
+import threading
+from collections import OrderedDict
+
+# Memoization of tool results across calls and conversations.
+#
+# The tools are pure functions of their arguments and the data, so results
+# are cached under (backend, function name, canonical arguments) for the
+# backend's current data version (see backends.py: the ingest fingerprint for
+# SQLite, the CSV's stamp for the arrays); a backend's entries are dropped
+# when its version changes. The cache is bounded by entry count and by the
+# size of the results as they are sent to the model. Cached results are shared: callers
+# must not mutate them. Failures are never cached: a tool that raises
+# propagates the error, and {"error": ...} results are returned unstored.
+
+max_entries = 4096
+max_bytes = 16 * 1024 * 1024
+
+
+def canonical_args(kwargs):
+    # 1000 and 1000.0 are the same amount for the tools
+    def canonical(value):
+        if isinstance(value, bool):
+            return value
+        if isinstance(value, (int, float)):
+            return float(value)
+        return value
+
+    return json.dumps(
+        {k: canonical(v) for k, v in kwargs.items()}, sort_keys=True, default=str
+    )
+
+
+class ToolMemo:
+    def __init__(self, max_entries=max_entries, max_bytes=max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (result, size)
+        self._bytes = 0
+        self._versions = {}  # backend name -> data version of its entries
+        self.metrics = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "invalidations": 0,
+        }
+
+    def _check_version(self, backend):
+        version = backend.data_version()
+        if (
+            backend.name not in self._versions
+            or self._versions[backend.name] != version
+        ):
+            stale = [key for key in self._entries if key[0] == backend.name]
+            if stale:
+                self.metrics["invalidations"] += 1
+            for key in stale:
+                self._bytes -= self._entries.pop(key)[1]
+            self._versions[backend.name] = version
+        return version
+
+    def call(self, backend, name, function, kwargs):
+        """function(**kwargs), memoized for `backend`'s data version."""
+        key = (backend.name, name, canonical_args(kwargs))
+        with self._lock:
+            version = self._check_version(backend)
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.metrics["hits"] += 1
+                return entry[0]
+            self.metrics["misses"] += 1
+
+        # run outside the lock so slow tools do not serialize everyone
+        result = function(**kwargs)
+        if isinstance(result, dict) and "error" in result:
+            return result
+        size = len(str(result))
+        if size > self.max_bytes:
+            return result
+
+        with self._lock:
+            if version != self._versions.get(backend.name):
+                return result  # the data changed while the tool ran
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (result, size)
+            self._bytes += size
+            while (
+                len(self._entries) > self.max_entries or self._bytes > self.max_bytes
+            ):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.metrics["evictions"] += 1
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._versions.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.metrics["hits"] + self.metrics["misses"]
+            hit_rate = round(self.metrics["hits"] / lookups, 3) if lookups else None
+            return {
+                **self.metrics,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hit_rate": hit_rate,
+            }
+
+
+memo = ToolMemo()
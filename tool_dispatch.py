@@ -0,0 +1,144 @@
+import asyncio
+import contextvars
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import backends
+import helpers
+import result_shaping
+import token_budget
+import tool_cache
+import tracing
+
+# Executes all tool calls of one assistant turn concurrently.
+#
+# The helpers are DB/IO bound and release the GIL inside sqlite3, so a small
+# shared thread pool lets a turn with N tool calls cost roughly one tool
+# latency instead of N. Results are returned in the order of the calls.
+
+max_workers = 8
+
+_pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tool")
+
+# tool name -> parameter names accepted by the tool's JSON schema
+_parameters = {
+    tool["function"]["name"]: set(tool["function"]["parameters"]["properties"])
+    for tool in helpers.tools_sql
+}
+
+
+def call_tool(function_name, arguments, functions=None):
+    """Run one tool from its name and JSON-encoded arguments."""
+    with tracing.span("tool", tool=function_name, arguments=arguments or ""):
+        return _call_tool(function_name, arguments, functions)
+
+
+def _call_tool(function_name, arguments, functions):
+    # the configured backend's registry (see backends.py)
+    backend = backends.get_backend() if functions is None else None
+    functions = backend.functions() if backend is not None else functions
+    function_to_call = functions.get(function_name)
+    if function_to_call is None:
+        return {"error": f"Unknown function: {function_name}"}
+    try:
+        function_args = json.loads(arguments or "{}")
+    except json.JSONDecodeError as e:
+        return {"error": f"Invalid arguments for {function_name}: {e}"}
+    # the model sometimes adds arguments the tool does not take
+    allowed = _parameters.get(function_name)
+    if allowed is not None:
+        function_args = {k: v for k, v in function_args.items() if k in allowed}
+    if backend is not None:
+        # registry tools are pure given the data version, see tool_cache.py
+        return tool_cache.memo.call(
+            backend, function_name, function_to_call, function_args
+        )
+    return function_to_call(**function_args)
+
+
+def tool_message(tool_call, function_response):
+    """The tool message carrying `function_response` back to the model."""
+    with tracing.span("serialize", tool=tool_call.function.name) as span:
+        content = token_budget.serialize(result_shaping.shape(function_response))
+        if tracing.enabled:
+            # tokenizing is not free; only pay for it when it is recorded
+            span.set(
+                payload_bytes=len(content), tokens=token_budget.count_tokens(content)
+            )
+    return {
+        "tool_call_id": tool_call.id,
+        "role": "tool",
+        "name": tool_call.function.name,
+        "content": content,
+    }
+
+
+def run_tool_calls(tool_calls, functions=None):
+    """Execute `tool_calls` in parallel and return one tool message per call."""
+    # copy_context: tool spans nest under the caller's span in the worker
+    futures = [
+        _pool.submit(
+            contextvars.copy_context().run,
+            call_tool,
+            tool_call.function.name,
+            tool_call.function.arguments,
+            functions,
+        )
+        for tool_call in tool_calls
+    ]
+    messages = []
+    for tool_call, future in zip(tool_calls, futures):
+        try:
+            function_response = future.result()
+        except Exception as e:
+            print(e)
+            function_response = {"error": str(e)}
+        messages.append(tool_message(tool_call, function_response))
+    return messages
+
+
+def call_key(tool_call):
+    """(name, canonical arguments): equal for calls that compute the same thing."""
+    arguments = tool_call.function.arguments or "{}"
+    try:
+        arguments = tool_cache.canonical_args(json.loads(arguments))
+    except (json.JSONDecodeError, AttributeError):
+        pass  # left as sent; the call reports the error
+    return tool_call.function.name, arguments
+
+
+async def arun_tool_calls(tool_calls, functions=None, shared=None):
+    """Async variant of run_tool_calls: awaits the same bounded pool, so many
+    concurrent conversations share max_workers threads.
+
+    `shared` is a dict kept by the caller across conversations (e.g. a batch):
+    identical calls then run once, even while the first is still running."""
+    loop = asyncio.get_running_loop()
+
+    def submit(tool_call):
+        return loop.run_in_executor(
+            _pool,
+            contextvars.copy_context().run,
+            call_tool,
+            tool_call.function.name,
+            tool_call.function.arguments,
+            functions,
+        )
+
+    futures = []
+    for tool_call in tool_calls:
+        if shared is None:
+            futures.append(submit(tool_call))
+            continue
+        key = call_key(tool_call)
+        if key not in shared:
+            shared[key] = submit(tool_call)
+        futures.append(shared[key])
+    results = await asyncio.gather(*futures, return_exceptions=True)
+    messages = []
+    for tool_call, function_response in zip(tool_calls, results):
+        if isinstance(function_response, Exception):
+            print(function_response)
+            function_response = {"error": str(function_response)}
+        messages.append(tool_message(tool_call, function_response))
+    return messages
@@ -0,0 +1,406 @@
+import encoding
+import rollups
+import runtime
+import schema
+
+# Declarative tools for the function-calling agents.
+#
+# An aggregate tool is declared as data: the arguments the model passes (each
+# bound to a column and a comparison), fixed filters, the aggregates to
+# return and an optional group-by column. From that declaration we generate
+#
+#   - the OpenAI function schema (helpers.tools_sql),
+#   - argument validation that runs before any query: types are coerced,
+#     missing arguments are reported, and names are translated to the
+#     integer codes of the storage (see encoding.py), so an unknown name is
+#     answered as "no rows" without touching the database,
+#   - the plan: tools that filter on one rollup dimension (and maybe Gender)
+#     and only need counts, sums and averages of pay columns are answered
+#     from the rollups (see rollups.py); everything else runs one bound,
+#     parameterized query on the storage table,
+#   - the covering index that query needs (equality columns first, then the
+#     group-by, the range column and the aggregated columns), created by
+#     ingest.py through schema.ensure_indexes when it does not exist yet.
+#
+# Tools that need hand-written code (e.g. pagination) are FunctionTools: the
+# schema and validation still come from their Params.
+#
+#     Tool(
+#         "get_total_longevity_pay_for_grade",
+#         "Retrieves the total longevity pay for a specific grade.",
+#         params=[Param("grade", "The grade of the employees.", column="Grade")],
+#         aggregates=[Aggregate("total_longevity_pay", "sum", "Longevity_Pay", digits=2)],
+#     )
+
+table_name = runtime.table_name
+
+AGGREGATES = {
+    "count": "COUNT(*)",
+    "sum": "SUM({})",
+    "avg": "AVG({})",
+    "min": "MIN({})",
+    "max": "MAX({})",
+}
+# the aggregates the rollups can answer (see rollups.STAT_COLUMNS)
+ROLLUP_AGGREGATES = {"count", "sum", "avg"}
+COMPARISONS = ("=", ">", ">=", "<", "<=")
+
+_COLUMN_TYPES = dict(schema.COLUMNS)
+
+
+class ToolArgumentError(ValueError):
+    pass
+
+
+def _check_column(column):
+    if column not in _COLUMN_TYPES:
+        raise ValueError(f"Unknown column {column!r}, expected one of {list(_COLUMN_TYPES)}")
+
+
+def _sql_column(column):
+    # the storage table holds the codes of the categorical columns
+    if column in encoding.CATEGORICAL_COLUMNS:
+        return encoding.code_column(column)
+    return column
+
+
+class Param:
+    """An argument of a tool; with a column it is also a filter."""
+
+    def __init__(self, name, description, column=None, op="=", type=None, required=True):
+        if column is not None:
+            _check_column(column)
+        if op not in COMPARISONS:
+            raise ValueError(f"Unknown comparison {op!r}, expected one of {COMPARISONS}")
+        self.categorical = column in encoding.CATEGORICAL_COLUMNS
+        if self.categorical and op != "=":
+            raise ValueError(f"{column} is categorical, it can only be compared with =")
+        if type is None:
+            type = "string" if column is None or self.categorical else "number"
+        self.name = name
+        self.description = description
+        self.column = column
+        self.op = op
+        self.type = type
+        self.required = required
+
+    def schema(self):
+        return {"type": self.type, "description": self.description}
+
+    def coerce(self, value):
+        if self.type == "number":
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                raise ToolArgumentError(f"{self.name} must be a number, got {value!r}")
+            if value != value or value in (float("inf"), float("-inf")):
+                raise ToolArgumentError(f"{self.name} must be a finite number")
+            return value
+        if self.type == "string":
+            if value is None or isinstance(value, (dict, list)):
+                raise ToolArgumentError(f"{self.name} must be a string, got {value!r}")
+            return str(value).strip()
+        return value
+
+
+class Aggregate:
+    """One output value: function of a column over the filtered rows."""
+
+    def __init__(self, output, function, column=None, digits=None):
+        if function not in AGGREGATES:
+            raise ValueError(f"Unknown aggregate {function!r}, expected one of {list(AGGREGATES)}")
+        if function != "count":
+            _check_column(column)
+            if column in encoding.CATEGORICAL_COLUMNS:
+                raise ValueError(f"cannot {function} the categorical column {column}")
+        self.output = output
+        self.function = function
+        self.column = column
+        self.digits = digits
+
+    def sql(self):
+        return AGGREGATES[self.function].format(f'"{self.column}"')
+
+    def from_stats(self, stats):
+        if self.function == "count":
+            return stats["n"]
+        total = stats[f"sum_{self.column}"]
+        return total if self.function == "sum" else total / stats["n"]
+
+    def finish(self, value):
+        if self.function == "count":
+            return int(value)
+        if value is not None and self.digits is not None:
+            return round(value, self.digits)
+        return value
+
+
+class FunctionTool:
+    """A hand-written tool: schema and validation from `params`."""
+
+    def __init__(self, name, description, params, function):
+        self.name = name
+        self.description = description
+        self.params = list(params)
+        self.function = function
+
+    def schema(self):
+        return {
+            "type": "function",
+            "function": {
+                "name": self.name,
+                "description": self.description,
+                "parameters": {
+                    "type": "object",
+                    "properties": {p.name: p.schema() for p in self.params},
+                    "required": [p.name for p in self.params if p.required],
+                },
+            },
+        }
+
+    def arguments(self, kwargs):
+        """Validated {param name: value}; raises ToolArgumentError."""
+        arguments = {}
+        for param in self.params:
+            value = kwargs.get(param.name)
+            if value is None or value == "":
+                if param.required:
+                    raise ToolArgumentError(f"missing argument {param.name}")
+                continue
+            arguments[param.name] = param.coerce(value)
+        return arguments
+
+    def validated(self, function):
+        """`function` called with validated arguments; invalid ones are
+        answered with an error. Positional arguments follow the order of the
+        params."""
+
+        def run(*args, **kwargs):
+            kwargs.update(zip((p.name for p in self.params), args))
+            try:
+                arguments = self.arguments(kwargs)
+            except ToolArgumentError as e:
+                return {"error": f"Invalid arguments for {self.name}: {e}"}
+            return function(**arguments)
+
+        run.__name__ = self.name
+        return run
+
+    def bind(self, executor):
+        """The callable the tool registry maps the tool's name to;
+        `executor()` returns the SQLiteExecutor to run on."""
+        return self.validated(lambda **arguments: self.run(executor(), arguments))
+
+    def run(self, executor, arguments):
+        return self.function(**arguments)
+
+
+class Tool(FunctionTool):
+    """An aggregate tool declared by its filters, aggregates and result shape.
+
+    `where` holds fixed equality filters ({column: value}); with `group_by`
+    the result is a list of rows (one per value, sorted), otherwise a dict.
+    `empty` is the result when no row matches."""
+
+    def __init__(
+        self,
+        name,
+        description,
+        params=(),
+        aggregates=(),
+        where=None,
+        group_by=None,
+        empty=None,
+        table=table_name,
+    ):
+        super().__init__(name, description, params, None)
+        self.aggregates = list(aggregates)
+        self.where = dict(where or {})
+        for column, value in self.where.items():
+            _check_column(column)
+            if column not in encoding.CATEGORICAL_COLUMNS:
+                raise ValueError(f"fixed filters are on categorical columns, not {column}")
+        if group_by is not None and group_by not in encoding.CATEGORICAL_COLUMNS:
+            raise ValueError(f"can only group by a categorical column, not {group_by!r}")
+        if not self.aggregates:
+            raise ValueError(f"{name} declares no aggregates")
+        self.group_by = group_by
+        self.table = table
+        if empty is None:
+            empty = [] if group_by else {
+                a.output: 0 if a.function in ("count", "sum") else None
+                for a in self.aggregates
+            }
+        self.empty = empty
+        self.dimension = self._rollup_dimension()
+        self.plan = "rollup" if self.dimension else "sql"
+
+    def _equality_columns(self):
+        columns = [p.column for p in self.params if p.column and p.op == "="]
+        return columns + [c for c in self.where if c not in columns]
+
+    def _rollup_dimension(self):
+        # one rollup dimension, optionally Gender, nothing else
+        if any(p.column and p.op != "=" for p in self.params):
+            return None
+        if any(a.function not in ROLLUP_AGGREGATES for a in self.aggregates):
+            return None
+        if any(a.column not in (None, *rollups.PAY_COLUMNS) for a in self.aggregates):
+            return None
+        if self.group_by not in (None, "Gender"):
+            return None
+        columns = set(self._equality_columns())
+        dimensions = columns & set(rollups.DIMENSIONS)
+        if len(dimensions) != 1 or columns - dimensions - {"Gender"}:
+            return None
+        if any(not p.required for p in self.params if p.column in dimensions):
+            return None
+        return dimensions.pop()
+
+    def index(self):
+        """Columns of the storage index the query needs (None for rollup tools)."""
+        if self.plan != "sql":
+            return None
+        columns = [_sql_column(c) for c in self._equality_columns()]
+        if self.group_by:
+            columns.append(_sql_column(self.group_by))
+        ranges = [p.column for p in self.params if p.column and p.op != "="]
+        columns += [_sql_column(c) for c in ranges[:1]]
+        columns += [a.column for a in self.aggregates if a.column]
+        return tuple(dict.fromkeys(columns))
+
+    def query(self, names=None):
+        """The storage query, filtering on the params in `names` (all if None)."""
+        selected = [f'{a.sql()} AS "{a.output}"' for a in self.aggregates]
+        selected.insert(0, 'COUNT(*) AS "_n"')
+        if self.group_by:
+            selected.insert(0, f'"{_sql_column(self.group_by)}" AS "_group"')
+        conditions = [
+            f'"{_sql_column(p.column)}" {p.op} :{p.name}'
+            for p in self.params
+            if p.column and (names is None or p.name in names)
+        ]
+        conditions += [f'"{_sql_column(c)}" = :_{c}' for c in self.where]
+        sql = "SELECT " + ", ".join(selected)
+        sql += f"\nFROM {encoding.storage_table(self.table)}"
+        if conditions:
+            sql += "\nWHERE " + "\n  AND ".join(conditions)
+        if self.group_by:
+            sql += f'\nGROUP BY "{_sql_column(self.group_by)}"'
+        return sql
+
+    def _filters(self, executor, arguments):
+        """{column or param: bound value}, None if a name does not occur."""
+        bound = {}
+        for param in self.params:
+            if param.column is None or param.name not in arguments:
+                continue
+            value = arguments[param.name]
+            if param.categorical:
+                value = encoding.code_for(executor, param.column, value)
+                if value is None:
+                    return None
+            bound[param.name] = value
+        for column, value in self.where.items():
+            code = encoding.code_for(executor, column, value)
+            if code is None:
+                return None
+            bound[f"_{column}"] = code
+        return bound
+
+    def run(self, executor, arguments):
+        # database errors propagate: the caller reports them, and they are
+        # not memoized as "no rows" (see tool_cache.py)
+        bound = self._filters(executor, arguments)
+        if bound is None:
+            return self.empty
+        if self.plan == "rollup":
+            groups = self._rollup_groups(executor, bound)
+        else:
+            groups = self._query_groups(executor, bound)
+        groups = [(key, stats) for key, stats in groups if stats["_n"]]
+        if not groups:
+            return self.empty
+        if not self.group_by:
+            return self._result(groups[0][1])
+        rows = [
+            {
+                self.group_by: encoding.value_for(executor, self.group_by, key),
+                **self._result(stats),
+            }
+            for key, stats in groups
+        ]
+        return sorted(rows, key=lambda row: str(row[self.group_by]))
+
+    def _result(self, stats):
+        return {a.output: a.finish(stats[a.output]) for a in self.aggregates}
+
+    def _rollup_groups(self, executor, bound):
+        # [(gender code or None, {"_n": rows, output: value})]
+        code = next(
+            (bound[p.name] for p in self.params if p.column == self.dimension),
+            bound.get(f"_{self.dimension}"),
+        )
+        per_gender = rollups.lookup(executor, self.dimension, code, self.table)
+        genders = [bound[p.name] for p in self.params if p.column == "Gender" and p.name in bound]
+        if "Gender" in self.where:
+            genders.append(bound["_Gender"])
+        if genders:
+            per_gender = {g: per_gender[g] for g in genders[:1] if g in per_gender}
+        if self.group_by:
+            groups = list(per_gender.items())
+        else:
+            groups = [(None, rollups.combine(per_gender))]
+        results = []
+        for key, stats in groups:
+            values = {"_n": stats["n"]}
+            if stats["n"]:
+                values.update({a.output: a.from_stats(stats) for a in self.aggregates})
+            results.append((key, values))
+        return results
+
+    def _query_groups(self, executor, bound):
+        names = {name for name in bound if not name.startswith("_")}
+        rows = executor.fetch_all(self.query(names), bound)
+        return [(row.get("_group"), row) for row in rows]
+
+
+def schemas(tools):
+    """The OpenAI tool schemas of `tools`, in order."""
+    return [tool.schema() for tool in tools]
+
+
+def functions(tools, executor):
+    """{tool name: callable} running `tools` against `executor()` (looked
+    up on every call, so it can be swapped)."""
+    return {tool.name: tool.bind(executor) for tool in tools}
+
+
+def indexes(tools):
+    """{index name: storage columns} for the SQL tools, reusing schema.INDEXES
+    (and each other) when an existing index starts with the same columns."""
+    existing = dict(schema.INDEXES)
+    needed = {}
+    for tool in tools:
+        columns = tool.index() if isinstance(tool, Tool) else None
+        if not columns:
+            continue
+        if any(c[: len(columns)] == columns for c in existing.values()):
+            continue
+        name = "idx_rows_" + "_".join(c.removesuffix("_code").lower() for c in columns)
+        existing[name] = needed[name] = columns
+    return needed
+
+
+def queries(tools):
+    """{tool name: (query, sample parameters)} of the SQL tools, for EXPLAIN."""
+    sampled = {}
+    for tool in tools:
+        if not isinstance(tool, Tool) or tool.plan != "sql":
+            continue
+        params = {
+            p.name: 1 if p.categorical else 0.0 for p in tool.params if p.column
+        }
+        params.update({f"_{c}": 1 for c in tool.where})
+        sampled[tool.name] = (tool.query(), params)
+    return sampled
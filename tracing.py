@@ -0,0 +1,316 @@
+import contextvars
+import json
+import os
+import threading
+import time
+
+# Lightweight per-question tracing.
+#
+# A trace is one question; spans inside it cover the LLM calls, every tool
+# invocation, the SQL it runs and the serialization of its result, with
+# attributes such as token counts, rows returned and payload bytes. Finished
+# spans are kept on their trace (for the timing breakdown shown in the UI) and
+# optionally appended to TRACE_FILE: one JSON line per span, or with
+# TRACE_FORMAT=otlp one OpenTelemetry OTLP/JSON request per finished trace
+# (the layout of the OTel collector's file exporter).
+#
+# Tracing is off unless TRACING=1 (or enable() is called); when off, span()
+# returns a shared no-op object after a single flag check.
+#
+#     TRACING=1 TRACE_FILE=traces.jsonl streamlit run sql_db_agent.py
+
+enabled = os.getenv("TRACING", "") not in ("", "0")
+trace_file = os.getenv("TRACE_FILE")
+trace_format = os.getenv("TRACE_FORMAT", "jsonl")  # or "otlp"
+
+service_name = "salary-agents"
+
+_current = contextvars.ContextVar("tracing_span", default=None)
+_file_lock = threading.Lock()
+
+
+def _new_id(nbytes):
+    return os.urandom(nbytes).hex()
+
+
+class Span:
+    __slots__ = (
+        "trace",
+        "name",
+        "span_id",
+        "parent_id",
+        "start_ns",
+        "end_ns",
+        "attributes",
+        "error",
+        "_token",
+    )
+
+    def __init__(self, trace, name, parent_id, attributes):
+        self.trace = trace
+        self.name = name
+        self.span_id = _new_id(8)
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = attributes
+        self.error = None
+        self._token = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    @property
+    def duration_ms(self):
+        end_ns = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end_ns - self.start_ns) / 1e6
+
+    def end(self, error=None):
+        if self.end_ns is not None:
+            return
+        self.end_ns = time.time_ns()
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+        self.trace._finish(self)
+
+    def __enter__(self):
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _current.reset(self._token)
+        self.end(exc)
+        return False
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class Trace:
+    def __init__(self):
+        self.trace_id = _new_id(16)
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def _finish(self, span):
+        with self._lock:
+            self.spans.append(span)
+        if not trace_file:
+            return
+        if trace_format == "otlp":
+            if span.parent_id is not None:
+                return  # written with the whole trace when the root ends
+            line = json.dumps(to_otlp(self.spans), default=str)
+        else:
+            line = json.dumps(span.to_dict(), default=str)
+        with _file_lock, open(trace_file, "a") as f:
+            f.write(line + "\n")
+
+    def breakdown(self):
+        """Rows of {span, calls, total_ms} per span name, root first, then by
+        time spent."""
+        rows = {}
+        for span in self.spans:
+            row = rows.setdefault(span.name, {"span": span.name, "calls": 0, "total_ms": 0.0})
+            row["calls"] += 1
+            row["total_ms"] += span.duration_ms
+        for row in rows.values():
+            row["total_ms"] = round(row["total_ms"], 1)
+        roots = {s.name for s in self.spans if s.parent_id is None}
+        return sorted(rows.values(), key=lambda r: (r["span"] not in roots, -r["total_ms"]))
+
+
+class _NoopSpan:
+    trace = None
+
+    def set(self, **attributes):
+        pass
+
+    def end(self, error=None):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def enable(path=None, format=None):
+    global enabled, trace_file, trace_format
+    enabled = True
+    if path is not None:
+        trace_file = path
+    if format is not None:
+        trace_format = format
+
+
+def disable():
+    global enabled
+    enabled = False
+
+
+def current_span():
+    return _current.get()
+
+
+def start_span(name, parent=None, **attributes):
+    """Start a span without making it current (end it with span.end()).
+
+    Parent defaults to the current span; without one a new trace starts."""
+    if not enabled:
+        return _NOOP
+    parent = parent if parent is not None else _current.get()
+    if parent is None or parent is _NOOP:
+        return Span(Trace(), name, None, attributes)
+    return Span(parent.trace, name, parent.span_id, attributes)
+
+
+def span(name, **attributes):
+    """Context manager timing a block as a child of the current span."""
+    return start_span(name, **attributes)
+
+
+def trace(name, **attributes):
+    """Context manager for a root span: one trace per question."""
+    if not enabled:
+        return _NOOP
+    return Span(Trace(), name, None, attributes)
+
+
+def record_usage(span, response):
+    """Copy the token usage of an OpenAI response onto `span`."""
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        span.set(
+            prompt_tokens=usage.prompt_tokens,
+            completion_tokens=usage.completion_tokens,
+        )
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(spans):
+    """OTLP/JSON (ExportTraceServiceRequest) for `spans`."""
+    return {
+        "resourceSpans": [
+            {
+                "resource": {
+                    "attributes": [
+                        {"key": "service.name", "value": _otlp_value(service_name)}
+                    ]
+                },
+                "scopeSpans": [
+                    {
+                        "scope": {"name": "tracing"},
+                        "spans": [
+                            {
+                                "traceId": s.trace.trace_id,
+                                "spanId": s.span_id,
+                                **({"parentSpanId": s.parent_id} if s.parent_id else {}),
+                                "name": s.name,
+                                "kind": 1,
+                                "startTimeUnixNano": str(s.start_ns),
+                                "endTimeUnixNano": str(s.end_ns or s.start_ns),
+                                "attributes": [
+                                    {"key": k, "value": _otlp_value(v)}
+                                    for k, v in s.attributes.items()
+                                ],
+                                "status": {"code": 2, "message": s.error}
+                                if s.error
+                                else {"code": 1},
+                            }
+                            for s in spans
+                        ],
+                    }
+                ],
+            }
+        ]
+    }
+
+
+try:
+    from langchain_core.callbacks import BaseCallbackHandler
+except ImportError:  # only the LangChain agents need the callback handler
+    BaseCallbackHandler = object
+
+
+class LangChainTracer(BaseCallbackHandler):
+    """Spans for the LLM calls and tool runs of a LangChain agent (e.g. the
+    ReAct loop of create_sql_agent), as children of the current span."""
+
+    def __init__(self):
+        self._spans = {}  # run_id -> span
+
+    def _start(self, run_id, parent_run_id, name, **attributes):
+        parent = self._spans.get(parent_run_id) or _current.get()
+        self._spans[run_id] = start_span(name, parent=parent, **attributes)
+
+    def _end(self, run_id, error=None, **attributes):
+        span = self._spans.pop(run_id, None)
+        if span is not None:
+            span.set(**attributes)
+            span.end(error)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, **kwargs):
+        self._start(
+            run_id,
+            parent_run_id,
+            "llm",
+            prompt_bytes=sum(len(p) for p in prompts),
+        )
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, **kwargs):
+        self._start(
+            run_id,
+            parent_run_id,
+            "llm",
+            prompt_bytes=sum(len(str(m.content)) for batch in messages for m in batch),
+        )
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        self._end(
+            run_id,
+            prompt_tokens=usage.get("prompt_tokens"),
+            completion_tokens=usage.get("completion_tokens"),
+        )
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, **kwargs):
+        self._start(
+            run_id,
+            parent_run_id,
+            "tool",
+            tool=(serialized or {}).get("name"),
+            input_bytes=len(input_str or ""),
+        )
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end(run_id, payload_bytes=len(str(output)))
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error)